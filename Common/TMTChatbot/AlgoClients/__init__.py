@@ -1,4 +1,4 @@
-from TMTChatbot.AlgoClients.graph_qa_service import GraphQAService
-from TMTChatbot.AlgoClients.ner_service import NERService
-from TMTChatbot.AlgoClients.intent_service import IntentService
-from TMTChatbot.AlgoClients.node_search_service import NodeSearchService
+from TMTChatbot.AlgoClients.graph_qa_service import GraphQAService, AsyncGraphQAService
+from TMTChatbot.AlgoClients.ner_service import NERService, AsyncNERService
+from TMTChatbot.AlgoClients.intent_service import IntentService, AsyncIntentService
+from TMTChatbot.AlgoClients.node_search_service import NodeSearchService, AsyncNodeSearchService
@@ -2,7 +2,7 @@ from typing import List, Tuple
 
 from TMTChatbot.Common.storage.base_storage import BaseStorage
 
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Schema.objects.common.nlp_tags import NerTag
 from TMTChatbot.Schema.objects.conversation.conversation import Message
@@ -67,17 +67,26 @@ class AddressService(BaseExternalService):
                     result.append(tag)
         return result, message
 
+    def update(self, input_data: Message, result: BaseDataModel):
+        output, message = self._post_process(result, input_data.entities)
+        input_data.entities = output
+        if message is not None:
+            input_data.message = message
+        return input_data
+
     def __call__(self, input_data: Message, key=None, postfix="", num_retry: int = None, call_prop: float = 0):
         if input_data is not None and self.api_possible():
-            data = self._pre_process(input_data)
-            result: BaseDataModel = self.make_request(lambda: self._call_api(data), key=key, postfix=postfix,
-                                                      num_retry=num_retry, call_prop=call_prop)
-            output, message = self._post_process(result, input_data.entities)
-            input_data.entities = output
-            if message is not None:
-                input_data.message = message
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
-            return input_data
+            result = self.request(input_data, key=key, postfix=postfix, num_retry=num_retry, call_prop=call_prop)
+            return self.update(input_data, result)
+
+
+class AsyncAddressService(BaseAsyncExternalService, AddressService):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        AddressService.__init__(self, storage=storage, config=config)
+
+    async def __call__(self, input_data: Message, key=None, postfix="", num_retry: int = None, call_prop: float = 0):
+        if input_data is not None and self.api_possible():
+            result = await self.request(input_data, key=key, postfix=postfix, num_retry=num_retry,
+                                        call_prop=call_prop)
+            return self.update(input_data, result)
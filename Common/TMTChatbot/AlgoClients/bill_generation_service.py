@@ -1,6 +1,6 @@
 from TMTChatbot.Common.storage.base_storage import BaseStorage
 
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Common.config.config import Config
 
@@ -30,8 +30,10 @@ class Json2ImageService(BaseExternalService):
             result: BaseDataModel = self.make_request(lambda: self._call_api(data), key=key, postfix=postfix,
                                                       num_retry=num_retry, call_prop=call_prop)
             output = self._post_process(result)
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
             return output
+
+
+class AsyncJson2ImageService(BaseAsyncExternalService, Json2ImageService):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        Json2ImageService.__init__(self, storage=storage, config=config)
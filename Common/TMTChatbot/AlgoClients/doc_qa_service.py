@@ -1,5 +1,5 @@
 from TMTChatbot.Common.storage.base_storage import BaseStorage
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Common.config.config import Config
 
@@ -20,3 +20,9 @@ class DocQAService(BaseExternalService):
         else:
             result = ""
         return result
+
+
+class AsyncDocQAService(BaseAsyncExternalService, DocQAService):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        DocQAService.__init__(self, storage=storage, config=config)
@@ -4,7 +4,7 @@ from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Schema.objects.conversation.conversation import Conversation
 from TMTChatbot.Schema.objects.graph.graph_data import Node
 from TMTChatbot.Schema.objects.graph.graph import SubGraph
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 
 
 class GraphQAService(BaseExternalService):
@@ -26,30 +26,48 @@ class GraphQAService(BaseExternalService):
             result = ""
         return result
 
-    def custom_question(self, input_data: Conversation, question: str):
+    @staticmethod
+    def get_question_data(input_data: Conversation, question: str) -> BaseDataModel:
         graph_data = input_data.data.json
         graph_data["question"] = question
-        data = BaseDataModel(data=graph_data)
+        return BaseDataModel(data=graph_data)
+
+    @staticmethod
+    def get_node_question_data(node: Node, question: str, conversation: Conversation) -> BaseDataModel:
+        subgraph = SubGraph(storage_id=conversation.storage_id, user=conversation.user, shop=conversation.shop,
+                            nodes=[node])
+        graph_data = subgraph.json
+        graph_data["question"] = question
+        return BaseDataModel(data=graph_data)
+
+    def custom_question(self, input_data: Conversation, question: str):
+        data = self.get_question_data(input_data, question)
         if self.api_possible():
             result: BaseDataModel = self.make_request(lambda: self._call_api(data))
             output = self._post_process(result)
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
             return output
 
     def custom_node_question(self, node: Node, question: str, conversation: Conversation):
-        subgraph = SubGraph(storage_id=conversation.storage_id, user=conversation.user, shop=conversation.shop,
-                            nodes=[node])
-        graph_data = subgraph.json
-        graph_data["question"] = question
-        data = BaseDataModel(data=graph_data)
+        data = self.get_node_question_data(node, question, conversation)
         if self.api_possible():
             result: BaseDataModel = self.make_request(lambda: self._call_api(data))
             output = self._post_process(result)
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
             return output
+
+
+class AsyncGraphQAService(BaseAsyncExternalService, GraphQAService):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        GraphQAService.__init__(self, storage=storage, config=config)
+
+    async def custom_question(self, input_data: Conversation, question: str):
+        data = self.get_question_data(input_data, question)
+        if self.api_possible():
+            result: BaseDataModel = await self.make_request(lambda: self._call_api(data))
+            return self._post_process(result)
+
+    async def custom_node_question(self, node: Node, question: str, conversation: Conversation):
+        data = self.get_node_question_data(node, question, conversation)
+        if self.api_possible():
+            result: BaseDataModel = await self.make_request(lambda: self._call_api(data))
+            return self._post_process(result)
@@ -3,7 +3,7 @@ from typing import List
 from TMTChatbot.Common.storage.base_storage import BaseStorage
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.Common.default_intents import *
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Schema.objects.common.nlp_tags import Intent
 from TMTChatbot.Schema.objects.conversation.conversation import Message
@@ -14,6 +14,7 @@ class IntentService(BaseExternalService):
         super(IntentService, self).__init__(config=config)
         self.session = None
         self.api_url = f"{self.config.intent_url}/process"
+        self.batch_size = self.config.intent_batch_size
         self.storage = storage
 
     def _pre_process(self, input_data: Message):
@@ -33,22 +34,32 @@ class IntentService(BaseExternalService):
             intent.score = 1
         return result
 
+    def update(self, input_data: Message, result: BaseDataModel, add_has_message_intent: bool = True):
+        output: List[Intent] = self._post_process(result)
+
+        input_data.update_intents(output)
+        if add_has_message_intent:
+            if input_data.message is not None and len(input_data.message) > 0:
+                input_data.update_intents([USER_HAS_MESSAGE])
+        else:
+            input_data.drop_intents([USER_HAS_MESSAGE])
+        return input_data
+
     def __call__(self, input_data: Message, key=None, postfix="", num_retry: int = None, call_prop: float = 0,
                  add_has_message_intent: bool = True):
         if input_data is not None and self.api_possible():
-            data = self._pre_process(input_data)
-            result: BaseDataModel = self.make_request(lambda: self._call_api(data), key=key, postfix=postfix,
-                                                      num_retry=num_retry, call_prop=call_prop)
-            output: List[Intent] = self._post_process(result)
-
-            input_data.update_intents(output)
-            if add_has_message_intent:
-                if input_data.message is not None and len(input_data.message) > 0:
-                    input_data.update_intents([USER_HAS_MESSAGE])
-            else:
-                input_data.drop_intents([USER_HAS_MESSAGE])
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
-            return input_data
+            result = self.request(input_data, key=key, postfix=postfix, num_retry=num_retry, call_prop=call_prop)
+            return self.update(input_data, result, add_has_message_intent=add_has_message_intent)
+
+
+class AsyncIntentService(BaseAsyncExternalService, IntentService):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        IntentService.__init__(self, storage=storage, config=config)
+
+    async def __call__(self, input_data: Message, key=None, postfix="", num_retry: int = None, call_prop: float = 0,
+                       add_has_message_intent: bool = True):
+        if input_data is not None and self.api_possible():
+            result = await self.request(input_data, key=key, postfix=postfix, num_retry=num_retry,
+                                        call_prop=call_prop)
+            return self.update(input_data, result, add_has_message_intent=add_has_message_intent)
@@ -1,7 +1,7 @@
 from TMTChatbot.Common.storage.base_storage import BaseStorage
 
 from TMTChatbot.Schema.objects.graph.graph_data import Node, ValueNode
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Schema.objects.conversation.conversation import Message
 from TMTChatbot.Schema.objects.conversation.choice import ChoiceResult
@@ -17,6 +17,9 @@ class MultipleChoiceService(BaseExternalService):
         self.api_url = f"{self.config.multiple_choice_url}/process/"
 
     def _pre_process(self, input_data: Message):
+        # an empty message has no choice, the api is not called
+        if input_data.message is None or input_data.message in ["", "."]:
+            return None
         return BaseDataModel(data=input_data.all_data)
 
     def _post_process(self, data: BaseDataModel) -> ChoiceResult:
@@ -35,39 +38,44 @@ class MultipleChoiceService(BaseExternalService):
             result = ChoiceResult(choice=None, score=1)
         return result
 
+    def update(self, input_data: Message, result: BaseDataModel, add_has_message_intent: bool = True):
+        output: ChoiceResult = self._post_process(result)
+        if output.choice is None:
+            input_data.multiple_choices = []
+            input_data.update_intents([BOT_USER_UNCLEAR_CHOICE])
+        else:
+            input_data.multiple_choices = [output.choice]
+            if output.score > 0.7:
+                if isinstance(output.choice, ValueNode):
+                    input_data.update_intents([BOT_USER_CHOOSE_A_VALUE])
+                else:
+                    input_data.update_intents([BOT_USER_CHOOSE_AN_OBJECT])
+            else:
+                input_data.update_intents([BOT_USER_UNCLEAR_CHOICE])
+
+        if add_has_message_intent:
+            if input_data.message is not None and len(input_data.message) > 0:
+                input_data.update_intents([USER_HAS_MESSAGE])
+        else:
+            input_data.drop_intents([USER_HAS_MESSAGE])
+
+        return input_data
+
     def __call__(self, input_data: Message, key=None, postfix="", num_retry: int = None, call_prop: float = 0,
                  add_has_message_intent: bool = True):
         if input_data is not None and self.api_possible():
-            if input_data.message is None or input_data.message in ["", "."]:
-                output = ChoiceResult(choice=None, score=0)
-                result = True
-            else:
-                data = self._pre_process(input_data)
+            result = self.request(input_data, key=key, postfix=postfix, num_retry=num_retry, call_prop=call_prop)
+            return self.update(input_data, result, add_has_message_intent=add_has_message_intent)
 
-                result = self.make_request(lambda: self._call_api(data), key=key, postfix=postfix,
-                                           num_retry=num_retry, call_prop=call_prop)
-                output: ChoiceResult = self._post_process(result)
-            if output.choice is None:
-                input_data.multiple_choices = []
-                input_data.update_intents([BOT_USER_UNCLEAR_CHOICE])
-            else:
-                input_data.multiple_choices = [output.choice]
-                if output.score > 0.7:
-                    if isinstance(output.choice, ValueNode):
-                        input_data.update_intents([BOT_USER_CHOOSE_A_VALUE])
-                    else:
-                        input_data.update_intents([BOT_USER_CHOOSE_AN_OBJECT])
-                else:
-                    input_data.update_intents([BOT_USER_UNCLEAR_CHOICE])
 
-            if add_has_message_intent:
-                if input_data.message is not None and len(input_data.message) > 0:
-                    input_data.update_intents([USER_HAS_MESSAGE])
-            else:
-                input_data.drop_intents([USER_HAS_MESSAGE])
+class AsyncMultipleChoiceService(BaseAsyncExternalService, MultipleChoiceService):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        MultipleChoiceService.__init__(self, storage=storage, config=config)
 
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
-            return input_data
+    async def __call__(self, input_data: Message, key=None, postfix="", num_retry: int = None, call_prop: float = 0,
+                       add_has_message_intent: bool = True):
+        if input_data is not None and self.api_possible():
+            result = await self.request(input_data, key=key, postfix=postfix, num_retry=num_retry,
+                                        call_prop=call_prop)
+            return self.update(input_data, result, add_has_message_intent=add_has_message_intent)
@@ -2,20 +2,23 @@ from typing import List, Tuple
 
 from TMTChatbot.Common.storage.base_storage import BaseStorage
 from TMTChatbot.Common.utils.unit_parser import UnitParser
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Schema.objects.common.nlp_tags import NerTag
 from TMTChatbot.Schema.objects.conversation.conversation import Message
-from TMTChatbot.AlgoClients.address_service import AddressService
+from TMTChatbot.AlgoClients.address_service import AddressService, AsyncAddressService
 from TMTChatbot.Common.config.config import Config
 
 
 class NERService(BaseExternalService):
+    address_service_class = AddressService
+
     def __init__(self, storage: BaseStorage, config: Config = None):
         super(NERService, self).__init__(config=config)
-        self.address_service = AddressService(config=config, storage=storage)
+        self.address_service = self.address_service_class(config=config, storage=storage)
         self.session = None
         self.api_url = f"{self.config.ner_url}/process"
+        self.batch_size = self.config.ner_batch_size
         self.sep = " , , , "
 
     def _pre_process(self, input_data: List[Message]):
@@ -121,25 +124,57 @@ class NERService(BaseExternalService):
         tags += self._concat_entity_phrase(tags)
         return tags, message, has_address
 
+    def update(self, current_message: Message, result: BaseDataModel) -> bool:
+        """
+        Merge the entities found by the NER api into current_message
+        :return: whether the message mentions an address, to be parsed by the address service
+        """
+        output, message, has_address = self._post_process(result, current_message.entities)
+        current_message.entities = output
+        if message is not None:
+            current_message.message = message
+        return has_address
+
+    @staticmethod
+    def add_empty_entity(current_message: Message):
+        """
+        Mark a message without entity as processed, so it is not sent to NER again
+        """
+        if len(current_message.entities) == 0:
+            current_message.entities.append(NerTag(text="", label="", begin=0, end=0))
+
     def __call__(self, input_data: List[Message], key=None, postfix="", num_retry: int = None, call_prop: float = 0):
         if input_data is not None and input_data[-1] is not None and self.api_possible():
             _, current_message = input_data
             if current_message.entities is not None and len(current_message.entities) > 0:
                 return None, current_message
 
-            data = self._pre_process(input_data)
-            result: BaseDataModel = self.make_request(lambda: self._call_api(data), key=key, postfix=postfix,
-                                                      num_retry=num_retry, call_prop=call_prop)
-            output, message, has_address = self._post_process(result, current_message.entities)
-            current_message.entities = output
-            if message is not None:
-                current_message.message = message
+            result = self.request(input_data, key=key, postfix=postfix, num_retry=num_retry, call_prop=call_prop)
+            has_address = self.update(current_message, result)
             if has_address:
                 self.address_service(current_message)
-            if len(current_message.entities) == 0:
-                current_message.entities.append(NerTag(text="", label="", begin=0, end=0))
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
+            self.add_empty_entity(current_message)
+            return input_data
+
+
+class AsyncNERService(BaseAsyncExternalService, NERService):
+    address_service_class = AsyncAddressService
+
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        NERService.__init__(self, storage=storage, config=config)
+
+    async def __call__(self, input_data: List[Message], key=None, postfix="", num_retry: int = None,
+                       call_prop: float = 0):
+        if input_data is not None and input_data[-1] is not None and self.api_possible():
+            _, current_message = input_data
+            if current_message.entities is not None and len(current_message.entities) > 0:
+                return None, current_message
+
+            result = await self.request(input_data, key=key, postfix=postfix, num_retry=num_retry,
+                                        call_prop=call_prop)
+            has_address = self.update(current_message, result)
+            if has_address:
+                await self.address_service(current_message)
+            self.add_empty_entity(current_message)
             return input_data
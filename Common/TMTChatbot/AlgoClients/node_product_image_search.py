@@ -6,6 +6,7 @@ from TMTChatbot.Schema.objects.conversation.conversation import Conversation
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Common.storage.base_storage import BaseStorage
 from TMTChatbot.Schema.objects.graph.graph_data import Node, Product, VariantProduct
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseAsyncExternalService
 from TMTChatbot.StateController.services.value_mapping import map_product_inventory
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.Common.default_intents import *
@@ -55,37 +56,34 @@ class NodeProductImageSearch(NodeSearchService):
             }
         return BaseDataModel(data=data)
 
-    def __call__(self, input_data: Conversation, key=None, postfix="", num_retry: int = None, call_prop: float = 0):
-        if (len(input_data.current_state.message.urls) > 0 or input_data.current_state.message.base64_img) \
-                and self.api_possible():
-            data = self._pre_process(input_data)
-            result: BaseDataModel = self.make_request(lambda: self._call_api(data))
-            nodes, api_output = self._post_process(result, conversation=input_data)
-
-            if api_output and api_output[DISTANCE] != "None" and \
-                    api_output[CHECK_INPUT_DATA] and api_output[LIST_RECOMMEND_ITEMS]:
-                if float(api_output[DISTANCE]) >= self.config.threshold_cloth_model:
-                    input_data.current_state.update_intents([BOT_ITEM_IN_SHOP])
-                else:
-                    input_data.current_state.update_intents([BOT_ITEM_OUT_SHOP])
-            if len(nodes) >= 1:
-                if nodes[0].id in input_data.data.nodes:
-                    input_data.current_state.update_intents([USER_MENTION_OLD_OBJECT])
-                else:
-                    input_data.current_state.update_intents([USER_MENTION_OBJECT])
-                if len(nodes) > 1:
-                    input_data.data.add_nodes(nodes[1:], datetime.now().timestamp())
-                    input_data.data.add_nodes([nodes[0]], datetime.now().timestamp() + 1e-5)
-                    input_data = self.check_inventory(input_data)
-                elif len(nodes) == 1:
-                    input_data.data.add_nodes([nodes[0]])
-                    input_data = self.check_inventory(input_data)
+    def update(self, input_data: Conversation, result: BaseDataModel):
+        nodes, api_output = self._post_process(result, conversation=input_data)
 
-            if result is None:
-                self.api_alive = False
+        if api_output and api_output[DISTANCE] != "None" and \
+                api_output[CHECK_INPUT_DATA] and api_output[LIST_RECOMMEND_ITEMS]:
+            if float(api_output[DISTANCE]) >= self.config.threshold_cloth_model:
+                input_data.current_state.update_intents([BOT_ITEM_IN_SHOP])
             else:
-                self.api_alive = True
-            return input_data
+                input_data.current_state.update_intents([BOT_ITEM_OUT_SHOP])
+        if len(nodes) >= 1:
+            if nodes[0].id in input_data.data.nodes:
+                input_data.current_state.update_intents([USER_MENTION_OLD_OBJECT])
+            else:
+                input_data.current_state.update_intents([USER_MENTION_OBJECT])
+            if len(nodes) > 1:
+                input_data.data.add_nodes(nodes[1:], datetime.now().timestamp())
+                input_data.data.add_nodes([nodes[0]], datetime.now().timestamp() + 1e-5)
+                input_data = self.check_inventory(input_data)
+            elif len(nodes) == 1:
+                input_data.data.add_nodes([nodes[0]])
+                input_data = self.check_inventory(input_data)
+
+        return input_data
+
+    def __call__(self, input_data: Conversation, key=None, postfix="", num_retry: int = None, call_prop: float = 0):
+        if self.has_image(input_data) and self.api_possible():
+            result = self.request(input_data)
+            return self.update(input_data, result)
 
     @staticmethod
     def check_inventory(input_data: Conversation) -> Conversation:
@@ -95,3 +93,15 @@ class NodeProductImageSearch(NodeSearchService):
         else:
             input_data.current_state.update_intents([BOT_HAVE_INVENTORY])
         return input_data
+
+
+class AsyncNodeProductImageSearch(BaseAsyncExternalService, NodeProductImageSearch):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        NodeProductImageSearch.__init__(self, storage=storage, config=config)
+
+    async def __call__(self, input_data: Conversation, key=None, postfix="", num_retry: int = None,
+                       call_prop: float = 0):
+        if self.has_image(input_data) and self.api_possible():
+            result = await self.request(input_data)
+            return self.update(input_data, result)
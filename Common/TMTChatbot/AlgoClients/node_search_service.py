@@ -1,6 +1,6 @@
 from typing import Dict, Union
 
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 from TMTChatbot.Common.storage.base_storage import BaseStorage
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Schema.objects.common.nlp_tags import NerTag
@@ -24,6 +24,11 @@ class NodeSearchService(BaseExternalService):
                 and len(input_data.pending_message.message) > 0:
             return BaseDataModel(data=input_data.all_data)
 
+    @staticmethod
+    def has_image(input_data: Conversation) -> bool:
+        message = input_data.current_state.message
+        return len(message.urls) > 0 or bool(message.base64_img)
+
     def _post_process(self, data: BaseDataModel) -> Union[NerTag, None]:
         if data is not None:
             result: Dict = data.data
@@ -36,37 +41,45 @@ class NodeSearchService(BaseExternalService):
         else:
             return None
 
+    def update(self, input_data: Conversation, result: BaseDataModel):
+        ner_tag = self._post_process(result)
+
+        if ner_tag is not None:
+            nodes = ner_tag.extra_data
+            nodes = [Node.from_json(node_data, storage=self.storage) for node_data in nodes]
+            if len(nodes) == 1:
+                node = nodes[0]
+                if node.id in input_data.data.nodes:
+                    input_data.pending_message.update_intents([USER_MENTION_OLD_OBJECT])
+                else:
+                    input_data.pending_message.update_intents([USER_MENTION_OBJECT])
+            elif len(nodes) > 1:
+                input_data.pending_message.update_intents([USER_MENTION_UNCLEAR_OBJECTS])
+            nodes = input_data.data.add_nodes(nodes)
+
+            if len(nodes) > 0:
+                # current_time = datetime.now().timestamp()
+                # for node in nodes:
+                #     node.set_mentioned_time(current_time)
+                input_data.pending_message.update_entities([ner_tag])
+
+        return input_data
+
     def __call__(self, input_data: Conversation, key=None, postfix="", num_retry: int = None, call_prop: float = 0):
         is_api_possible = self.api_possible()
         if is_api_possible:
-            data = self._pre_process(input_data)
-            if data is None:
-                return input_data
-            result: BaseDataModel = self.make_request(lambda: self._call_api(data), key=key, postfix=postfix,
-                                                      num_retry=num_retry, call_prop=call_prop)
-            ner_tag = self._post_process(result)
+            result = self.request(input_data, key=key, postfix=postfix, num_retry=num_retry, call_prop=call_prop)
+            return self.update(input_data, result)
 
-            if ner_tag is not None:
-                nodes = ner_tag.extra_data
-                nodes = [Node.from_json(node_data, storage=self.storage) for node_data in nodes]
-                if len(nodes) == 1:
-                    node = nodes[0]
-                    if node.id in input_data.data.nodes:
-                        input_data.pending_message.update_intents([USER_MENTION_OLD_OBJECT])
-                    else:
-                        input_data.pending_message.update_intents([USER_MENTION_OBJECT])
-                elif len(nodes) > 1:
-                    input_data.pending_message.update_intents([USER_MENTION_UNCLEAR_OBJECTS])
-                nodes = input_data.data.add_nodes(nodes)
 
-                if len(nodes) > 0:
-                    # current_time = datetime.now().timestamp()
-                    # for node in nodes:
-                    #     node.set_mentioned_time(current_time)
-                    input_data.pending_message.update_entities([ner_tag])
+class AsyncNodeSearchService(BaseAsyncExternalService, NodeSearchService):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        NodeSearchService.__init__(self, storage=storage, config=config)
 
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
-            return input_data
+    async def __call__(self, input_data: Conversation, key=None, postfix="", num_retry: int = None,
+                       call_prop: float = 0):
+        if self.api_possible():
+            result = await self.request(input_data, key=key, postfix=postfix, num_retry=num_retry,
+                                        call_prop=call_prop)
+            return self.update(input_data, result)
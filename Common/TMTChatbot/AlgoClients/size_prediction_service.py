@@ -1,6 +1,6 @@
 from TMTChatbot.Common.storage.base_storage import BaseStorage
 from TMTChatbot.Common.config.config import Config
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Schema.objects.graph.graph_data import User, Product
 from TMTChatbot.Schema.config.size_schema_config import (
@@ -40,3 +40,8 @@ class SizePredictionService(BaseExternalService):
             result = None
         return result
 
+
+class AsyncSizePredictionService(BaseAsyncExternalService, SizePredictionService):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        SizePredictionService.__init__(self, storage=storage, config=config)
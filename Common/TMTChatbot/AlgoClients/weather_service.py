@@ -4,7 +4,7 @@ from TMTChatbot.Common.storage.base_storage import BaseStorage
 
 from TMTChatbot.Common.common_keys import *
 from TMTChatbot.Common.default_intents import *
-from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService, BaseAsyncExternalService
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.Schema.objects.conversation.conversation import Conversation
 from TMTChatbot.Common.config.config import Config
@@ -72,8 +72,17 @@ class WeatherService(BaseExternalService):
                                                       num_retry=num_retry, call_prop=call_prop)
             output = self._post_process(result)
 
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
             return output
+
+
+class AsyncWeatherService(BaseAsyncExternalService, WeatherService):
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        BaseAsyncExternalService.__init__(self, config=config)
+        WeatherService.__init__(self, storage=storage, config=config)
+
+    async def __call__(self, input_data: Conversation, key=None, postfix="", num_retry: int = None,
+                       call_prop: float = 0):
+        if input_data is not None and self.api_possible():
+            result = await self.request(input_data, key=key, postfix=postfix, num_retry=num_retry,
+                                        call_prop=call_prop)
+            return self._post_process(result)
@@ -5,6 +5,11 @@ from TMTChatbot.Common.storage.mongo_client import (
     JoinCollMongoConnector,
     DiffCollMongoConnector
 )
+from TMTChatbot.Common.storage.async_mongo_client import (
+    AsyncMongoConnector,
+    AsyncJoinCollMongoConnector,
+    AsyncDiffCollMongoConnector
+)
 from TMTChatbot.Common.singleton import (
     BaseSingleton,
     Singleton
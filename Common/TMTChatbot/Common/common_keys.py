@@ -25,6 +25,7 @@ BILL_GENERATION_SERVICE_URL = "BILL_GENERATION_SERVICE_URL"
 SIZE_PREDICTION_URL = "SIZE_PREDICTION_URL"
 
 API_PORT = "API_PORT"
+API_WORKERS = "API_WORKERS"
 NUM_RETRY = "NUM_RETRY"
 EXTERNAL_FAILED_TIMEOUT = "EXTERNAL_FAILED_TIMEOUT"
 MAX_RAM_CACHE_SIZE = "MAX_RAM_CACHE_SIZE"
@@ -33,8 +34,40 @@ LOGGING_FILE_NAME = "LOGGING_FILE_NAME"
 CACHE_HOST = "CACHE_HOST"
 CACHE_PORT = "CACHE_PORT"
 CACHE_TYPE = "CACHE_TYPE"
+CACHE_SHARDS = "CACHE_SHARDS"
+CACHE_TTL = "CACHE_TTL"
+CACHE_MAX_BYTES = "CACHE_MAX_BYTES"
+CACHE_SOFT_TTL = "CACHE_SOFT_TTL"
+CACHE_HARD_TTL = "CACHE_HARD_TTL"
+CACHE_REFRESH_WORKERS = "CACHE_REFRESH_WORKERS"
+CACHE_SEARCH_TIMEOUT = "CACHE_SEARCH_TIMEOUT"
+CACHE_HEDGE_DELAY = "CACHE_HEDGE_DELAY"
+CACHE_HEDGE_WORKERS = "CACHE_HEDGE_WORKERS"
+CACHE_CODEC = "CACHE_CODEC"
+CACHE_BATCH_SIZE = "CACHE_BATCH_SIZE"
+CACHE_SAVE_QUEUE_SIZE = "CACHE_SAVE_QUEUE_SIZE"
+HTTP_POOL_SIZE = "HTTP_POOL_SIZE"
+HTTP_POOL_BLOCK = "HTTP_POOL_BLOCK"
+HTTP_CONNECT_TIMEOUT = "HTTP_CONNECT_TIMEOUT"
+HTTP_READ_TIMEOUT = "HTTP_READ_TIMEOUT"
+RETRY_BASE_DELAY = "RETRY_BASE_DELAY"
+RETRY_MAX_DELAY = "RETRY_MAX_DELAY"
+RETRY_BUDGET_RATIO = "RETRY_BUDGET_RATIO"
+RETRY_BUDGET_TOKENS = "RETRY_BUDGET_TOKENS"
+CIRCUIT_FAILURE_RATE = "CIRCUIT_FAILURE_RATE"
+CIRCUIT_WINDOW_SIZE = "CIRCUIT_WINDOW_SIZE"
+CIRCUIT_MIN_CALLS = "CIRCUIT_MIN_CALLS"
+CIRCUIT_HALF_OPEN_CALLS = "CIRCUIT_HALF_OPEN_CALLS"
+EXTRACTION_WORKERS = "EXTRACTION_WORKERS"
+REQUEST_TIMEOUT = "REQUEST_TIMEOUT"
+NER_BATCH_SIZE = "NER_BATCH_SIZE"
+INTENT_BATCH_SIZE = "INTENT_BATCH_SIZE"
+BATCH_INTERVAL = "BATCH_INTERVAL"
 CACHE_ENDPOINT = "CACHE_ENDPOINT"
 CACHE_ENDPOINT_TYPE = "CACHE_ENDPOINT_TYPE"
+SCHEMA_CACHE_SIZE = "SCHEMA_CACHE_SIZE"
+SCHEMA_CACHE_TTL = "SCHEMA_CACHE_TTL"
+SCHEMA_CACHE_NEGATIVE_TTL = "SCHEMA_CACHE_NEGATIVE_TTL"
 USE_PROCESS = "USE_PROCESS"
 
 INPUT_BUFFER = "INPUT_BUFFER"
@@ -154,6 +187,18 @@ PARENT_CLASS = "parent_class"
 UPDATED_TIME = "updated_time"
 OBJECT_ID = "id"
 MONGO_OBJECT_ID = "_id"
+MONGO_OR_OP = "$or"
+MONGO_GT_OP = "$gt"
+MONGO_IN_OP = "$in"
+SCHEMA_IDS = "schema_ids"
+SENDER = "sender"
+SCHEMA_INVALIDATION = "schema_invalidation"
+SCHEMA_CACHE = "schema_cache"
+SCHEMA_PRIORITY = "_priority"
+SCHEMA_ETAG_CACHE = "schema_etag_cache"
+SERIALIZED_SCHEMA_CACHE = "serialized_schema_cache"
+ETAG = "ETag"
+IF_NONE_MATCH = "If-None-Match"
 STORAGE_ID = "storage_id"
 OBJECT_HASHED = "hashed"
 ENABLE = "enable"
@@ -161,6 +206,7 @@ NAME = "name"
 CODE = "code"
 MENTIONED_TIMES = "mentioned_times"
 SCHEMA = "schema"
+RELATION = "relation"
 SHOWROOM = "showroom"
 
 BILL_USER = "user"
@@ -70,6 +70,8 @@ class Config(BaseSingleton):
 
         self.api_host = "0.0.0.0"
         self.api_port = api_port if api_port is not None else int(os.getenv(API_PORT, 8080))
+        self.api_workers = int(os.getenv(API_WORKERS, 1))
+        self.schema_invalidation = self.api_workers > 1
 
         self.num_retry = num_try if num_try is not None else int(os.getenv(NUM_RETRY, 5))
         self.external_failed_timeout = external_failed_timeout \
@@ -88,6 +90,48 @@ class Config(BaseSingleton):
         self.cache_endpoint_type = cache_endpoint_type \
             if cache_endpoint_type is not None else os.getenv(CACHE_ENDPOINT_TYPE, "socket")
         self.cache_type = cache_type if cache_type is not None else os.getenv(CACHE_TYPE, "LRU")
+        self.cache_shards = int(os.getenv(CACHE_SHARDS, 16))
+        self.cache_ttl = float(os.getenv(CACHE_TTL, 0))
+        self.cache_max_bytes = int(os.getenv(CACHE_MAX_BYTES, 0))
+        self.cache_soft_ttl = float(os.getenv(CACHE_SOFT_TTL, 0))
+        self.cache_hard_ttl = float(os.getenv(CACHE_HARD_TTL, 0))
+        self.cache_refresh_workers = int(os.getenv(CACHE_REFRESH_WORKERS, 4))
+        self.cache_search_timeout = float(os.getenv(CACHE_SEARCH_TIMEOUT, 1))
+        # negative to call a service only after the remote cache missed
+        self.cache_hedge_delay = float(os.getenv(CACHE_HEDGE_DELAY, -1))
+        self.cache_hedge_workers = int(os.getenv(CACHE_HEDGE_WORKERS, 16))
+        # "<serializer>.<compressor>" of remote cache items, "legacy" for hex zlib json, empty for the fastest installed
+        self.cache_codec = os.getenv(CACHE_CODEC, "")
+        self.cache_batch_size = int(os.getenv(CACHE_BATCH_SIZE, 32))
+        self.cache_save_queue_size = int(os.getenv(CACHE_SAVE_QUEUE_SIZE, 10000))
+        self.http_pool_size = int(os.getenv(HTTP_POOL_SIZE, 100))
+        self.http_pool_block = os.getenv(HTTP_POOL_BLOCK, "false").lower() == "true"
+        self.http_connect_timeout = float(os.getenv(HTTP_CONNECT_TIMEOUT, 3.05))
+        self.http_read_timeout = float(os.getenv(HTTP_READ_TIMEOUT, 30))
+        self.retry_base_delay = float(os.getenv(RETRY_BASE_DELAY, 0.1))
+        self.retry_max_delay = float(os.getenv(RETRY_MAX_DELAY, 2))
+        # retries allowed per request of a service, 0 for no retry budget
+        self.retry_budget_ratio = float(os.getenv(RETRY_BUDGET_RATIO, 0.1))
+        self.retry_budget_tokens = float(os.getenv(RETRY_BUDGET_TOKENS, 10))
+        # external_failed_timeout is the time a circuit stays open before probing its service again
+        self.circuit_failure_rate = float(os.getenv(CIRCUIT_FAILURE_RATE, 0.5))
+        self.circuit_window_size = int(os.getenv(CIRCUIT_WINDOW_SIZE, 20))
+        self.circuit_min_calls = int(os.getenv(CIRCUIT_MIN_CALLS, 5))
+        self.circuit_half_open_calls = int(os.getenv(CIRCUIT_HALF_OPEN_CALLS, 1))
+        # threads running the independent NLP calls of a message, shared by every turn of the process, 0 to run them one
+        # after another. Keep it at the number of route workers (100), or concurrent turns wait for each other
+        self.extraction_workers = int(os.getenv(EXTRACTION_WORKERS, 100))
+        # seconds an api call or a pipeline item has before the services it calls give up, 0 for no deadline
+        self.request_timeout = float(os.getenv(REQUEST_TIMEOUT, 0))
+        # concurrent calls sent to the upstream in one batched request, 1 to send every call alone. The upstream must
+        # accept the batch envelope of BaseDataModel
+        self.ner_batch_size = int(os.getenv(NER_BATCH_SIZE, 1))
+        self.intent_batch_size = int(os.getenv(INTENT_BATCH_SIZE, 1))
+        # seconds the first call of a batch waits for it to fill
+        self.batch_interval = float(os.getenv(BATCH_INTERVAL, 0.005))
+        self.schema_cache_size = int(os.getenv(SCHEMA_CACHE_SIZE, 1000))
+        self.schema_cache_ttl = float(os.getenv(SCHEMA_CACHE_TTL, 3600))
+        self.schema_cache_negative_ttl = float(os.getenv(SCHEMA_CACHE_NEGATIVE_TTL, 30))
         self.graph_qa_url = graph_qa_url if graph_qa_url is not None else os.getenv(GRAPH_QA_URL)
         self.doc_qa_url = doc_qa_url if doc_qa_url is not None else os.getenv(DOC_QA_URL)
         self.intent_url = intent_url if intent_url is not None else os.getenv(INTENT_URL)
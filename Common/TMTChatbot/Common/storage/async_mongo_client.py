@@ -0,0 +1,148 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+
+from TMTChatbot.Common.common_keys import *
+from TMTChatbot.Schema.config.schema_config import BaseSchemaConfig
+from TMTChatbot.Common.storage.base_storage import NOT_CACHED
+from TMTChatbot.Common.storage.mongo_client import (
+    MongoConnector,
+    DiffCollMongoConnector,
+    JoinCollMongoConnector
+)
+
+
+class AsyncMongoConnector(MongoConnector):
+    """
+    Motor-backed variant of MongoConnector. Schema methods are coroutines with the same names as the sync ones, so
+    they can be awaited directly on the event loop instead of blocking a worker thread.
+    """
+    def create_mongo_connector(self):
+        if self.config.mongo_uri is not None:
+            return AsyncIOMotorClient(self.config.mongo_uri)
+        return AsyncIOMotorClient(host=self.config.mongo_host,
+                                  port=self.config.mongo_port,
+                                  username=self.config.mongo_username,
+                                  password=self.config.mongo_password)
+
+    def get_schema_collection(self, storage_id: str):
+        return self.mongo_connector[self.get_database(storage_id)][self.get_collection(SCHEMA.capitalize(),
+                                                                                       storage_id)]
+
+    async def _load_schema_with_class_name(self, class_name: str, parent_class: str, storage_id: str,
+                                           restrict: bool = False) -> dict:
+        for (database, collection_name), pipeline in self._get_schema_lookup_queries(class_name, parent_class,
+                                                                                     storage_id, restrict=restrict):
+            output = await self.mongo_connector[database][collection_name].aggregate(pipeline).to_list(1)
+            if len(output) > 0:
+                return output[0]
+        return None
+
+    async def _load_all_schema_with_class_name(self, class_name: str, storage_id: str):
+        collection = self.get_schema_collection(storage_id)
+        output = await collection.find(self.get_filter_condition({CLASS: class_name}, storage_id)).to_list(None)
+        for schema in output:
+            if MONGO_OBJECT_ID in schema:
+                del schema[MONGO_OBJECT_ID]
+        return output
+
+    def _iter_schemas(self, class_name: str, storage_id: str, after: str = None, limit: int = None,
+                      fields: [str] = None):
+        cursor = self._get_schema_page_cursor(self.get_schema_collection(storage_id), class_name, storage_id,
+                                              after=after, limit=limit, fields=fields)
+        return self._iter_cursor(cursor)
+
+    async def _iter_cursor(self, cursor):
+        async for schema in cursor:
+            yield self._pop_schema_cursor(schema)
+
+    async def _store_schema(self, schema: BaseSchemaConfig, storage_id: str, upsert: bool = True):
+        collection = self.get_schema_collection(storage_id)
+        await collection.replace_one(self._get_schema_filter_condition(schema.class_name(), schema.parent_class,
+                                                                       storage_id),
+                                     self._get_schema_json(schema), upsert=upsert)
+        return schema
+
+    async def _store_schemas(self, schemas: [BaseSchemaConfig], storage_id: str, upsert: bool = True,
+                             ordered: bool = False) -> [str]:
+        if len(schemas) == 0:
+            return []
+        collection = self.get_schema_collection(storage_id)
+        try:
+            await collection.bulk_write(self._get_store_schema_requests(schemas, storage_id, upsert),
+                                        ordered=ordered)
+        except BulkWriteError as e:
+            return self._get_bulk_write_errors(e, len(schemas), ordered)
+        return [None] * len(schemas)
+
+    async def _delete_schema(self, class_name: str, parent_class: str, storage_id: str):
+        collection = self.get_schema_collection(storage_id)
+        await collection.delete_one(self._get_schema_filter_condition(class_name, parent_class, storage_id))
+
+    async def _exist_schemas(self, schemas: [BaseSchemaConfig], storage_id: str) -> [bool]:
+        if len(schemas) == 0:
+            return []
+        collection = self.get_schema_collection(storage_id)
+        existing = await collection.find(*self._get_exist_schemas_query(schemas, storage_id)).to_list(None)
+        return self._match_existing_schemas(schemas, existing)
+
+    async def load_schema_with_class_name(self, class_name: str, parent_class: str, storage_id: str,
+                                          restrict: bool = False) -> BaseSchemaConfig:
+        schema_id = BaseSchemaConfig.generate_schema_id(class_name, parent_class, storage_id)
+        output = self.schema_cache.get(schema_id, NOT_CACHED)
+        if output is NOT_CACHED:
+            schema = await self._load_schema_with_class_name(class_name=class_name, parent_class=parent_class,
+                                                             storage_id=storage_id, restrict=restrict)
+            if schema is not None:
+                output = BaseSchemaConfig(schema)
+            else:
+                output = schema
+            self.schema_cache[schema_id] = output
+        return output
+
+    async def load_all_schema_with_class_name(self, class_name: str, storage_id: str):
+        schema_id = BaseSchemaConfig.generate_schema_id(class_name, "", storage_id)
+        output = self.schema_cache.get(schema_id, NOT_CACHED)
+        if output is NOT_CACHED:
+            output = await self._load_all_schema_with_class_name(class_name=class_name, storage_id=storage_id)
+            self.schema_cache[schema_id] = output
+        return output
+
+    async def load_schema_page(self, class_name: str, storage_id: str, after: str = None, limit: int = None,
+                               fields: [str] = None):
+        schemas = []
+        cursor = None
+        async for cursor, schema in self.iter_schemas(class_name, storage_id, after=after, limit=limit,
+                                                      fields=fields):
+            schemas.append(schema)
+        next_cursor = cursor if limit is not None and len(schemas) == limit else None
+        return schemas, next_cursor
+
+    async def store_schema(self, schema: BaseSchemaConfig, storage_id: str, upsert: bool = True):
+        schema = await self._store_schema(schema, storage_id=storage_id, upsert=upsert)
+        self.update_cached_schemas([schema], [None], storage_id)
+        return schema
+
+    async def store_schemas(self, schemas: [BaseSchemaConfig], storage_id: str, upsert: bool = True,
+                            ordered: bool = False) -> [str]:
+        errors = await self._store_schemas(schemas, storage_id=storage_id, upsert=upsert, ordered=ordered)
+        self.update_cached_schemas(schemas, errors, storage_id)
+        return errors
+
+    async def exist_schemas(self, schemas: [BaseSchemaConfig], storage_id: str) -> [bool]:
+        return await self._exist_schemas(schemas, storage_id=storage_id)
+
+    async def delete_schema(self, schema: BaseSchemaConfig, storage_id: str, class_name: str = None,
+                            parent_class: str = None):
+        if schema is not None:
+            class_name, parent_class = schema.class_name(), schema.parent_class
+        await self._delete_schema(class_name=class_name, parent_class=parent_class, storage_id=storage_id)
+        self.drop_cached_schema(class_name, parent_class, storage_id)
+        return schema
+
+
+class AsyncDiffCollMongoConnector(AsyncMongoConnector, DiffCollMongoConnector):
+    pass
+
+
+class AsyncJoinCollMongoConnector(AsyncMongoConnector, JoinCollMongoConnector):
+    pass
@@ -2,52 +2,115 @@ import logging
 import time
 from threading import Thread
 
+from TMTChatbot.Common.common_keys import *
 from TMTChatbot.Common.singleton import BaseSingleton
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.Schema.config.schema_config import BaseSchemaConfig
 from TMTChatbot.Schema.objects.base_object import BaseObject
 
+# default of schema_cache.get, a cached miss is stored as None
+NOT_CACHED = object()
+
 
 class BaseStorage(BaseSingleton):
-    def __init__(self, config: Config = None, with_sync_worker: bool = False):
+    def __init__(self, config: Config = None, with_sync_worker: bool = False, sync_interval: float = 10,
+                 sync_overlap: float = 5):
         super(BaseStorage, self).__init__()
         self.logger = logging.getLogger(self.__class__.__name__)
         self.config = config if config is not None else Config()
-        self.schema_cache = {}
+        # imported here since ServiceWrapper services import TMTChatbot.Common at module level
+        from TMTChatbot.ServiceWrapper.services.cache import TTLCache
+        self.schema_cache = TTLCache(config=self.config, name=SCHEMA_CACHE, max_size=self.config.schema_cache_size,
+                                     ttl=self.config.schema_cache_ttl,
+                                     negative_ttl=self.config.schema_cache_negative_ttl)
+        self.schema_etags = TTLCache(config=self.config, name=SCHEMA_ETAG_CACHE,
+                                     max_size=self.config.schema_cache_size, ttl=self.config.schema_cache_ttl)
+        self.serialized_schemas = TTLCache(config=self.config, name=SERIALIZED_SCHEMA_CACHE,
+                                           max_size=self.config.schema_cache_size, ttl=self.config.schema_cache_ttl)
+        self.invalidation_channel = None
+        self.with_sync_worker = with_sync_worker
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self.schema_version = time.time()
         if with_sync_worker:
-            self.update_worker = Thread(target=self.back_ground_job, daemon=True)
-            self.update_worker.start()
+            self.start_sync_worker()
+
+    def start_sync_worker(self):
+        self.update_worker = Thread(target=self.back_ground_job, daemon=True)
+        self.update_worker.start()
+
+    @property
+    def cached_storage_ids(self):
+        storage_ids = set()
+        for schema in list(self.schema_cache.values()):
+            if isinstance(schema, BaseSchemaConfig):
+                storage_ids.add(schema.storage_id)
+            elif isinstance(schema, list):
+                storage_ids.update(item[STORAGE_ID] for item in schema if STORAGE_ID in item)
+        return storage_ids
 
     def update_current_schemas(self):
+        """
+        Poll schemas written since the previous poll and apply them to schema_cache. The number of storage queries
+        only depends on the number of cached storages, not on the number of cached schemas. <sync_overlap> seconds
+        are polled twice to tolerate clock skew between writers
+        :return:
+        """
+        since, self.schema_version = self.schema_version - self.sync_overlap, time.time()
+        storage_ids = self.cached_storage_ids
+        changed_schemas = self._load_changed_schemas(storage_ids, since=since) if len(storage_ids) > 0 else []
+        self.apply_changed_schemas(changed_schemas)
+
+    def apply_changed_schemas(self, changed_schemas: [dict]):
+        """
+        Replace cached schemas by their changed version, drop cached schema lists of changed classes and cached
+        missing schemas. Schemas which are not changed are kept as is
+        :param changed_schemas: json of changed schemas
+        :return:
+        """
+        changed_schema_ids = {}
+        changed_all_schema_ids = set()
+        for schema in changed_schemas:
+            class_name, storage_id = schema.get(CLASS), schema.get(STORAGE_ID)
+            changed_schema_ids[BaseSchemaConfig.generate_schema_id(class_name, schema.get(PARENT_CLASS),
+                                                                   storage_id)] = schema
+            changed_all_schema_ids.add(BaseSchemaConfig.generate_schema_id(class_name, "", storage_id))
+
         new_updates = []
-        drop_none_schemas = []
-        for schema_id, schema in self.schema_cache.items():
-            schema: BaseSchemaConfig
-            if schema is None:
-                drop_none_schemas.append(schema_id)
-                continue
-            schema: dict = self._load_schema_with_class_name(class_name=schema.class_name(),
-                                                             parent_class=schema.parent_class,
-                                                             storage_id=schema.storage_id,
-                                                             restrict=True)
-            if schema is not None:
-                schema = BaseSchemaConfig(schema)
-                self.schema_cache[schema_id] = schema
-                new_updates.append(schema_id)
-        for schema_id in drop_none_schemas:
-            if schema_id in self.schema_cache:
-                del self.schema_cache[schema_id]
+        drop_schemas = []
+        for schema_id, schema in list(self.schema_cache.items()):
+            if schema is None or (isinstance(schema, list) and schema_id in changed_all_schema_ids):
+                drop_schemas.append(schema_id)
+            elif isinstance(schema, BaseSchemaConfig):
+                changed_schema = changed_schema_ids.get(schema_id, changed_schema_ids.get(schema.schema_id))
+                if changed_schema is not None and changed_schema.get(UPDATED_TIME) != schema.data.get(UPDATED_TIME):
+                    self.schema_cache[schema_id] = BaseSchemaConfig({**changed_schema})
+                    new_updates.append(schema_id)
+        self.evict_cached_schemas(drop_schemas)
+        self.evict_serialized_schemas(new_updates)
         if len(new_updates) > 0:
             self.logger.info(f"Update {len(new_updates)} schemas of {new_updates}")
-        elif len(drop_none_schemas) > 0:
-            self.logger.info(f"Drop {len(drop_none_schemas)} schemas of {drop_none_schemas}")
+        elif len(drop_schemas) > 0:
+            self.logger.info(f"Drop {len(drop_schemas)} schemas of {drop_schemas}")
         else:
             self.logger.info("No new schema update")
 
     def back_ground_job(self):
+        watch_schemas = True
         while True:
-            self.update_current_schemas()
-            time.sleep(10)
+            if watch_schemas:
+                try:
+                    self._watch_schemas()
+                except NotImplementedError:
+                    watch_schemas = False
+                    self.logger.info("Schema change stream is not available. Poll changed schemas instead")
+                except Exception as e:
+                    self.logger.error(f"Schema change stream closed. {repr(e)}")
+            time.sleep(self.sync_interval)
+            try:
+                self.update_current_schemas()
+            except Exception as e:
+                self.logger.error(f"Cannot update cached schemas. {repr(e)}")
 
     def _load_schema_with_class_name(self, class_name: str, parent_class: str, storage_id: str,
                                      restrict: bool = False) -> dict:
@@ -62,6 +125,30 @@ class BaseStorage(BaseSingleton):
     def _store_schema(self, schema: BaseSchemaConfig, storage_id: str, upsert: bool = True) -> BaseSchemaConfig:
         raise NotImplementedError("Need Implementation")
 
+    def _store_schemas(self, schemas: [BaseSchemaConfig], storage_id: str, upsert: bool = True,
+                       ordered: bool = False) -> [str]:
+        raise NotImplementedError("Need Implementation")
+
+    def _delete_schema(self, class_name: str, parent_class: str, storage_id: str):
+        raise NotImplementedError("Need Implementation")
+
+    def _exist_schemas(self, schemas: [BaseSchemaConfig], storage_id: str) -> [bool]:
+        raise NotImplementedError("Need Implementation")
+
+    def _iter_schemas(self, class_name: str, storage_id: str, after: str = None, limit: int = None,
+                      fields: [str] = None):
+        raise NotImplementedError("Need Implementation")
+
+    def _load_changed_schemas(self, storage_ids: [str], since: float) -> [dict]:
+        raise NotImplementedError("Need Implementation")
+
+    def _watch_schemas(self):
+        """
+        Apply schema changes to schema_cache as soon as they happen. Blocks until the stream is closed
+        :return:
+        """
+        raise NotImplementedError("Need Implementation")
+
     def _load(self, class_name, object_id, storage_id: str, skip_fields: [str] = None):
         raise NotImplementedError("Need Implementation")
 
@@ -94,19 +181,23 @@ class BaseStorage(BaseSingleton):
         raise NotImplementedError("Need Implementation")
 
     def load_schema(self, data_object: BaseObject, storage_id: str, restrict: bool = False):
-        if data_object.schema_id is not None and data_object.schema_id not in self.schema_cache:
+        if data_object.schema_id is None:
+            return None
+        output = self.schema_cache.get(data_object.schema_id, NOT_CACHED)
+        if output is NOT_CACHED:
             schema: dict = self._load_schema(data_object, storage_id=storage_id, restrict=restrict)
             if schema is not None:
                 output = BaseSchemaConfig.from_json(schema)
             else:
                 output = schema
             self.schema_cache[data_object.schema_id] = output
-        return self.schema_cache[data_object.schema_id]
+        return output
 
     def load_schema_with_class_name(self, class_name: str, parent_class: str, storage_id: str,
                                     restrict: bool = False) -> BaseSchemaConfig:
         schema_id = BaseSchemaConfig.generate_schema_id(class_name, parent_class, storage_id)
-        if schema_id not in self.schema_cache:
+        output = self.schema_cache.get(schema_id, NOT_CACHED)
+        if output is NOT_CACHED:
             schema = self._load_schema_with_class_name(class_name=class_name, parent_class=parent_class,
                                                        storage_id=storage_id, restrict=restrict)
             if schema is not None:
@@ -114,20 +205,165 @@ class BaseStorage(BaseSingleton):
             else:
                 output = schema
             self.schema_cache[schema_id] = output
-        return self.schema_cache[schema_id]
+        return output
 
     def load_all_schema_with_class_name(self, class_name: str, storage_id: str):
         schema_id = BaseSchemaConfig.generate_schema_id(class_name, "", storage_id)
-        if schema_id not in self.schema_cache:
-            schema = self._load_all_schema_with_class_name(class_name=class_name, storage_id=storage_id)
-            self.schema_cache[schema_id] = schema
-        return self.schema_cache[schema_id]
+        output = self.schema_cache.get(schema_id, NOT_CACHED)
+        if output is NOT_CACHED:
+            output = self._load_all_schema_with_class_name(class_name=class_name, storage_id=storage_id)
+            self.schema_cache[schema_id] = output
+        return output
+
+    @staticmethod
+    def generate_schema_etag(schema) -> str:
+        data = schema.json if isinstance(schema, BaseSchemaConfig) else schema
+        return f'"{BaseObject.generate_hash(data)}"'
+
+    def get_schema_etag(self, schema_id: str, schema=None):
+        """
+        ETag of the cached version of <schema_id>. It is computed once per cached version and kept in schema_etags
+        next to schema_cache, so a conditional request can be answered without any storage access
+        :param schema_id: id of a schema or of a schema list
+        :param schema: version of <schema_id> to tag, None for the cached one
+        :return: quoted md5 hash of the schema. None if <schema_id> is not cached or is a cached miss
+        """
+        if schema is None:
+            schema = self.schema_cache.get(schema_id)
+        if not schema:
+            return None
+        cached_etag = self.schema_etags.get(schema_id)
+        if cached_etag is not None:
+            cached_schema, etag = cached_etag
+            if cached_schema is schema:
+                return etag
+        etag = self.generate_schema_etag(schema)
+        self.schema_etags[schema_id] = (schema, etag)
+        return etag
+
+    def get_serialized_schema(self, schema_id: str):
+        """
+        Serialized response of the cached version of <schema_id>, kept next to schema_cache
+        :param schema_id: id of a schema
+        :return: (etag, body) stored together by <set_serialized_schema>, so the ETag is always the one of the body.
+        None if they were stored for another version of the schema
+        """
+        serialized = self.serialized_schemas.get(schema_id)
+        if serialized is None:
+            return None
+        schema, etag, body = serialized
+        if self.schema_cache.get(schema_id) is not schema:
+            return None
+        return etag, body
+
+    def set_serialized_schema(self, schema_id: str, schema, etag: str, body: bytes):
+        """
+        Keep the serialized response body of <schema>, the version of <schema_id> which was served, and its ETag
+        """
+        if schema:
+            self.serialized_schemas[schema_id] = (schema, etag, body)
+
+    def evict_serialized_schemas(self, schema_ids: [str]):
+        for schema_id in schema_ids:
+            del self.schema_etags[schema_id]
+            del self.serialized_schemas[schema_id]
+
+    def iter_schemas(self, class_name: str, storage_id: str, after: str = None, limit: int = None,
+                     fields: [str] = None):
+        """
+        Iterate schemas of a class from a storage cursor, without caching them
+        :param class_name: class of schemas
+        :param storage_id: identify which store the schemas are saved
+        :param after: cursor returned with the last schema of the previous page. None to start from the beginning
+        :param limit: maximum number of schemas. None for all
+        :param fields: fields to be returned. None for all
+        :return: iterator of (cursor, schema json)
+        """
+        return self._iter_schemas(class_name, storage_id, after=after, limit=limit, fields=fields)
+
+    def load_schema_page(self, class_name: str, storage_id: str, after: str = None, limit: int = None,
+                         fields: [str] = None):
+        """
+        Load one page of schemas of a class
+        :return: schemas json and the cursor of the next page, None if this is the last page
+        """
+        schemas = []
+        cursor = None
+        for cursor, schema in self.iter_schemas(class_name, storage_id, after=after, limit=limit, fields=fields):
+            schemas.append(schema)
+        next_cursor = cursor if limit is not None and len(schemas) == limit else None
+        return schemas, next_cursor
 
     def store_schema(self, schema: BaseSchemaConfig, storage_id: str, upsert: bool = True):
         schema = self._store_schema(schema, storage_id=storage_id, upsert=upsert)
-        self.schema_cache[schema.schema_id] = schema
+        self.update_cached_schemas([schema], [None], storage_id)
         return schema
 
+    def store_schemas(self, schemas: [BaseSchemaConfig], storage_id: str, upsert: bool = True,
+                      ordered: bool = False) -> [str]:
+        """
+        Store a batch of schemas with one storage round trip and refresh schema_cache once at the end
+        :param schemas: schemas to be stored
+        :param storage_id: identify which store the schemas are saved
+        :param upsert: insert schemas that do not exist yet
+        :param ordered: stop writing at the first failed schema
+        :return: error message of each schema, None if the schema is stored successfully
+        """
+        errors = self._store_schemas(schemas, storage_id=storage_id, upsert=upsert, ordered=ordered)
+        self.update_cached_schemas(schemas, errors, storage_id)
+        return errors
+
+    def update_cached_schemas(self, schemas: [BaseSchemaConfig], errors: [str], storage_id: str):
+        invalidated_schema_ids = []
+        for schema, error in zip(schemas, errors):
+            if error is not None:
+                continue
+            self.schema_cache[schema.schema_id] = schema
+            all_schema_id = BaseSchemaConfig.generate_schema_id(schema.class_name(), "", storage_id)
+            del self.schema_cache[all_schema_id]
+            invalidated_schema_ids += [schema.schema_id, all_schema_id]
+        self.evict_serialized_schemas(invalidated_schema_ids)
+        self.publish_invalidation(invalidated_schema_ids)
+
+    def exist_schemas(self, schemas: [BaseSchemaConfig], storage_id: str) -> [bool]:
+        return self._exist_schemas(schemas, storage_id=storage_id)
+
+    def delete_schema(self, schema: BaseSchemaConfig, storage_id: str, class_name: str = None,
+                      parent_class: str = None):
+        """
+        Delete schema from storage and drop it from schema_cache
+        :param schema: loaded schema to be deleted. If None, <class_name> and <parent_class> are used
+        :param storage_id: identify which store the schema is saved
+        :param class_name: class of schema to be deleted
+        :param parent_class: parent class of schema to be deleted
+        :return: deleted schema
+        """
+        if schema is not None:
+            class_name, parent_class = schema.class_name(), schema.parent_class
+        self._delete_schema(class_name=class_name, parent_class=parent_class, storage_id=storage_id)
+        self.drop_cached_schema(class_name, parent_class, storage_id)
+        return schema
+
+    def drop_cached_schema(self, class_name: str, parent_class: str, storage_id: str):
+        schema_ids = [BaseSchemaConfig.generate_schema_id(class_name, parent_class, storage_id),
+                      BaseSchemaConfig.generate_schema_id(class_name, "", storage_id)]
+        self.evict_cached_schemas(schema_ids)
+        self.publish_invalidation(schema_ids)
+
+    def evict_cached_schemas(self, schema_ids: [str]):
+        for schema_id in schema_ids:
+            del self.schema_cache[schema_id]
+        self.evict_serialized_schemas(schema_ids)
+
+    def publish_invalidation(self, schema_ids: [str]):
+        """
+        Notify sibling worker processes that <schema_ids> are changed, so they drop them from their schema_cache
+        :param schema_ids: changed schema ids
+        :return:
+        """
+        if self.invalidation_channel is not None:
+            self.invalidation_channel.publish(schema_ids)
+
     def load(self, class_name, object_id, storage_id, skip_fields: [str] = None):
         return self._load(class_name, object_id, skip_fields=skip_fields, storage_id=storage_id)
 
@@ -1,24 +1,133 @@
+import os
+import time
+
 import pymongo
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, OperationFailure
 
 from TMTChatbot.Common.common_keys import *
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.Schema.config.schema_config import BaseSchemaConfig
 from TMTChatbot.Schema.objects.base_object import BaseObject
 from TMTChatbot.Common.storage.base_storage import BaseStorage
+from TMTChatbot.Common.storage.schema_invalidation import SchemaInvalidationChannel
 
 
 class MongoConnector(BaseStorage):
-    def __init__(self, config: Config = None):
+    schema_page_batch_size = 100
+
+    def __init__(self, config: Config = None, with_sync_worker: bool = False):
         super(MongoConnector, self).__init__(config=config)
         self.config = config if config is not None else Config()
+        self._mongo_connector = None
+        self._mongo_connector_pid = None
+        if self.config.schema_invalidation:
+            self.invalidation_channel = SchemaInvalidationChannel(self.evict_cached_schemas, config=self.config)
+        self.with_sync_worker = with_sync_worker
+        if with_sync_worker:
+            self.start_sync_worker()
+
+    def create_mongo_connector(self):
         if self.config.mongo_uri is not None:
-            self.mongo_connector = pymongo.MongoClient(self.config.mongo_uri)
-        else:
-            self.mongo_connector = pymongo.MongoClient(host=self.config.mongo_host,
-                                                       port=self.config.mongo_port,
-                                                       username=self.config.mongo_username,
-                                                       password=self.config.mongo_password)
-        self.schema_cache = {}
+            return pymongo.MongoClient(self.config.mongo_uri)
+        return pymongo.MongoClient(host=self.config.mongo_host,
+                                   port=self.config.mongo_port,
+                                   username=self.config.mongo_username,
+                                   password=self.config.mongo_password)
+
+    @property
+    def mongo_connector(self):
+        """
+        Mongo client of the current process. Clients are not fork-safe, so a forked worker opens its own client on
+        first use and drops the schema_cache inherited from its parent, which no invalidation reaches anymore
+        """
+        if self._mongo_connector_pid != os.getpid():
+            if self._mongo_connector_pid is not None:
+                self.schema_cache.clear()
+                if self.with_sync_worker:
+                    self.start_sync_worker()
+            self._mongo_connector = self.create_mongo_connector()
+            self._mongo_connector_pid = os.getpid()
+            if self.invalidation_channel is not None:
+                self.invalidation_channel.start()
+        return self._mongo_connector
+
+    @staticmethod
+    def get_index_declarations(collection_type: str) -> [([str], bool)]:
+        """
+        Indexes required by the queries of this connector, as (fields, unique), per collection type
+        :param collection_type: SCHEMA.capitalize(), RELATION.capitalize() or the class name of an object collection
+        :return:
+        """
+        if collection_type == SCHEMA.capitalize():
+            return [([CLASS, PARENT_CLASS], True), ([UPDATED_TIME], False)]
+        if collection_type == RELATION.capitalize():
+            return [([REL_SRC, REL_DST], False)]
+        return [([OBJECT_ID], False)]
+
+    @staticmethod
+    def get_index_keys(fields: [str]):
+        return [(field, pymongo.ASCENDING) for field in fields]
+
+    @staticmethod
+    def get_collection_type(collection_name: str):
+        return collection_name
+
+    def get_index_databases(self):
+        prefix = f"{self.config.mongo_database}_"
+        return [name for name in self.mongo_connector.list_database_names() if name.startswith(prefix)]
+
+    def get_index_collections(self):
+        """
+        Collections to be indexed, as (database, collection, collection type). Schema collections always come first
+        :return:
+        """
+        output = []
+        for database in self.get_index_databases():
+            collection_names = self.mongo_connector[database].list_collection_names()
+            schema_collection = self.get_collection(SCHEMA.capitalize(), database[len(self.config.mongo_database) + 1:])
+            if schema_collection not in collection_names:
+                collection_names.append(schema_collection)
+            for collection_name in collection_names:
+                if collection_name.startswith("system.") or collection_name == SCHEMA_INVALIDATION:
+                    continue
+                output.append((database, collection_name, self.get_collection_type(collection_name)))
+        output.sort(key=lambda item: item[2] != SCHEMA.capitalize())
+        return output
+
+    def missing_indexes(self) -> [(str, str, [str], bool)]:
+        """
+        Declared indexes which do not exist yet
+        :return: list of (database, collection, fields, unique)
+        """
+        output = []
+        for database, collection_name, collection_type in self.get_index_collections():
+            collection = self.mongo_connector[database][collection_name]
+            existing_keys = [list(index["key"]) for index in collection.index_information().values()]
+            for fields, unique in self.get_index_declarations(collection_type):
+                keys = self.get_index_keys(fields)
+                if [key for key, _ in keys] not in [[key for key, _ in index_keys] for index_keys in existing_keys]:
+                    output.append((database, collection_name, fields, unique))
+        return output
+
+    def ensure_indexes(self) -> [(str, str, [str], bool)]:
+        """
+        Create missing declared indexes. Safe to call at every startup
+        :return: indexes which are still missing, e.g. a unique index over duplicated documents
+        """
+        still_missing = []
+        for database, collection_name, fields, unique in self.missing_indexes():
+            keys = self.get_index_keys(fields)
+            try:
+                self.mongo_connector[database][collection_name].create_index(keys, unique=unique)
+                self.logger.info(f"Created index {keys} on {database}.{collection_name}")
+            except OperationFailure as e:
+                still_missing.append((database, collection_name, fields, unique))
+                self.logger.error(f"Cannot create index {keys} on {database}.{collection_name}. {repr(e)}")
+        if len(still_missing) > 0:
+            self.logger.warning(f"{len(still_missing)} missing indexes: {still_missing}")
+        return still_missing
 
     @staticmethod
     def __to_update_json(data, field_methods: dict = None):
@@ -68,28 +177,64 @@ class MongoConnector(BaseStorage):
     def get_filter_condition(filter_condition: dict, storage_id: str):
         return filter_condition
 
-    def _load_schema_with_class_name(self, class_name: str, parent_class: str, storage_id: str,
-                                     restrict: bool = False) -> dict:
-        collection = self.mongo_connector[self.get_database(storage_id)][self.get_collection(SCHEMA.capitalize(),
-                                                                                             storage_id)]
-        if parent_class is None:
-            output: dict = collection.find_one(self.get_filter_condition({CLASS: class_name}, storage_id))
-        else:
-            output: dict = collection.find_one(self.get_filter_condition({CLASS: class_name,
-                                                                          PARENT_CLASS: parent_class}, storage_id))
-            if output is None and not restrict:
-                output: dict = collection.find_one(self.get_filter_condition({CLASS: class_name}, storage_id))
+    @staticmethod
+    def get_filter_condition_with_storages(filter_condition: dict, storage_ids: [str]):
+        return filter_condition
 
-        if output is None and storage_id != "default":
-            output = self._load_schema_with_class_name(class_name,
-                                                       parent_class,
-                                                       storage_id="default",
-                                                       restrict=restrict)
+    def _get_schema_candidates(self, class_name: str, parent_class: str, storage_id: str,
+                               restrict: bool = False) -> [(str, dict)]:
+        """
+        Filters of the schemas matching a lookup, from the most to the least preferred: tenant with parent class,
+        tenant, default with parent class, default
+        """
+        output = []
+        for candidate_storage_id in ([storage_id] if storage_id == "default" else [storage_id, "default"]):
+            if parent_class is not None:
+                output.append((candidate_storage_id, self.get_filter_condition({CLASS: class_name,
+                                                                                PARENT_CLASS: parent_class},
+                                                                               candidate_storage_id)))
+            if parent_class is None or not restrict:
+                output.append((candidate_storage_id, self.get_filter_condition({CLASS: class_name},
+                                                                               candidate_storage_id)))
+        return output
 
-        if output is not None and MONGO_OBJECT_ID in output:
-            del output[MONGO_OBJECT_ID]
+    def _get_schema_lookup_queries(self, class_name: str, parent_class: str, storage_id: str,
+                                   restrict: bool = False) -> [((str, str), list)]:
+        """
+        One aggregation per schema collection involved in the lookup, in priority order. Candidates sharing a
+        collection are matched at once and ranked with $switch, so JoinCollMongoConnector needs a single round trip
+        """
+        collection_candidates = {}
+        for priority, (candidate_storage_id, filter_condition) in enumerate(
+                self._get_schema_candidates(class_name, parent_class, storage_id, restrict=restrict)):
+            collection_key = (self.get_database(candidate_storage_id),
+                              self.get_collection(SCHEMA.capitalize(), candidate_storage_id))
+            collection_candidates.setdefault(collection_key, []).append((priority, filter_condition))
+
+        output = []
+        for collection_key, candidates in collection_candidates.items():
+            branches = [{"case": {"$and": [{"$eq": [f"${key}", value]} for key, value in filter_condition.items()]},
+                         "then": priority}
+                        for priority, filter_condition in candidates]
+            pipeline = [
+                {"$match": {MONGO_OR_OP: [filter_condition for _, filter_condition in candidates]}},
+                {"$addFields": {SCHEMA_PRIORITY: {"$switch": {"branches": branches, "default": len(branches)}}}},
+                {"$sort": {SCHEMA_PRIORITY: 1, MONGO_OBJECT_ID: 1}},
+                {"$limit": 1},
+                {"$project": {SCHEMA_PRIORITY: 0, MONGO_OBJECT_ID: 0}}
+            ]
+            output.append((collection_key, pipeline))
         return output
 
+    def _load_schema_with_class_name(self, class_name: str, parent_class: str, storage_id: str,
+                                     restrict: bool = False) -> dict:
+        for (database, collection_name), pipeline in self._get_schema_lookup_queries(class_name, parent_class,
+                                                                                     storage_id, restrict=restrict):
+            output = list(self.mongo_connector[database][collection_name].aggregate(pipeline))
+            if len(output) > 0:
+                return output[0]
+        return None
+
     def _load_all_schema_with_class_name(self, class_name: str, storage_id: str):
         collection = self.mongo_connector[self.get_database(storage_id)][self.get_collection(SCHEMA.capitalize(),
                                                                                              storage_id)]
@@ -105,43 +250,159 @@ class MongoConnector(BaseStorage):
                     del schema[MONGO_OBJECT_ID]
         return output
 
-    def _load_schema(self, data_object: BaseObject, storage_id: str, restrict: bool = False) -> dict:
+    def _get_schema_page_query(self, class_name: str, storage_id: str, after: str = None, fields: [str] = None):
+        filter_condition = {CLASS: class_name}
+        if after is not None:
+            filter_condition[MONGO_OBJECT_ID] = {MONGO_GT_OP: ObjectId(after)}
+        projection = {field: 1 for field in fields} if fields else None
+        return self.get_filter_condition(filter_condition, storage_id), projection
+
+    def _get_schema_page_cursor(self, collection, class_name: str, storage_id: str, after: str = None,
+                                limit: int = None, fields: [str] = None):
+        filter_condition, projection = self._get_schema_page_query(class_name, storage_id, after=after, fields=fields)
+        cursor = collection.find(filter_condition, projection) \
+            .sort(MONGO_OBJECT_ID, pymongo.ASCENDING) \
+            .batch_size(self.schema_page_batch_size)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    @staticmethod
+    def _pop_schema_cursor(schema: dict):
+        return str(schema.pop(MONGO_OBJECT_ID)), schema
+
+    def _iter_schemas(self, class_name: str, storage_id: str, after: str = None, limit: int = None,
+                      fields: [str] = None):
         collection = self.mongo_connector[self.get_database(storage_id)][self.get_collection(SCHEMA.capitalize(),
                                                                                              storage_id)]
-        if data_object.parent_class is None:
-            output: dict = collection.find_one(
-                self.get_filter_condition({CLASS: data_object.schema_class_name()}, storage_id))
-        else:
-            output: dict = collection.find_one(self.get_filter_condition({CLASS: data_object.schema_class_name(),
-                                                                          PARENT_CLASS: data_object.parent_class},
-                                                                         storage_id))
-            if output is None and not restrict:
-                output: dict = collection.find_one(self.get_filter_condition({CLASS: data_object.schema_class_name()},
-                                                                             storage_id))
+        cursor = self._get_schema_page_cursor(collection, class_name, storage_id, after=after, limit=limit,
+                                              fields=fields)
+        return (self._pop_schema_cursor(schema) for schema in cursor)
 
-        if output is None and storage_id != "default":
-            output = self._load_schema(data_object, storage_id="default", restrict=restrict)
+    def _load_schema(self, data_object: BaseObject, storage_id: str, restrict: bool = False) -> dict:
+        return self._load_schema_with_class_name(data_object.schema_class_name(), data_object.parent_class,
+                                                 storage_id=storage_id, restrict=restrict)
 
-        if output is not None and MONGO_OBJECT_ID in output:
-            del output[MONGO_OBJECT_ID]
+    def _get_schema_filter_condition(self, class_name: str, parent_class: str, storage_id: str):
+        if parent_class is None:
+            return self.get_filter_condition({CLASS: class_name}, storage_id)
+        return self.get_filter_condition({CLASS: class_name, PARENT_CLASS: parent_class}, storage_id)
 
-        return output
+    @staticmethod
+    def _get_schema_json(schema: BaseSchemaConfig):
+        schema.data[UPDATED_TIME] = time.time()
+        schema_json = schema.json
+        if MONGO_OBJECT_ID in schema_json:
+            del schema_json[MONGO_OBJECT_ID]
+        return schema_json
 
     def _store_schema(self, schema: BaseSchemaConfig, storage_id: str, upsert: bool = True):
         collection = self.mongo_connector[self.get_database(storage_id)][self.get_collection(SCHEMA.capitalize(),
                                                                                              storage_id)]
-        schema_json = schema.json
-        if MONGO_OBJECT_ID in schema_json:
-            del schema_json[MONGO_OBJECT_ID]
-        if schema.parent_class is None:
-            collection.replace_one(self.get_filter_condition({CLASS: schema.class_name()}, storage_id), schema_json,
-                                   upsert=upsert)
-        else:
-            collection.replace_one(self.get_filter_condition({CLASS: schema.class_name(),
-                                                              PARENT_CLASS: schema.parent_class}, storage_id),
-                                   schema_json, upsert=upsert)
+        collection.replace_one(self._get_schema_filter_condition(schema.class_name(), schema.parent_class, storage_id),
+                               self._get_schema_json(schema), upsert=upsert)
         return schema
 
+    def _store_schemas(self, schemas: [BaseSchemaConfig], storage_id: str, upsert: bool = True,
+                       ordered: bool = False) -> [str]:
+        """
+        Write all schemas with a single bulk_write
+        :param schemas: schemas to be replaced (or inserted if upsert)
+        :param storage_id: identify which store the schemas are saved
+        :param upsert: insert schemas that do not exist yet
+        :param ordered: stop at the first failed write. Remaining schemas are reported as not executed
+        :return: error message of each schema, None if the schema is written successfully
+        """
+        if len(schemas) == 0:
+            return []
+        collection = self.mongo_connector[self.get_database(storage_id)][self.get_collection(SCHEMA.capitalize(),
+                                                                                             storage_id)]
+        try:
+            collection.bulk_write(self._get_store_schema_requests(schemas, storage_id, upsert), ordered=ordered)
+        except BulkWriteError as e:
+            return self._get_bulk_write_errors(e, len(schemas), ordered)
+        return [None] * len(schemas)
+
+    def _get_store_schema_requests(self, schemas: [BaseSchemaConfig], storage_id: str, upsert: bool = True):
+        return [ReplaceOne(self._get_schema_filter_condition(schema.class_name(), schema.parent_class, storage_id),
+                           self._get_schema_json(schema), upsert=upsert)
+                for schema in schemas]
+
+    @staticmethod
+    def _get_bulk_write_errors(error: BulkWriteError, num_requests: int, ordered: bool) -> [str]:
+        errors = [None] * num_requests
+        write_errors = error.details.get("writeErrors", [])
+        for write_error in write_errors:
+            errors[write_error["index"]] = write_error.get("errmsg", "Write error")
+        if ordered and len(write_errors) > 0:
+            first_failed = min(write_error["index"] for write_error in write_errors)
+            for idx in range(first_failed + 1, num_requests):
+                errors[idx] = "Not executed due to a previous error in ordered batch"
+        return errors
+
+    def _delete_schema(self, class_name: str, parent_class: str, storage_id: str):
+        collection = self.mongo_connector[self.get_database(storage_id)][self.get_collection(SCHEMA.capitalize(),
+                                                                                             storage_id)]
+        collection.delete_one(self._get_schema_filter_condition(class_name, parent_class, storage_id))
+
+    def _exist_schemas(self, schemas: [BaseSchemaConfig], storage_id: str) -> [bool]:
+        if len(schemas) == 0:
+            return []
+        collection = self.mongo_connector[self.get_database(storage_id)][self.get_collection(SCHEMA.capitalize(),
+                                                                                             storage_id)]
+        existing = collection.find(*self._get_exist_schemas_query(schemas, storage_id))
+        return self._match_existing_schemas(schemas, existing)
+
+    def _get_exist_schemas_query(self, schemas: [BaseSchemaConfig], storage_id: str):
+        conditions = [self._get_schema_filter_condition(schema.class_name(), schema.parent_class, storage_id)
+                      for schema in schemas]
+        return {MONGO_OR_OP: conditions}, {MONGO_OBJECT_ID: 0, CLASS: 1, PARENT_CLASS: 1}
+
+    @staticmethod
+    def _match_existing_schemas(schemas: [BaseSchemaConfig], existing: [dict]) -> [bool]:
+        existing_classes = set()
+        existing_parents = set()
+        for item in existing:
+            existing_classes.add(item.get(CLASS))
+            existing_parents.add((item.get(CLASS), item.get(PARENT_CLASS)))
+        return [schema.class_name() in existing_classes if schema.parent_class is None
+                else (schema.class_name(), schema.parent_class) in existing_parents
+                for schema in schemas]
+
+    def _load_changed_schemas(self, storage_ids: [str], since: float) -> [dict]:
+        collection_storage_ids = {}
+        for storage_id in storage_ids:
+            collection_key = (self.get_database(storage_id), self.get_collection(SCHEMA.capitalize(), storage_id))
+            collection_storage_ids.setdefault(collection_key, []).append(storage_id)
+
+        output = []
+        for (database, collection_name), group_storage_ids in collection_storage_ids.items():
+            collection = self.mongo_connector[database][collection_name]
+            filter_condition = self.get_filter_condition_with_storages({UPDATED_TIME: {MONGO_GT_OP: since}},
+                                                                       group_storage_ids)
+            for schema in collection.find(filter_condition, {MONGO_OBJECT_ID: 0}):
+                if STORAGE_ID not in schema and len(group_storage_ids) == 1:
+                    schema[STORAGE_ID] = group_storage_ids[0]
+                output.append(schema)
+        return output
+
+    def _watch_schemas(self):
+        pipeline = [{"$match": {"ns.db": {"$regex": f"^{self.config.mongo_database}"},
+                                "ns.coll": {"$regex": f"^{SCHEMA.capitalize()}"}}}]
+        try:
+            stream = self.mongo_connector.watch(pipeline, full_document="updateLookup")
+        except (OperationFailure, NotImplementedError) as e:
+            raise NotImplementedError(repr(e))
+        with stream:
+            for change in stream:
+                if change.get("fullDocument") is not None:
+                    schema = change["fullDocument"]
+                    del schema[MONGO_OBJECT_ID]
+                    self.apply_changed_schemas([schema])
+                elif change.get("operationType") in ["delete", "drop", "dropDatabase"]:
+                    # deleted documents only carry their _id, which is not kept in schema_cache
+                    self.schema_cache.clear()
+
     def _load(self, class_name, object_id, storage_id: str, skip_fields: [str] = None):
         collection = self.mongo_connector[self.get_database(storage_id)][self.get_collection(class_name,
                                                                                              storage_id)]
@@ -239,6 +500,20 @@ class DiffCollMongoConnector(MongoConnector):
     def get_collection(class_name: str, storage_id: str = None):
         return f"{class_name}_{storage_id}"
 
+    def get_index_databases(self):
+        return [self.config.mongo_database]
+
+    def get_index_collections(self):
+        output = [(self.config.mongo_database, collection_name, self.get_collection_type(collection_name))
+                  for collection_name in self.mongo_connector[self.config.mongo_database].list_collection_names()
+                  if not collection_name.startswith("system.") and collection_name != SCHEMA_INVALIDATION]
+        output.sort(key=lambda item: item[2] != SCHEMA.capitalize())
+        return output
+
+    @staticmethod
+    def get_collection_type(collection_name: str):
+        return collection_name.split("_")[0]
+
 
 class JoinCollMongoConnector(MongoConnector):
     def get_database(self, storage_id: str):
@@ -252,3 +527,15 @@ class JoinCollMongoConnector(MongoConnector):
     def get_filter_condition(filter_condition: dict, storage_id: str):
         filter_condition[STORAGE_ID] = storage_id
         return filter_condition
+
+    def get_index_databases(self):
+        return [self.config.mongo_database]
+
+    @staticmethod
+    def get_index_keys(fields: [str]):
+        return [(STORAGE_ID, pymongo.ASCENDING)] + MongoConnector.get_index_keys(fields)
+
+    @staticmethod
+    def get_filter_condition_with_storages(filter_condition: dict, storage_ids: [str]):
+        filter_condition[STORAGE_ID] = {MONGO_IN_OP: storage_ids}
+        return filter_condition
@@ -0,0 +1,114 @@
+import os
+import time
+import socket
+import logging
+from queue import Queue
+from threading import Thread
+
+import pymongo
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from TMTChatbot.Common.common_keys import *
+from TMTChatbot.Common.config.config import Config
+
+
+class SchemaInvalidationChannel:
+    """
+    Broadcast schema cache invalidations between worker processes through a capped Mongo collection.
+    A process publishes the schema ids it has written, every sibling process tails the collection and evicts those
+    ids from its own schema_cache. Threads and MongoClient are created per process by <start>, so the channel can be
+    built before workers are forked.
+    """
+    def __init__(self, on_invalidate, config: Config = None, collection_size: int = 1024 * 1024,
+                 retry_interval: float = 1, clock_skew: float = 1):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = config if config is not None else Config()
+        self.on_invalidate = on_invalidate
+        self.collection_size = collection_size
+        self.retry_interval = retry_interval
+        self.clock_skew = clock_skew
+        self.pid = None
+        self.sender = None
+        self.mongo_connector = None
+        self.publish_queue = None
+
+    def create_mongo_connector(self):
+        if self.config.mongo_uri is not None:
+            return pymongo.MongoClient(self.config.mongo_uri)
+        return pymongo.MongoClient(host=self.config.mongo_host,
+                                   port=self.config.mongo_port,
+                                   username=self.config.mongo_username,
+                                   password=self.config.mongo_password)
+
+    @property
+    def started(self):
+        return self.pid == os.getpid()
+
+    def start(self):
+        """
+        Start publisher and listener threads of the current process. Does nothing if they are already running
+        :return:
+        """
+        if self.started:
+            return
+        self.pid = os.getpid()
+        self.sender = f"{socket.gethostname()}:{self.pid}"
+        self.mongo_connector = self.create_mongo_connector()
+        self.publish_queue = Queue()
+        Thread(target=self.publish_job, daemon=True).start()
+        Thread(target=self.listen_job, daemon=True).start()
+        self.logger.info(f"{self.__class__.__name__} started in {self.sender}")
+
+    def get_collection(self):
+        database = self.mongo_connector[self.config.mongo_database]
+        try:
+            database.create_collection(SCHEMA_INVALIDATION, capped=True, size=self.collection_size)
+        except CollectionInvalid:
+            pass
+        return database[SCHEMA_INVALIDATION]
+
+    def publish(self, schema_ids: [str]):
+        """
+        Queue invalidation of <schema_ids> for sibling processes. Never blocks on Mongo, so it is safe to call from
+        an event loop
+        :param schema_ids: ids of schemas which are changed by this process
+        :return:
+        """
+        if len(schema_ids) == 0:
+            return
+        self.start()
+        self.publish_queue.put(list(schema_ids))
+
+    def publish_job(self):
+        collection = None
+        while True:
+            schema_ids = self.publish_queue.get()
+            try:
+                if collection is None:
+                    collection = self.get_collection()
+                collection.insert_one({SENDER: self.sender, SCHEMA_IDS: schema_ids, UPDATED_TIME: time.time()})
+            except PyMongoError as e:
+                self.logger.error(f"Cannot publish invalidation of {schema_ids}. {repr(e)}")
+
+    def listen_job(self):
+        # Messages are filtered by time on the client side since a tailable cursor whose query matches nothing is
+        # closed by the server. Old messages within <clock_skew> are evicted again, which is harmless
+        since = time.time()
+        while True:
+            try:
+                collection = self.get_collection()
+                if collection.find_one() is None:
+                    collection.insert_one({SENDER: self.sender, SCHEMA_IDS: [], UPDATED_TIME: since})
+                cursor = collection.find(cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    for message in cursor:
+                        if message.get(UPDATED_TIME, 0) < since - self.clock_skew \
+                                or message.get(SENDER) == self.sender:
+                            continue
+                        if len(message.get(SCHEMA_IDS, [])) > 0:
+                            self.on_invalidate(message[SCHEMA_IDS])
+            except PyMongoError as e:
+                self.logger.error(f"Invalidation listener of {self.sender} failed. {repr(e)}")
+            since = time.time()
+            time.sleep(self.retry_interval)
@@ -0,0 +1,95 @@
+"""
+Payload size and encode/decode time of the remote cache codecs, for graph QA results of growing sub graphs. The
+legacy codec is the former hexadecimal zlib json. Codecs whose libraries are not installed are skipped.
+
+    python -m TMTChatbot.Examples.benchmark.cache_codec --nodes 1 10 50
+"""
+import argparse
+import random
+import time
+
+from TMTChatbot.ServiceWrapper.services.codec import CacheCodec, LEGACY
+
+CODECS = [LEGACY, "json.zlib", "json.raw", "orjson.zlib", "orjson.zstd", "orjson.lz4", "msgpack.zstd", "msgpack.lz4"]
+WORDS = ["áo", "sơ mi", "trắng", "cotton", "size", "màu", "xanh", "đen", "giá", "nghìn", "đồng", "còn", "hàng",
+         "chất liệu", "thoáng", "mát", "form", "rộng", "nam", "nữ"]
+
+
+def make_text(rand: random.Random, num_words: int):
+    return " ".join(rand.choice(WORDS) for _ in range(num_words))
+
+
+def make_graph_qa_result(num_nodes: int, seed: int = 0):
+    """
+    Answer of the graph QA service with the sub graph it was asked about, as cached by BaseServiceWithCache
+    """
+    rand = random.Random(seed)
+    nodes = [{
+        "id": f"{rand.getrandbits(64):016x}",
+        "name": make_text(rand, 4),
+        "class": "Shirt",
+        "parent_class": "Product",
+        "aliases": [make_text(rand, 3) for _ in range(3)],
+        "attributes": {
+            "color": make_text(rand, 2),
+            "size": rand.choice(["S", "M", "L", "XL"]),
+            "price": rand.randrange(100, 1000) * 1000,
+            "material": make_text(rand, 2),
+            "description": make_text(rand, 60)
+        },
+        "image_urls": [f"https://cdn.shop.vn/images/{rand.getrandbits(64):016x}.jpg" for _ in range(2)],
+        "score": rand.random()
+    } for _ in range(num_nodes)]
+    relations = [{"src": nodes[idx]["id"], "dst": nodes[idx + 1]["id"], "name": "similar_to"}
+                 for idx in range(num_nodes - 1)]
+    return {
+        "data": {
+            "question": make_text(rand, 12) + "?",
+            "answer": make_text(rand, 30),
+            "storage_id": "benchmark",
+            "nodes": nodes,
+            "relations": relations
+        }
+    }
+
+
+def measure(codec: CacheCodec, data, repeat: int):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        encoded = codec.encode(data)
+    encode_time = (time.perf_counter() - start_time) / repeat
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        decoded = CacheCodec.decode(encoded)
+    decode_time = (time.perf_counter() - start_time) / repeat
+    assert decoded == data, codec.name
+    return len(encoded), encode_time, decode_time
+
+
+def is_installed(name: str):
+    if name == LEGACY:
+        return True
+    serializer_name, compressor_name = name.split(".")
+    return CacheCodec.serializers[serializer_name].available and CacheCodec.compressors[compressor_name].available
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1, 10, 50], help="nodes per graph QA result")
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--codecs", nargs="+", default=CODECS)
+    args = parser.parse_args()
+
+    for num_nodes in args.nodes:
+        result = make_graph_qa_result(num_nodes)
+        print(f"GRAPH QA RESULT WITH {num_nodes} NODES")
+        print(f"    {'codec':<14} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+        legacy = None
+        for codec_name in args.codecs:
+            if not is_installed(codec_name):
+                print(f"    {codec_name:<14} not installed")
+                continue
+            size, encode_time, decode_time = measure(CacheCodec.get_codec(codec_name), result, args.repeat)
+            legacy = legacy if legacy is not None else size
+            print(f"    {codec_name:<14} {size:>8} {encode_time * 1e6:>10.1f} {decode_time * 1e6:>10.1f}  "
+                  f"{size / legacy:.2f}x size")
@@ -0,0 +1,141 @@
+"""
+Throughput of IntentService called from many route workers (threads) or coroutines against a local stub model server,
+with every call sent alone and with micro-batching. The stub runs one model at a time, as a GPU server does, and a
+forward pass costs a fixed overhead plus a cost per item, so batched calls share the overhead.
+
+    python -m TMTChatbot.Examples.benchmark.external_batching --threads 32 --requests 50 --batch_size 16
+"""
+import argparse
+import asyncio
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock
+
+from TMTChatbot.AlgoClients.intent_service import IntentService, AsyncIntentService
+from TMTChatbot.Common.config.config import Config
+from TMTChatbot.Schema.objects.common.data_model import BATCH
+from TMTChatbot.Schema.objects.conversation.conversation import Message
+from TMTChatbot.ServiceWrapper.services.session_pool import AsyncSessionPool
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    model_lock = Lock()
+    fixed_cost = 0.01
+    item_cost = 0.001
+    forward_passes = 0
+
+    @staticmethod
+    def answer(item: dict):
+        return {"index": item.get("index"), "data": {"intents": [{"tag": "ask_product", "score": 0.9}]}}
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        items = body["data"].get(BATCH) if isinstance(body.get("data"), dict) else None
+        with self.model_lock:
+            StubHandler.forward_passes += 1
+            time.sleep(self.fixed_cost + self.item_cost * (len(items) if items is not None else 1))
+        if items is not None:
+            output = {"data": {BATCH: [self.answer(item) for item in items]}}
+        else:
+            output = self.answer(body)
+        data = json.dumps(output).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def reset(service: IntentService, batch_size: int):
+    service.batch_size = batch_size
+    service.batcher = None
+    StubHandler.forward_passes = 0
+
+
+def worker_job(service: IntentService, num_requests: int, latencies: list):
+    for i in range(num_requests):
+        start_time = time.perf_counter()
+        message = service(Message(message=f"còn áo sơ mi trắng size M không? {i}", storage_id="benchmark"))
+        if message is not None and len(message.intents) > 0:
+            latencies.append(time.perf_counter() - start_time)
+
+
+def run_threads(service: IntentService, batch_size: int, num_threads: int, num_requests: int):
+    reset(service, batch_size)
+    latencies = []
+    workers = [Thread(target=worker_job, args=(service, num_requests, latencies), daemon=True)
+               for _ in range(num_threads)]
+    start_time = time.perf_counter()
+    [worker.start() for worker in workers]
+    [worker.join() for worker in workers]
+    return report(latencies, time.perf_counter() - start_time)
+
+
+async def async_worker_job(service: AsyncIntentService, num_requests: int, latencies: list):
+    for i in range(num_requests):
+        start_time = time.perf_counter()
+        message = await service(Message(message=f"còn áo sơ mi trắng size M không? {i}", storage_id="benchmark"))
+        if message is not None and len(message.intents) > 0:
+            latencies.append(time.perf_counter() - start_time)
+
+
+def run_async(service: AsyncIntentService, batch_size: int, num_tasks: int, num_requests: int):
+    reset(service, batch_size)
+    latencies = []
+
+    async def run_tasks():
+        await asyncio.gather(*[async_worker_job(service, num_requests, latencies) for _ in range(num_tasks)])
+        await AsyncSessionPool(service.config).close()
+
+    start_time = time.perf_counter()
+    asyncio.get_event_loop().run_until_complete(run_tasks())
+    return report(latencies, time.perf_counter() - start_time)
+
+
+def report(latencies: list, total_time: float):
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if len(latencies) > 0 else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if len(latencies) > 0 else 0
+    return len(latencies) / total_time, p50, p99, StubHandler.forward_passes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32, help="concurrent route workers or coroutines")
+    parser.add_argument("--requests", type=int, default=50, help="requests per worker")
+    parser.add_argument("--batch_size", type=int, default=16, help="max calls per batched request")
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds a batch waits to fill")
+    args = parser.parse_args()
+
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    _config = Config(mongo_host="localhost", mongo_port=27017,
+                     intent_url=f"http://127.0.0.1:{server.server_address[1]}")
+    _config.cache_endpoint_type = "rest"
+    _config.http_pool_size = args.threads
+    _config.batch_interval = args.interval
+
+    print(f"WORKERS: {args.threads}, REQUESTS: {args.threads * args.requests}, BATCH_SIZE: {args.batch_size}, "
+          f"INTERVAL: {args.interval}s, MODEL COST: {StubHandler.fixed_cost}s + {StubHandler.item_cost}s/item")
+    for mode, service, run in [("threads", IntentService(config=_config, storage=None), run_threads),
+                               ("async", AsyncIntentService(config=_config, storage=None), run_async)]:
+        results = {}
+        for name, batch_size in [("single", 1), ("batched", args.batch_size)]:
+            results[name] = run(service, batch_size, args.threads, args.requests)
+            throughput, p50, p99, forward_passes = results[name]
+            print(f"{mode:<8} {name:<8} {throughput:>8.0f} requests/s, p50 {p50:>7.1f} ms, p99 {p99:>7.1f} ms, "
+                  f"{forward_passes:>6} forward passes")
+        print(f"{mode:<8} speedup: {results['batched'][0] / results['single'][0]:.2f}x, "
+              f"batcher: {service.get_batcher().info}")
+    server.shutdown()
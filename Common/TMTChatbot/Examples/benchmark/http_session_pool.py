@@ -0,0 +1,119 @@
+"""
+Throughput of an external service called from many route workers against a local stub HTTP server, with the former
+session handling (one default requests session per service, recreated after every failed request) and with the
+shared SessionPool. The stub server fails a ratio of requests to show the cost of dropping the session on errors.
+
+    python -m TMTChatbot.Examples.benchmark.http_session_pool --threads 32 --requests 200 --error_rate 0.01
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import requests
+
+from TMTChatbot.Common.config.config import Config
+from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
+from TMTChatbot.ServiceWrapper.external_service_wrapper import BaseExternalService
+from TMTChatbot.ServiceWrapper.services.session_pool import SessionPool
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    error_rate = 0
+    connections = 0
+
+    def setup(self):
+        super(StubHandler, self).setup()
+        StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if random.random() < self.error_rate:
+            status, body = 500, b"{}"
+        else:
+            status, body = 200, json.dumps({"data": {"answer": "ok"}}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class PooledService(BaseExternalService):
+    def __init__(self, config: Config = None):
+        super(PooledService, self).__init__(config=config)
+        self.api_url = None
+
+    def _call_api(self, input_data: BaseDataModel) -> BaseDataModel:
+        response = self.session.post(self.api_url, json=input_data.dict(), timeout=self.session_pool.timeout)
+        response.raise_for_status()
+        return BaseDataModel(**response.json())
+
+
+class LegacyService(PooledService):
+    """
+    Former session handling of BaseService, kept for comparison only
+    """
+    def init_session(self, force=False):
+        if self.session is None or force:
+            self.session = requests.session()
+
+    def call_back_func(self):
+        self.init_session(True)
+
+
+def worker_job(service: BaseExternalService, num_requests: int, counters: dict):
+    data = BaseDataModel(data={"question": "còn áo sơ mi trắng size M không?"})
+    for _ in range(num_requests):
+        if service.make_request(lambda: service._call_api(data), num_retry=3) is not None:
+            counters["success"] += 1
+
+
+def run(service: BaseExternalService, url: str, num_threads: int, num_requests: int):
+    service.api_url = url
+    service.session = None
+    StubHandler.connections = 0
+    counters = {"success": 0}
+    workers = [Thread(target=worker_job, args=(service, num_requests, counters), daemon=True)
+               for _ in range(num_threads)]
+    start_time = time.perf_counter()
+    [worker.start() for worker in workers]
+    [worker.join() for worker in workers]
+    total_time = time.perf_counter() - start_time
+    return counters["success"] / total_time, StubHandler.connections
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32, help="concurrent route workers")
+    parser.add_argument("--requests", type=int, default=200, help="requests per worker")
+    parser.add_argument("--error_rate", type=float, default=0.01, help="ratio of failed stub responses")
+    args = parser.parse_args()
+
+    _config = Config(mongo_host="localhost", mongo_port=27017)
+    _config.cache_endpoint_type = "rest"
+    _config.http_pool_size = args.threads
+    StubHandler.error_rate = args.error_rate
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    _url = f"http://127.0.0.1:{server.server_address[1]}/process"
+
+    print(f"THREADS: {args.threads}, REQUESTS: {args.threads * args.requests}, ERROR_RATE: {args.error_rate}")
+    results = {}
+    for name, service_class in [("legacy", LegacyService), ("pooled", PooledService)]:
+        results[name] = run(service_class(config=_config), _url, args.threads, args.requests)
+        print(f"{name:<8} {results[name][0]:>10.0f} requests/s, {results[name][1]:>6} connections opened")
+    print(f"speedup: {results['pooled'][0] / results['legacy'][0]:.2f}x")
+    print(f"pool: {SessionPool(_config).info}")
+    server.shutdown()
@@ -0,0 +1,114 @@
+"""
+Operations per second of the RAM LRUCache against the former implementation, which sorted its key list on every
+access, for growing cache sizes. Every operation follows BaseServiceWithRAMCache.make_request: a membership test,
+then a read on hit or a write on miss.
+
+    python -m TMTChatbot.Examples.benchmark.ram_cache_ops --sizes 1000 10000 100000
+"""
+import argparse
+import random
+import time
+
+from TMTChatbot.Common.config.config import Config
+from TMTChatbot.ServiceWrapper.services.cache import Cache, LRUCache
+
+
+class SortedLRUCache(Cache):
+    """
+    Copy of the former LRUCache, kept for comparison only
+    """
+    def __init__(self, config: Config = None, name: str = None, max_size: int = None):
+        super(SortedLRUCache, self).__init__(config=config, name=name, max_size=max_size)
+        self.timer = {}
+        self.key_list = []
+
+    def sort_key_list(self):
+        self.key_list.sort(key=lambda item: self.timer[item], reverse=True)
+
+    def __contains__(self, item):
+        output = item in self.storage
+        if output:
+            self.timer[item] = time.time()
+            self.sort_key_list()
+        return output
+
+    def __getitem__(self, item):
+        output = self.storage.get(item)
+        self.timer[item] = time.time()
+        self.sort_key_list()
+        return output
+
+    def __delitem__(self, key):
+        if key in self.storage:
+            del self.storage[key]
+            del self.timer[key]
+            self.key_list.remove(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.storage:
+            self.key_list.append(key)
+        self.timer[key] = time.time()
+        self.storage[key] = value
+        self.sort_key_list()
+        self.drop()
+
+    def size(self):
+        return len(self.key_list)
+
+    def get_remove_key(self):
+        return self.key_list[-1]
+
+    def clear(self):
+        self.storage = {}
+        self.timer = {}
+        self.key_list = []
+
+
+def fill(cache: Cache, size: int):
+    # filled through the internal structures, since filling the sorted cache through __setitem__ is quadratic
+    if isinstance(cache, SortedLRUCache):
+        now = time.time()
+        for idx in range(size):
+            cache.storage[idx] = idx
+            cache.timer[idx] = now + idx
+        cache.key_list = list(range(size))
+        cache.sort_key_list()
+    else:
+        for idx in range(size):
+            cache.storage[idx] = idx
+
+
+def measure(cache: Cache, size: int, hit_rate: float, duration: float, max_ops: int):
+    num_keys = int(size / hit_rate)
+    keys = [random.randrange(num_keys) for _ in range(max_ops)]
+    num_ops = 0
+    start_time = time.perf_counter()
+    deadline = start_time + duration
+    for key in keys:
+        if key in cache:
+            _ = cache[key]
+        else:
+            cache[key] = key
+        num_ops += 1
+        if num_ops % 16 == 0 and time.perf_counter() > deadline:
+            break
+    return num_ops / (time.perf_counter() - start_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--hit_rate", type=float, default=0.9, help="expected ratio of requested keys in cache")
+    parser.add_argument("--duration", type=float, default=2, help="maximum seconds per measure")
+    parser.add_argument("--max_ops", type=int, default=200000, help="maximum operations per measure")
+    args = parser.parse_args()
+
+    _config = Config(mongo_host="localhost", mongo_port=27017)
+    print(f"{'entries':>8} {'sorted ops/s':>14} {'ordered ops/s':>14} {'speedup':>9}")
+    for _size in args.sizes:
+        results = []
+        for cache_class in [SortedLRUCache, LRUCache]:
+            _cache = cache_class(config=_config, max_size=_size + 1)
+            fill(_cache, _size)
+            results.append(measure(_cache, _size, args.hit_rate, args.duration, args.max_ops))
+        print(f"{_size:>8} {results[0]:>14.0f} {results[1]:>14.0f} {results[1] / results[0]:>8.0f}x")
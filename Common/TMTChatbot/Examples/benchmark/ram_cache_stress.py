@@ -0,0 +1,118 @@
+"""
+Stress the RAM caches from many threads, as the 100 route workers of WorkerManager do, and check that every cache
+is still consistent afterwards. Unsynchronized caches may raise, block or exceed their size, ShardedCache must not.
+
+    python -m TMTChatbot.Examples.benchmark.ram_cache_stress --threads 100 --duration 5
+"""
+import argparse
+import random
+import time
+from threading import Thread
+
+from TMTChatbot.Common.config.config import Config
+from TMTChatbot.ServiceWrapper.services.cache import Cache, FIFOCache, LRUCache, ShardedCache
+
+
+def worker_job(cache: Cache, num_keys: int, deadline: float, counters: dict, errors: list):
+    rand = random.Random()
+    num_ops = 0
+    while time.perf_counter() < deadline:
+        key = rand.randrange(num_keys)
+        try:
+            operation = rand.random()
+            if operation < 0.6:
+                if key in cache:
+                    _ = cache[key]
+            elif operation < 0.95:
+                cache[key] = key
+            elif operation < 0.9995:
+                del cache[key]
+            else:
+                cache.items()
+        except Exception as e:
+            errors.append(repr(e))
+        num_ops += 1
+    counters["ops"] += num_ops
+
+
+def check(cache: Cache):
+    problems = []
+    if cache.size() > cache.max_size:
+        problems.append(f"size {cache.size()} > max_size {cache.max_size}")
+    if isinstance(cache, FIFOCache) and cache.queue.qsize() != len(cache.storage):
+        problems.append(f"queue holds {cache.queue.qsize()} keys but storage holds {len(cache.storage)}")
+    if isinstance(cache, ShardedCache):
+        for shard in cache.shards:
+            if shard.size() > shard.max_size:
+                problems.append(f"shard {shard.name} holds {shard.size()} > {shard.max_size}")
+            if any(cache.get_shard(key)[0] is not shard for key in shard.keys()):
+                problems.append(f"shard {shard.name} holds keys of another shard")
+    for key, value in cache.items():
+        if key != value:
+            problems.append(f"key {key} holds {value}")
+            break
+    return problems
+
+
+def check_capacity(config: Config, max_size: int, num_shards: int):
+    """
+    Fill a ShardedCache with many more keys than it holds, from one thread: it must keep max_size keys
+    """
+    cache = ShardedCache(config=config, max_size=max_size, num_shards=num_shards)
+    for key in range(max_size * 20):
+        cache[key] = key
+    if cache.size() != max_size:
+        return [f"max_size {max_size}, {num_shards} shards: holds {cache.size()} keys"]
+    return []
+
+
+def run(cache: Cache, num_threads: int, num_keys: int, duration: float):
+    counters = {"ops": 0}
+    errors = []
+    deadline = time.perf_counter() + duration
+    workers = [Thread(target=worker_job, args=(cache, num_keys, deadline, counters, errors), daemon=True)
+               for _ in range(num_threads)]
+    start_time = time.perf_counter()
+    [worker.start() for worker in workers]
+    [worker.join(timeout=duration + 5) for worker in workers]
+    total_time = time.perf_counter() - start_time
+    stuck = sum(worker.is_alive() for worker in workers)
+    problems = ["cannot check a cache with stuck threads"] if stuck > 0 else check(cache)
+    return counters["ops"] / total_time, errors, stuck, problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=5, help="seconds per cache")
+    parser.add_argument("--max_size", type=int, default=1000)
+    parser.add_argument("--keys", type=int, default=5000, help="number of distinct keys")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--cache_types", nargs="+", default=["FIFO", "LRU", "SHARDED"])
+    args = parser.parse_args()
+
+    _config = Config(mongo_host="localhost", mongo_port=27017)
+    cache_classes = {"FIFO": FIFOCache, "LRU": LRUCache, "SHARDED": ShardedCache}
+    passed = True
+    for cache_type in args.cache_types:
+        if cache_type == "SHARDED":
+            _cache = ShardedCache(config=_config, max_size=args.max_size, num_shards=args.shards)
+        else:
+            _cache = cache_classes[cache_type](config=_config, max_size=args.max_size)
+        ops_per_second, _errors, _stuck, _problems = run(_cache, args.threads, args.keys, args.duration)
+        print(f"{cache_type:<8} {ops_per_second:>10.0f} ops/s, ERRORS: {len(_errors)}, STUCK THREADS: {_stuck}, "
+              f"INCONSISTENCIES: {len(_problems)}")
+        for message in sorted(set(_errors))[:3] + _problems[:3]:
+            print(f"    {message}")
+        if cache_type == "SHARDED":
+            passed = len(_errors) == 0 and _stuck == 0 and len(_problems) == 0
+    # small caches, with fewer keys than shards or a max_size not divisible by the number of shards
+    capacity_problems = []
+    for _max_size in [1, 4, args.shards, args.shards + 1, args.max_size]:
+        capacity_problems += check_capacity(_config, _max_size, args.shards)
+    print(f"CAPACITY PROBLEMS: {len(capacity_problems)}")
+    for message in capacity_problems:
+        print(f"    {message}")
+    passed = passed and len(capacity_problems) == 0
+    print("SHARDED cache is consistent" if passed else "SHARDED cache FAILED")
+    exit(0 if passed else 1)
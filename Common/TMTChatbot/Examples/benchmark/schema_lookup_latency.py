@@ -0,0 +1,84 @@
+"""
+Compare the single-query schema lookup of MongoConnector with the former chain of find_one calls (tenant with parent,
+tenant, then the same against the default tenant) on a local mongod.
+
+    python -m TMTChatbot.Examples.benchmark.schema_lookup_latency --host localhost --port 27017 --repeat 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from TMTChatbot.Common.common_keys import *
+from TMTChatbot.Common.config.config import Config
+from TMTChatbot.Schema.config.schema_config import BaseSchemaConfig
+
+
+def load_schema_sequentially(storage, class_name: str, parent_class: str, storage_id: str, restrict: bool = False):
+    collection = storage.mongo_connector[storage.get_database(storage_id)][storage.get_collection(SCHEMA.capitalize(),
+                                                                                                  storage_id)]
+    if parent_class is None:
+        output = collection.find_one(storage.get_filter_condition({CLASS: class_name}, storage_id))
+    else:
+        output = collection.find_one(storage.get_filter_condition({CLASS: class_name, PARENT_CLASS: parent_class},
+                                                                  storage_id))
+        if output is None and not restrict:
+            output = collection.find_one(storage.get_filter_condition({CLASS: class_name}, storage_id))
+    if output is None and storage_id != "default":
+        output = load_schema_sequentially(storage, class_name, parent_class, storage_id="default", restrict=restrict)
+    return output
+
+
+def make_schema(class_name: str, parent_class: str, storage_id: str):
+    return BaseSchemaConfig({
+        CLASS: class_name,
+        PARENT_CLASS: parent_class,
+        REQUIRED_ATTRIBUTES: {"color": True},
+        VARIANT_ATTRIBUTES: {},
+        ATTRIBUTES: {},
+        USER_REQUIRED_ATTRIBUTES: {},
+        STORAGE_ID: storage_id
+    })
+
+
+def measure(func, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=27017)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--schemas", type=int, default=1000, help="schemas per tenant")
+    args = parser.parse_args()
+
+    Config(mongo_host=args.host, mongo_port=args.port, mongo_database="SchemaLookupBenchmark")
+    from TMTChatbot.Common.storage.mongo_client import JoinCollMongoConnector
+
+    _storage = JoinCollMongoConnector(config=Config())
+    _storage.ensure_indexes()
+    for _storage_id in ["tenant", "default"]:
+        _storage.store_schemas([make_schema(f"Class{idx}", f"Parent{idx}", _storage_id) for idx in range(args.schemas)],
+                               storage_id=_storage_id)
+    _storage.store_schemas([make_schema("DefaultOnly", "Parent", "default")], storage_id="default")
+
+    cases = {
+        "tenant + parent hit": ("Class1", "Parent1", "tenant"),
+        "tenant class fallback": ("Class1", "Unknown", "tenant"),
+        "default + parent": ("DefaultOnly", "Parent", "tenant"),
+        "miss": ("Unknown", "Unknown", "tenant"),
+    }
+    print(f"{'case':<24} {'chain p50':>10} {'chain p99':>10} {'single p50':>11} {'single p99':>11}  (ms)")
+    for case, (_class_name, _parent_class, _storage_id) in cases.items():
+        chain = measure(lambda: load_schema_sequentially(_storage, _class_name, _parent_class, _storage_id),
+                        args.repeat)
+        single = measure(lambda: _storage._load_schema_with_class_name(_class_name, _parent_class, _storage_id),
+                         args.repeat)
+        print(f"{case:<24} {chain[0]:>10.3f} {chain[1]:>10.3f} {single[0]:>11.3f} {single[1]:>11.3f}")
+    _storage.mongo_connector.drop_database(Config().mongo_database)
@@ -0,0 +1,101 @@
+"""
+Count the Mongo queries issued by one schema sync cycle (BaseStorage.update_current_schemas) for growing numbers of
+cached schemas. The count must stay constant, only changed schemas are rebuilt.
+
+    python -m TMTChatbot.Examples.benchmark.schema_sync_queries --host localhost --port 27017
+    python -m TMTChatbot.Examples.benchmark.schema_sync_queries --mongomock
+"""
+import argparse
+import time
+
+import pymongo
+from pymongo import monitoring
+
+from TMTChatbot.Schema.config.schema_config import BaseSchemaConfig
+from TMTChatbot.Common.config.config import Config
+
+
+class QueryCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in ["find", "aggregate"]:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def count_mongomock_queries(counter: QueryCounter):
+    import mongomock
+
+    find = mongomock.collection.Collection.find
+
+    def counted_find(*args, **kwargs):
+        counter.count += 1
+        return find(*args, **kwargs)
+
+    mongomock.collection.Collection.find = counted_find
+    pymongo.MongoClient = mongomock.MongoClient
+
+
+def make_schema(idx: int, storage_id: str, attribute: str = "color"):
+    return BaseSchemaConfig({
+        "class": "Product",
+        "parent_class": f"Category{idx}",
+        "required_attributes": {attribute: True},
+        "variant_attributes": {},
+        "attributes": {},
+        "user_required_attributes": {},
+        "storage_id": storage_id
+    })
+
+
+def run(sizes: [int], n_cycles: int, n_storages: int, counter: QueryCounter):
+    from TMTChatbot.Common.storage.mongo_client import JoinCollMongoConnector
+
+    storage = JoinCollMongoConnector(config=Config())
+    print(f"{'cached':>8} {'cycle':>6} {'queries':>8} {'updated':>8}")
+    for size in sizes:
+        storage.schema_cache.clear()
+        storage_ids = [f"benchmark_{idx}" for idx in range(n_storages)]
+        for storage_id in storage_ids:
+            schemas = [make_schema(idx, storage_id) for idx in range(size // n_storages)]
+            storage.store_schemas(schemas, storage_id=storage_id)
+            for schema in schemas:
+                storage.load_schema_with_class_name(schema.class_name(), schema.parent_class, storage_id)
+        storage.schema_version = time.time()
+
+        for cycle in range(n_cycles):
+            # another process changes one schema between two cycles
+            changed = make_schema(cycle, storage_ids[0], attribute=f"size_{cycle}")
+            storage._store_schema(changed, storage_id=storage_ids[0])
+            before = storage.schema_cache.items()
+            counter.count = 0
+            storage.update_current_schemas()
+            after = dict(storage.schema_cache.items())
+            updated = sum(after.get(schema_id) is not schema for schema_id, schema in before)
+            print(f"{len(storage.schema_cache):>8} {cycle:>6} {counter.count:>8} {updated:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=27017)
+    parser.add_argument("--mongomock", action="store_true", help="use the in-memory mongomock client")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--storages", type=int, default=2)
+    args = parser.parse_args()
+
+    _counter = QueryCounter()
+    if args.mongomock:
+        count_mongomock_queries(_counter)
+    else:
+        monitoring.register(_counter)
+    Config(mongo_host=args.host, mongo_port=args.port, mongo_database="SchemaSyncBenchmark")
+    run(args.sizes, args.cycles, args.storages, _counter)
@@ -1,10 +1,12 @@
 from uuid import uuid4, uuid5
-from typing import AnyStr, Optional, Dict, Any
+from typing import AnyStr, Optional, Dict, Any, List
 from pydantic import BaseModel
 from datetime import datetime
 
 from TMTChatbot.ServiceWrapper.common.status import ResultStatus
 
+BATCH = "batch"
+
 
 class BaseMetaData(BaseModel):
     processing_time: Optional[float]
@@ -69,3 +71,22 @@ class BaseDataModel(BaseModel):
         meta_data = BaseMetaData.from_json(meta_data)
         data["meta_data"] = meta_data
         return BaseDataModel(**data)
+
+    @staticmethod
+    def from_batch(items: List["BaseDataModel"]) -> "BaseDataModel":
+        """
+        Envelope of a batched request: data is {"batch": [item, ...]}, each item with its own index, data and meta_data
+        """
+        return BaseDataModel(data={BATCH: [item.dict() for item in items]})
+
+    def get_batch(self, items: List["BaseDataModel"]) -> List[Optional["BaseDataModel"]]:
+        """
+        Split the answer to a batch envelope
+        :param items: the items of the batched request
+        :return: the answer of each item, matched by index, None for the items missing from the answer
+        """
+        answers = self.data.get(BATCH) if isinstance(self.data, dict) else None
+        if answers is None:
+            raise ValueError("The answer is not a batch envelope")
+        answers = {str(answer.get("index")): answer for answer in answers}
+        return [BaseDataModel(**answers[item.index]) if item.index in answers else None for item in items]
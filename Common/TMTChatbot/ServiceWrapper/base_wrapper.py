@@ -34,12 +34,12 @@ class BaseApp(BaseSingleton):
         else:
             raise ValueError("Need a pipeline implementation")
 
-    def start(self, n_workers: int = 1):
+    def start(self, n_workers: int = 1, app_factory: str = None):
         if self.with_kafka_app:
             self.kafka_app.start()
         self.monitor.start()
         if self.with_api_app:
-            self.api_app.start(n_workers=n_workers)
+            self.api_app.start(n_workers=n_workers, app_factory=app_factory)
 
     def join(self):
         if self.with_kafka_app:
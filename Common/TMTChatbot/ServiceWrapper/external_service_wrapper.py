@@ -1,72 +1,198 @@
+import asyncio
 from abc import ABC
-from datetime import datetime
+from threading import Lock
+from typing import List
 
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.ServiceWrapper.services.base_cache_service import (
     BaseServiceWithCacheSingleton,
     BaseAsyncServiceWithCacheSingleton
 )
+from TMTChatbot.ServiceWrapper.services.circuit_breaker import CircuitBreaker, CircuitOpenError, OPEN
+from TMTChatbot.ServiceWrapper.services.deadline import RequestDeadline
+from TMTChatbot.ServiceWrapper.services.micro_batcher import MicroBatcher, AsyncMicroBatcher
+from TMTChatbot.ServiceWrapper.services.session_pool import SessionPool, AsyncSessionPool
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 
 
 class BaseExternalService(BaseServiceWithCacheSingleton):
+    batcher_class = MicroBatcher
+
     def __init__(self, config: Config = None):
         super(BaseExternalService, self).__init__(config=config)
         self.session = None
         self.api_url = None
-        self.api_alive = True
-        self.last_call = datetime.now().timestamp()
+        # calls sent to the api in one batched request, 1 to send every call alone
+        self.batch_size = 1
+        self.batcher = None
+        self.batcher_lock = Lock()
+        self.session_pool = SessionPool(config=self.config)
+        self.circuit_breaker = CircuitBreaker.get_breaker(self.__class__.__name__, config=self.config)
+
+    def init_session(self, force=False):
+        if self.session is None or force:
+            self.session = self.session_pool.get_session(self.api_url)
+
+    def call_back_func(self):
+        # keep the shared session, dropping it would close the pooled connections of every route worker
+        self.session_pool.add_error(self.api_url)
+
+    @property
+    def api_alive(self):
+        return self.circuit_breaker.state != OPEN
 
     def api_possible(self):
-        output = self.api_alive or datetime.now().timestamp() - self.last_call > self.config.external_failed_timeout
-        self.last_call = datetime.now().timestamp()
-        return output
+        return self.circuit_breaker.available()
 
-    def _call_api(self, input_data: BaseDataModel) -> BaseDataModel:
+    def guard_request(self, request_func):
+        """
+        Wrap a request to the upstream, so it goes through the circuit breaker of this service and its outcome is
+        recorded. A None result is a failure
+        """
+        def guarded_request():
+            if not self.circuit_breaker.allow_request():
+                raise CircuitOpenError(f"Circuit of {self.__class__.__name__} is {self.circuit_breaker.state}")
+            try:
+                result = request_func()
+            except Exception:
+                self.circuit_breaker.record_failure()
+                raise
+            if result is None:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            return result
+
+        return guarded_request
+
+    def make_request(self, request_func, call_back_func=None, *args, **kwargs):
+        return super().make_request(self.guard_request(request_func), call_back_func, *args, **kwargs)
+
+    def get_batcher(self):
+        with self.batcher_lock:
+            if self.batcher is None:
+                self.batcher = self.batcher_class(self._call_batch_api, batch_size=self.batch_size,
+                                                  interval=self.config.batch_interval)
+        return self.batcher
+
+    def _post_api(self, input_data: BaseDataModel) -> BaseDataModel:
         if self.api_url is None:
             raise ValueError("self.api_url must not be None")
-        output = self.session.post(self.api_url, json=input_data.dict()).json()
+        output = self.session.post(self.api_url, json=input_data.dict(),
+                                   timeout=RequestDeadline.get_timeout(self.session_pool.timeout)).json()
         return BaseDataModel(**output)
 
+    def _call_batch_api(self, items: List[BaseDataModel]) -> List[BaseDataModel]:
+        self.init_session(False)
+        return self._post_api(BaseDataModel.from_batch(items)).get_batch(items)
+
+    def _call_api(self, input_data: BaseDataModel) -> BaseDataModel:
+        """
+        Send input_data to the api, in a batch with the concurrent calls of this service if batch_size > 1
+        """
+        if self.batch_size > 1:
+            return self.get_batcher().submit(input_data)
+        return self._post_api(input_data)
+
     def _post_process(self, data: BaseDataModel):
         raise NotImplementedError("Need Implementation")
 
     def _pre_process(self, input_data) -> BaseDataModel:
+        """
+        :return: the request body of input_data, None if there is nothing to ask the api
+        """
         raise NotImplementedError("Need Implementation")
 
+    def request(self, input_data, key=None, postfix="", num_retry: int = None, call_prop: float = 0) -> BaseDataModel:
+        """
+        Call the api for input_data without modifying it. The result is applied by the caller, e.g. with _post_process
+        :return: the answer of the api, None if it failed or if there is nothing to ask
+        """
+        data = self._pre_process(input_data)
+        if data is None:
+            return None
+        return self.make_request(lambda: self._call_api(data), key=key, postfix=postfix, num_retry=num_retry,
+                                 call_prop=call_prop)
+
     def __call__(self, input_data, key=None, postfix="", num_retry: int = None, call_prop: float = 0):
         if self.api_possible():
             data = self._pre_process(input_data)
             result: BaseDataModel = self.make_request(lambda: self._call_api(data), key=key, postfix=postfix,
                                                       num_retry=num_retry, call_prop=call_prop)
             output = self._post_process(result)
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
             return output
 
 
 class BaseAsyncExternalService(BaseAsyncServiceWithCacheSingleton, BaseExternalService):
+    """
+    External service for coroutines. Requests go through the aiohttp session of AsyncSessionPool, shared by every
+    async service of the event loop. The async version of a service subclasses both this class and the service, e.g.
+    AsyncIntentService(BaseAsyncExternalService, IntentService), and only redefines the methods calling the api
+    """
+    batcher_class = AsyncMicroBatcher
+
     def __init__(self, config: Config = None):
         super(BaseAsyncExternalService, self).__init__(config=config)
         BaseExternalService.__init__(self, config=config)
+        self.async_session_pool = AsyncSessionPool(config=self.config)
 
-    async def _call_api(self, input_data: BaseDataModel) -> BaseDataModel:
+    async def call_back_func(self):
+        # keep the shared session, closing it would drop the pooled connections of every coroutine
+        self.async_session_pool.add_error(self.api_url)
+
+    def guard_request(self, request_func):
+        async def guarded_request():
+            if not self.circuit_breaker.allow_request():
+                raise CircuitOpenError(f"Circuit of {self.__class__.__name__} is {self.circuit_breaker.state}")
+            try:
+                result = await request_func()
+            except asyncio.CancelledError:
+                self.circuit_breaker.release()
+                raise
+            except Exception:
+                self.circuit_breaker.record_failure()
+                raise
+            if result is None:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            return result
+
+        return guarded_request
+
+    async def make_request(self, request_func, call_back_func=None, *args, **kwargs):
+        return await super().make_request(self.guard_request(request_func), call_back_func, *args, **kwargs)
+
+    async def _post_api(self, input_data: BaseDataModel) -> BaseDataModel:
         if self.api_url is None:
             raise ValueError("self.api_url must not be None")
-        output = await self.session.post(self.api_url, json=input_data.dict())
-        output = await output.json()
+        # leaving the context releases the connection to the pool of the session
+        async with self.session.post(self.api_url, json=input_data.dict()) as response:
+            output = await response.json(content_type=None)
         return BaseDataModel(**output)
 
+    async def _call_batch_api(self, items: List[BaseDataModel]) -> List[BaseDataModel]:
+        await self.init_session(False)
+        output = await self._post_api(BaseDataModel.from_batch(items))
+        return output.get_batch(items)
+
+    async def _call_api(self, input_data: BaseDataModel) -> BaseDataModel:
+        if self.batch_size > 1:
+            return await self.get_batcher().submit(input_data)
+        return await self._post_api(input_data)
+
+    async def request(self, input_data, key=None, postfix="", num_retry: int = None,
+                      call_prop: float = 0) -> BaseDataModel:
+        data = self._pre_process(input_data)
+        if data is None:
+            return None
+        return await self.make_request(lambda: self._call_api(data), key=key, postfix=postfix, num_retry=num_retry,
+                                       call_prop=call_prop)
+
     async def __call__(self, input_data, key=None, postfix="", num_retry: int = None, call_prop: float = 0):
         if self.api_possible():
             data = self._pre_process(input_data)
             result = await self.make_request(lambda: self._call_api(data), key=key, postfix=postfix,
                                              num_retry=num_retry, call_prop=call_prop)
             output = self._post_process(result)
-            if result is None:
-                self.api_alive = False
-            else:
-                self.api_alive = True
             return output
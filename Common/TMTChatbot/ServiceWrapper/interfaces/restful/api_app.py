@@ -32,7 +32,8 @@ class APIApp(BaseServiceSingleton):
 
     def add_endpoint(self, endpoint: str, func, description: str, methods: [str],
                      request_data_model=None, response_data_model=None,
-                     use_thread: bool = True, use_async: bool = True, **kwargs):
+                     use_thread: bool = True, use_async: bool = True, pass_request: bool = False,
+                     raw_response: bool = False, timeout: float = None, **kwargs):
         """
         Add custom endpoint to FastAPI App
         :param endpoint: path to your function
@@ -43,6 +44,12 @@ class APIApp(BaseServiceSingleton):
         :param response_data_model: response data model, which is output type of <func>
         :param use_thread: if your function is sync and you need a thread for async interface, then True, else False
         :param use_async: if your function is async then True, else False
+        :param pass_request: if True, <func> also receives the HTTP request and response objects as <request> and
+            <response>, e.g. to read request headers or set response headers
+        :param raw_response: if True, <func> receives raw_response=True and may return an already serialized
+            Response, which is sent as is without response model validation
+        :param timeout: seconds a call of the endpoint has before the services it calls give up, None to use
+            config.request_timeout, 0 for no deadline
         :return:
 
         if custom_data_model is None -> default = BaseDataModel
@@ -51,7 +58,8 @@ class APIApp(BaseServiceSingleton):
         self.base_route.add_endpoint(endpoint=endpoint, func=func, description=description,
                                      methods=methods, use_thread=use_thread, use_async=use_async,
                                      request_data_model=request_data_model,
-                                     response_data_model=response_data_model, **kwargs)
+                                     response_data_model=response_data_model, pass_request=pass_request,
+                                     raw_response=raw_response, timeout=timeout, **kwargs)
         self.app.include_router(self.base_route.router)
 
     def create_api_interface(self, routes: List[BaseRoute]):
@@ -59,6 +67,31 @@ class APIApp(BaseServiceSingleton):
             self.app.include_router(route.router)
         return self.app
 
-    def start(self, n_workers: int = 1):
-        uvicorn.run(self.app, host=self.config.api_host, port=self.config.api_port, reload=False, log_level="debug",
-                    debug=False, workers=n_workers, factory=False, loop="asyncio", timeout_keep_alive=120)
+    def start(self, n_workers: int = 1, app_factory: str = None):
+        """
+        Serve the FastAPI app with uvicorn
+        :param n_workers: number of worker processes
+        :param app_factory: import string of a function returning the FastAPI app, e.g. "app:create_api_app".
+        Required if <n_workers> > 1 since uvicorn can only build the app of each worker process from an import string
+        :return:
+        """
+        if n_workers > 1:
+            if app_factory is None:
+                raise ValueError(f"app_factory is required to start {n_workers} workers")
+            self.start_workers(config=self.config, n_workers=n_workers, app_factory=app_factory)
+        else:
+            uvicorn.run(self.app, host=self.config.api_host, port=self.config.api_port, reload=False,
+                        log_level="debug", debug=False, loop="asyncio", timeout_keep_alive=120)
+
+    @staticmethod
+    def start_workers(config: Config, n_workers: int, app_factory: str):
+        """
+        Serve <n_workers> uvicorn worker processes, each one building its own app with <app_factory>. Nothing needs to
+        be built in the calling process
+        :param config: api host and port
+        :param n_workers: number of worker processes
+        :param app_factory: import string of a function returning the FastAPI app, e.g. "app:create_api_app"
+        :return:
+        """
+        uvicorn.run(app_factory, host=config.api_host, port=config.api_port, reload=False, log_level="debug",
+                    debug=False, workers=n_workers, factory=True, loop="asyncio", timeout_keep_alive=120)
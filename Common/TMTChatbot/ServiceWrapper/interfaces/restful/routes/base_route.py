@@ -1,11 +1,12 @@
 import asyncio
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
 
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.Common.singleton import BaseSingleton
 from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
+from TMTChatbot.ServiceWrapper.services.deadline import RequestDeadline
 
 
 class WorkerManager(BaseSingleton):
@@ -15,7 +16,7 @@ class WorkerManager(BaseSingleton):
 
     async def wait(self, job, *args):
         loop = asyncio.get_event_loop()
-        output = await loop.run_in_executor(self.thread_executor, job, *args)
+        output = await loop.run_in_executor(self.thread_executor, RequestDeadline.bind(job), *args)
         return output
 
     @staticmethod
@@ -53,28 +54,58 @@ class BaseRoute(BaseSingleton):
     def add_endpoint(self, endpoint: str, func, description: str, methods: List[str],
                      use_thread: bool = True, use_async: bool = True,
                      request_data_model: Optional[type] = None,
-                     response_data_model: Optional[type] = None, **kwargs):
+                     response_data_model: Optional[type] = None, pass_request: bool = False,
+                     raw_response: bool = False, timeout: float = None, **kwargs):
+        if use_async and not use_thread and not asyncio.iscoroutinefunction(func):
+            raise ValueError(f"{func} must be an async function when use_async=True and use_thread=False")
         router = self.router
         endpoint = endpoint.strip()
         if endpoint[0] != "/":
             endpoint = "/" + endpoint
+        func_kwargs = {"raw_response": True} if raw_response else {}
+        # every call of the endpoint gets a deadline, carried to the services it calls
+        timeout = timeout if timeout is not None else self.config.request_timeout
 
         async def request_func(in_data: BaseDataModel):
-            output = await self.wait(func, in_data, use_thread=use_thread)
+            with RequestDeadline.start(timeout, name=endpoint):
+                output = await self.wait(func, in_data, use_thread=use_thread)
             return output
 
         async def request_func_custom(data: request_data_model = Depends()):
-            output = await self.wait(job=func, use_thread=use_thread, **data.__dict__)
+            with RequestDeadline.start(timeout, name=endpoint):
+                output = await self.wait(job=func, use_thread=use_thread, **data.__dict__, **func_kwargs)
             return output
 
         def sync_request_func(in_data: BaseDataModel):
-            output = self.wait_sync(func, in_data)
+            with RequestDeadline.start(timeout, name=endpoint):
+                output = self.wait_sync(func, in_data)
             return output
 
         def sync_request_func_custom(data: request_data_model = Depends()):
-            output = self.wait_sync(job=func, **data.__dict__)
+            with RequestDeadline.start(timeout, name=endpoint):
+                output = self.wait_sync(job=func, **data.__dict__, **func_kwargs)
             return output
 
+        async def request_func_custom_with_request(request: Request, response: Response,
+                                                   data: request_data_model = Depends()):
+            with RequestDeadline.start(timeout, name=endpoint):
+                output = await self.wait(job=func, use_thread=use_thread, request=request, response=response,
+                                         **data.__dict__, **func_kwargs)
+            return output
+
+        def sync_request_func_custom_with_request(request: Request, response: Response,
+                                                  data: request_data_model = Depends()):
+            with RequestDeadline.start(timeout, name=endpoint):
+                output = self.wait_sync(job=func, request=request, response=response, **data.__dict__,
+                                        **func_kwargs)
+            return output
+
+        if (pass_request or raw_response) and request_data_model is None:
+            raise ValueError(f"{func} needs a request_data_model when pass_request=True or raw_response=True")
+        if pass_request:
+            request_func_custom = request_func_custom_with_request
+            sync_request_func_custom = sync_request_func_custom_with_request
+
         if use_async:
             if request_data_model is None:
                 router.add_api_route(endpoint, methods=methods, endpoint=request_func,
@@ -14,6 +14,7 @@ from TMTChatbot.Schema.objects.common.data_model import BaseDataModel
 from TMTChatbot.ServiceWrapper.common.status import ResultStatus
 from TMTChatbot.ServiceWrapper.services.base_service import BaseService
 from TMTChatbot.ServiceWrapper.services.buffer_manager import BufferManager
+from TMTChatbot.ServiceWrapper.services.deadline import RequestDeadline
 
 
 class BasePipeline(BaseService):
@@ -89,7 +90,8 @@ class BasePipeline(BaseService):
         if self.process_func is None:
             self.logger.warning("Process function not created => return same data object")
         else:
-            data: BaseDataModel = self.process_func(data)
+            with RequestDeadline.start(self.config.request_timeout, name=data.index):
+                data: BaseDataModel = self.process_func(data)
         data.update_response_time()
         data.meta_data.status = ResultStatus.SUCCESS
         self.update_done_item(1)
@@ -1,18 +1,131 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
+
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.Common.singleton import Singleton
 from TMTChatbot.Common.utils.data_utils import remove_accents
 from TMTChatbot.ServiceWrapper.services.base_service import BaseService, BaseAsyncService
 from TMTChatbot.ServiceWrapper.services.cache import Cache, BaseCacheService
+from TMTChatbot.ServiceWrapper.services.deadline import RequestDeadline
+from TMTChatbot.ServiceWrapper.services.single_flight import SingleFlight, AsyncSingleFlight
+
+# states of a key in the RAM cache of a service
+FRESH = "FRESH"
+STALE = "STALE"
+EXPIRED = "EXPIRED"
+MISSED = "MISSED"
+# where a RAM cache miss of a service is answered from
+REMOTE_CACHE = "REMOTE_CACHE"
+UPSTREAM = "UPSTREAM"
+
+
+class CachedResult:
+    """
+    Result in the RAM cache of a service, with the time it was requested to know when it becomes stale
+    """
+    __slots__ = ("value", "cached_time")
+
+    def __init__(self, value, cached_time: float = None):
+        self.value = value
+        self.cached_time = cached_time if cached_time is not None else time.time()
+
+    def age(self):
+        return time.time() - self.cached_time
 
 
 class BaseServiceWithRAMCache(BaseService):
+    # seconds before a cached result of this service expires, used when make_request gets no ttl. None to use the
+    # ttl of the cache
+    cache_ttl: float = None
+    # seconds after which a cached result is stale: it is still returned, but requested again in background. None to
+    # use config.cache_soft_ttl, 0 to never refresh
+    cache_soft_ttl: float = None
+    # seconds after which a cached result is expired: the call waits for a new result. None to use
+    # config.cache_hard_ttl, 0 to keep stale results until they leave the cache
+    cache_hard_ttl: float = None
+    single_flight_class = SingleFlight
+
     def __init__(self, config: Config = None):
         super(BaseServiceWithRAMCache, self).__init__(config=config)
         self.cache = Cache.get_cache(config=config, name=self.__class__.__name__)
+        self.single_flight = self.single_flight_class()
+        self.refresh_lock = Lock()
+        self.refreshing = set()
+        self.refresh_executor = None
 
     def clear_cache(self):
         self.cache.clear()
 
+    @property
+    def coalesced_requests(self) -> int:
+        """
+        Number of make_request calls which waited for the identical request of another caller instead of sending it
+        """
+        return self.single_flight.coalesced
+
+    def get_cache_ttl(self, ttl: float = None):
+        return ttl if ttl is not None else self.cache_ttl
+
+    def get_stale_ttl(self, soft_ttl: float = None, hard_ttl: float = None):
+        """
+        :return: soft and hard ttl of a call, from its arguments, then the service, then the config. None if disabled
+        """
+        for default_soft_ttl in [self.cache_soft_ttl, self.config.cache_soft_ttl]:
+            soft_ttl = soft_ttl if soft_ttl is not None else default_soft_ttl
+        for default_hard_ttl in [self.cache_hard_ttl, self.config.cache_hard_ttl]:
+            hard_ttl = hard_ttl if hard_ttl is not None else default_hard_ttl
+        return soft_ttl or None, hard_ttl or None
+
+    def get_cached(self, key, call_prop: float = 0, soft_ttl: float = None, hard_ttl: float = None):
+        """
+        :return: the cached result of key and its state. FRESH and STALE results are returned to the caller, STALE
+        ones are also requested again in background. EXPIRED and MISSED keys are requested before returning
+        """
+        if key not in self.cache or self.get_prop() < call_prop:
+            return None, MISSED
+        entry = self.cache[key]
+        if entry is None:
+            return None, MISSED
+        age = entry.age()
+        if hard_ttl is not None and age >= hard_ttl:
+            return None, EXPIRED
+        if soft_ttl is not None and age >= soft_ttl:
+            return entry.value, STALE
+        return entry.value, FRESH
+
+    def set_cached(self, key, result, ttl: float = None):
+        self.cache.set(key, CachedResult(result), ttl=self.get_cache_ttl(ttl))
+
+    def get_refresh_executor(self):
+        if self.refresh_executor is None:
+            self.refresh_executor = ThreadPoolExecutor(max_workers=self.config.cache_refresh_workers,
+                                                       thread_name_prefix=f"{self.__class__.__name__}Refresh")
+        return self.refresh_executor
+
+    def refresh_in_background(self, key, refresh_func):
+        """
+        Run refresh_func for a STALE key in the refresh thread pool, unless the key is already being refreshed. The
+        refresh goes through single_flight, so it is shared with the callers of an EXPIRED or MISSED key
+        """
+        with self.refresh_lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+            executor = self.get_refresh_executor()
+
+        def refresh_job():
+            try:
+                self.single_flight.do(key, refresh_func)
+            except Exception as e:
+                self.logger.error(f"[{self.__class__.__name__}]. Cannot refresh key [{key}]. Error : {e}")
+            finally:
+                with self.refresh_lock:
+                    self.refreshing.discard(key)
+
+        executor.submit(refresh_job)
+
     @staticmethod
     def extract_key(template_key):
         class_name, template_key = template_key.split("*@")
@@ -23,76 +136,240 @@ class BaseServiceWithRAMCache(BaseService):
         return class_name, key, postfix
 
     def make_request(self, request_func, call_back_func=None, key=None, postfix="", call_prop: float = 0,
-                     num_retry: int = None):
+                     num_retry: int = None, ttl: float = None, soft_ttl: float = None, hard_ttl: float = None,
+                     deadline: float = None):
         if key is None:
-            return super().make_request(request_func, call_back_func, num_retry=num_retry)
+            return super().make_request(request_func, call_back_func, num_retry=num_retry, deadline=deadline)
 
         key = remove_accents(key)
         key = self.generate_cache_key(key, postfix)
 
-        if key in self.cache and self.get_prop() >= call_prop:
-            return self.cache[key]
-        else:
-            result = super().make_request(request_func, call_back_func, num_retry=num_retry)
-            if result is not None:
-                self.cache[key] = result
+        result, state = self.get_cached(key, call_prop, *self.get_stale_ttl(soft_ttl, hard_ttl))
+        if state == FRESH:
             return result
 
+        def request_and_cache():
+            output = super(BaseServiceWithRAMCache, self).make_request(request_func, call_back_func,
+                                                                       num_retry=num_retry, deadline=deadline)
+            if output is not None:
+                self.set_cached(key, output, ttl=ttl)
+            return output
+
+        if state == STALE:
+            self.refresh_in_background(key, request_and_cache)
+            return result
+        return self.single_flight.do(key, request_and_cache)
+
 
 class BaseAsyncServiceWithRAMCache(BaseAsyncService, BaseServiceWithRAMCache):
+    single_flight_class = AsyncSingleFlight
+
     def __init__(self, config: Config = None):
         BaseAsyncService.__init__(self, config=config)
         BaseServiceWithRAMCache.__init__(self, config=config)
+        self.refresh_tasks = set()
+
+    def refresh_in_background(self, key, refresh_func):
+        """
+        Run refresh_func for a STALE key in a task of the running event loop, unless the key is already being
+        refreshed
+        """
+        if key in self.refreshing:
+            return
+        self.refreshing.add(key)
+
+        async def refresh_job():
+            try:
+                await self.single_flight.do(key, refresh_func)
+            except Exception as e:
+                self.logger.error(f"[{self.__class__.__name__}]. Cannot refresh key [{key}]. Error : {e}")
+            finally:
+                self.refreshing.discard(key)
+
+        # keep a reference to the task, the event loop only keeps a weak one
+        task = asyncio.ensure_future(refresh_job())
+        self.refresh_tasks.add(task)
+        task.add_done_callback(self.refresh_tasks.discard)
 
     async def make_request(self, request_func, call_back_func=None, key=None, postfix="", call_prop: float = 0,
-                           num_retry: int = None):
+                           num_retry: int = None, ttl: float = None, soft_ttl: float = None, hard_ttl: float = None,
+                           deadline: float = None):
         if key is None:
-            return await super().make_request(request_func, call_back_func, num_retry=num_retry)
+            return await super().make_request(request_func, call_back_func, num_retry=num_retry,
+                                              deadline=deadline)
 
         key = remove_accents(key)
         key = self.generate_cache_key(key, postfix)
 
-        if key in self.cache and self.get_prop() >= call_prop:
-            return self.cache[key]
-        else:
-            result = await super().make_request(request_func, call_back_func, num_retry=num_retry)
-            if result is not None:
-                self.cache[key] = result
+        result, state = self.get_cached(key, call_prop, *self.get_stale_ttl(soft_ttl, hard_ttl))
+        if state == FRESH:
+            return result
+
+        async def request_and_cache():
+            output = await super(BaseAsyncServiceWithRAMCache, self).make_request(request_func, call_back_func,
+                                                                                  num_retry=num_retry,
+                                                                                  deadline=deadline)
+            if output is not None:
+                self.set_cached(key, output, ttl=ttl)
+            return output
+
+        if state == STALE:
+            self.refresh_in_background(key, request_and_cache)
             return result
+        return await self.single_flight.do(key, request_and_cache)
 
 
 class BaseServiceWithCache(BaseServiceWithRAMCache):
+    # seconds the remote cache has to answer a search. None to use config.cache_search_timeout
+    cache_search_timeout: float = None
+    # seconds to wait for the remote cache before calling the service as well, the first result of both is used.
+    # None to use config.cache_hedge_delay, negative to call the service only after the remote cache missed
+    cache_hedge_delay: float = None
+
     def __init__(self, config: Config = None):
         super(BaseServiceWithCache, self).__init__(config=config)
         self.cache_service = BaseCacheService.get_cache(config=config)
+        self.hedge_lock = Lock()
+        self.hedge_executor = None
+        self.hedged_requests = 0
+        self.read_wins = {REMOTE_CACHE: 0, UPSTREAM: 0}
+
+    @property
+    def info(self):
+        return f"REMOTE_CACHE_WINS: {self.read_wins[REMOTE_CACHE]}, UPSTREAM_WINS: {self.read_wins[UPSTREAM]}, " \
+               f"HEDGED: {self.hedged_requests}, COALESCED: {self.coalesced_requests}"
 
     def pre_check_key(self, query_key=None, candidate=None):
         class_name, key, postfix = self.extract_key(query_key)
         candidate_class_name, candidate_key, candidate_postfix = self.extract_key(candidate)
         return candidate_class_name == class_name and postfix == candidate_postfix, key, candidate_key
 
+    def get_search_timeout(self):
+        """
+        :return: seconds the remote cache has to answer, at most the time left to the current request
+        """
+        timeout = self.cache_search_timeout if self.cache_search_timeout is not None \
+            else self.config.cache_search_timeout
+        return RequestDeadline.get_timeout(timeout)
+
+    def get_hedge_delay(self):
+        return self.cache_hedge_delay if self.cache_hedge_delay is not None else self.config.cache_hedge_delay
+
+    def get_hedge_executor(self):
+        with self.hedge_lock:
+            if self.hedge_executor is None:
+                self.hedge_executor = ThreadPoolExecutor(max_workers=self.config.cache_hedge_workers,
+                                                         thread_name_prefix=f"{self.__class__.__name__}Hedge")
+        return self.hedge_executor
+
+    def search_cache(self, key):
+        with RequestDeadline.stage(REMOTE_CACHE):
+            return self.cache_service.search(key, pre_check_func=self.pre_check_key, exact=True,
+                                             timeout=self.get_search_timeout())
+
+    def prefetch(self, keys: [str], postfix="", ttl: float = None) -> int:
+        """
+        Load the results of keys missing from the RAM cache with a single remote cache round trip, e.g. the messages
+        of a conversation turn before calling the service for each of them
+        :return: number of keys loaded
+        """
+        keys = self.get_prefetch_keys(keys, postfix)
+        with RequestDeadline.stage(REMOTE_CACHE):
+            outputs = self.cache_service.search_many(keys, pre_check_func=self.pre_check_key, exact=True,
+                                                     timeout=self.get_search_timeout())
+        return self.set_prefetched(keys, outputs, ttl=ttl)
+
+    def get_prefetch_keys(self, keys: [str], postfix=""):
+        keys = [self.generate_cache_key(remove_accents(key), postfix) for key in keys]
+        return [key for key in dict.fromkeys(keys) if key not in self.cache]
+
+    def set_prefetched(self, keys: [str], outputs: list, ttl: float = None) -> int:
+        num_loaded = 0
+        for key, output in zip(keys, outputs):
+            if output is not None:
+                self.set_cached(key, output, ttl=ttl)
+                num_loaded += 1
+        return num_loaded
+
+    def get_future_result(self, future):
+        try:
+            return future.result()
+        except Exception as e:
+            self.logger.error(f"[{self.__class__.__name__}]. Cannot get result. Error : {e}")
+            return None
+
+    def search_or_request(self, key, request_func):
+        """
+        Answer a RAM cache miss from the remote cache or from request_func. Without hedge delay, request_func is only
+        called after the remote cache missed. Otherwise it is called as well when the remote cache did not answer
+        within the delay, the first result of both is returned and the other one is ignored
+        :return: the result and where it comes from, REMOTE_CACHE or UPSTREAM
+        """
+        hedge_delay = self.get_hedge_delay()
+        if hedge_delay < 0:
+            output, path = self.search_cache(key), REMOTE_CACHE
+            if output is None:
+                output, path = request_func(), UPSTREAM
+        else:
+            output, path = self.hedge(key, request_func, hedge_delay)
+        if output is not None:
+            self.read_wins[path] += 1
+        return output, path
+
+    def hedge(self, key, request_func, hedge_delay: float):
+        executor = self.get_hedge_executor()
+        search = executor.submit(RequestDeadline.bind(self.search_cache), key)
+        done, pending = wait([search], timeout=hedge_delay)
+        if len(pending) == 0:
+            output = self.get_future_result(search)
+            if output is not None:
+                return output, REMOTE_CACHE
+            # the remote cache missed within the delay, there is nothing to race: call the service on this thread
+            return request_func(), UPSTREAM
+        self.hedged_requests += 1
+        pending.add(executor.submit(RequestDeadline.bind(request_func)))
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                output = self.get_future_result(future)
+                if output is not None:
+                    return output, REMOTE_CACHE if future is search else UPSTREAM
+        return None, UPSTREAM
+
     def make_request(self, request_func, call_back_func=None, key=None, postfix="", call_prop: float = 0,
-                     num_retry: int = None):
+                     num_retry: int = None, ttl: float = None, soft_ttl: float = None, hard_ttl: float = None,
+                     deadline: float = None):
         if key is None:
-            return super().make_request(request_func, call_back_func, num_retry=num_retry)
+            return super().make_request(request_func, call_back_func, num_retry=num_retry, deadline=deadline)
 
         key = remove_accents(key)
         key = self.generate_cache_key(key, postfix)
 
-        if key in self.cache and self.get_prop() >= call_prop:
+        result, state = self.get_cached(key, call_prop, *self.get_stale_ttl(soft_ttl, hard_ttl))
+        if state == FRESH:
             # self.logger.info(f"GET key [{key}] from cache [{self.__class__.__name__}]")
-            return self.cache[key]
-        else:
-            result = self.cache_service.search(key, pre_check_func=self.pre_check_key, exact=True)
-            if result is not None:
-                self.cache[key] = result
-                return result
+            return result
+
+        def request_upstream():
+            return super(BaseServiceWithCache, self).make_request(request_func, call_back_func, num_retry=num_retry,
+                                                                  deadline=deadline)
+
+        # the remote cache holds the same result as an outdated RAM entry, so only a missed key is searched there
+        def request_and_cache(search_cache: bool = state == MISSED):
+            if search_cache:
+                output, path = self.search_or_request(key, request_upstream)
             else:
-                result = super().make_request(request_func, call_back_func, num_retry=num_retry)
-                if result is not None:
-                    self.cache[key] = result
-                    self.cache_service.save(key=key, data=result)
-                return result
+                output, path = request_upstream(), UPSTREAM
+            if output is not None:
+                self.set_cached(key, output, ttl=ttl)
+                if path == UPSTREAM:
+                    self.cache_service.save(key=key, data=output)
+            return output
+
+        if state == STALE:
+            self.refresh_in_background(key, request_and_cache)
+            return result
+        return self.single_flight.do(key, request_and_cache)
 
 
 class BaseAsyncServiceWithCache(BaseAsyncServiceWithRAMCache, BaseServiceWithCache):
@@ -100,28 +377,83 @@ class BaseAsyncServiceWithCache(BaseAsyncServiceWithRAMCache, BaseServiceWithCac
         BaseAsyncServiceWithRAMCache.__init__(self, config=config)
         BaseServiceWithCache.__init__(self, config=config)
 
+    async def async_search_cache(self, key):
+        with RequestDeadline.stage(REMOTE_CACHE):
+            return await self.cache_service.async_search(key, pre_check_func=self.pre_check_key, exact=True,
+                                                         timeout=self.get_search_timeout())
+
+    async def prefetch(self, keys: [str], postfix="", ttl: float = None) -> int:
+        keys = self.get_prefetch_keys(keys, postfix)
+        with RequestDeadline.stage(REMOTE_CACHE):
+            outputs = await self.cache_service.async_search_many(keys, pre_check_func=self.pre_check_key, exact=True,
+                                                                 timeout=self.get_search_timeout())
+        return self.set_prefetched(keys, outputs, ttl=ttl)
+
+    async def search_or_request(self, key, request_func):
+        """
+        search_or_request for coroutines. The remote cache is searched by its async client, so the event loop is not
+        blocked while it answers, and the search or the request to the service which lost is cancelled
+        """
+        search = asyncio.ensure_future(self.async_search_cache(key))
+        hedge_delay = self.get_hedge_delay()
+        done, pending = await asyncio.wait([search], timeout=hedge_delay if hedge_delay >= 0 else None)
+        if len(done) > 0 and self.get_future_result(search) is not None:
+            self.read_wins[REMOTE_CACHE] += 1
+            return search.result(), REMOTE_CACHE
+        if len(pending) > 0:
+            self.hedged_requests += 1
+        request = asyncio.ensure_future(request_func())
+        pending.add(request)
+        try:
+            while len(pending) > 0:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    output = self.get_future_result(future)
+                    if output is not None:
+                        path = REMOTE_CACHE if future is search else UPSTREAM
+                        self.read_wins[path] += 1
+                        return output, path
+        finally:
+            for future in [search, request]:
+                if not future.done():
+                    future.cancel()
+        return None, UPSTREAM
+
     async def make_request(self, request_func, call_back_func=None, key=None, postfix="", call_prop: float = 0,
-                           num_retry: int = None):
+                           num_retry: int = None, ttl: float = None, soft_ttl: float = None, hard_ttl: float = None,
+                           deadline: float = None):
         if key is None:
-            return await super().make_request(request_func, call_back_func, num_retry=num_retry)
+            return await super().make_request(request_func, call_back_func, num_retry=num_retry,
+                                              deadline=deadline)
 
         key = remove_accents(key)
         key = self.generate_cache_key(key, postfix)
 
-        if key in self.cache and self.get_prop() >= call_prop:
+        result, state = self.get_cached(key, call_prop, *self.get_stale_ttl(soft_ttl, hard_ttl))
+        if state == FRESH:
             # self.logger.info(f"GET key [{key}] from cache [{self.__class__.__name__}]")
-            return self.cache[key]
-        else:
-            result = self.cache_service.search(key, pre_check_func=self.pre_check_key, exact=True)
-            if result is not None:
-                self.cache[key] = result
-                return result
+            return result
+
+        async def request_upstream():
+            return await super(BaseAsyncServiceWithCache, self).make_request(request_func, call_back_func,
+                                                                             num_retry=num_retry, deadline=deadline)
+
+        # the remote cache holds the same result as an outdated RAM entry, so only a missed key is searched there
+        async def request_and_cache(search_cache: bool = state == MISSED):
+            if search_cache:
+                output, path = await self.search_or_request(key, request_upstream)
             else:
-                result = await super().make_request(request_func, call_back_func, num_retry=num_retry)
-                if result is not None:
-                    self.cache[key] = result
-                    self.cache_service.save(key=key, data=result)
-                return result
+                output, path = await request_upstream(), UPSTREAM
+            if output is not None:
+                self.set_cached(key, output, ttl=ttl)
+                if path == UPSTREAM:
+                    self.cache_service.save(key=key, data=output)
+            return output
+
+        if state == STALE:
+            self.refresh_in_background(key, request_and_cache)
+            return result
+        return await self.single_flight.do(key, request_and_cache)
 
 
 class BaseServiceWithCacheSingleton(BaseServiceWithCache, metaclass=Singleton):
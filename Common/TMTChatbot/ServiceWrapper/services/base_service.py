@@ -1,13 +1,16 @@
 import logging
 import numpy as np
 import asyncio
-import aiohttp
 
 import requests
 import time
 
 from TMTChatbot.Common.singleton import BaseSingleton
 from TMTChatbot.Common.config.config import Config
+from TMTChatbot.ServiceWrapper.services.circuit_breaker import CircuitOpenError
+from TMTChatbot.ServiceWrapper.services.deadline import RequestDeadline
+from TMTChatbot.ServiceWrapper.services.retry_policy import RetryPolicy
+from TMTChatbot.ServiceWrapper.services.session_pool import AsyncSessionPool
 
 
 class BaseService:
@@ -15,6 +18,7 @@ class BaseService:
         self.logger = logging.getLogger(self.__class__.__name__)
         self.config = config if config is not None else Config()
         self.session = None
+        self.retry_policy = RetryPolicy.from_config(self.config)
         self.logger.info(f"CREATE {self.__class__.__name__}")
 
     def get_func(self, func_name: str):
@@ -40,11 +44,11 @@ class BaseService:
             output = await job()
         else:
             loop = asyncio.get_event_loop()
-            output = await loop.run_in_executor(None, job, *args)
+            output = await loop.run_in_executor(None, RequestDeadline.bind(job), *args)
         return output
 
     def make_request(self, request_func, call_back_func=None, key=None, postfix="", call_prop: float = 0,
-                     num_retry: int = None):
+                     num_retry: int = None, deadline: float = None):
         """
         This is the common make request function with try cache mechanism
         :param call_prop: probability that the <request_func> is recall even if <key> exists in cache
@@ -53,14 +57,22 @@ class BaseService:
         :param key: cache the result with this key. Key is only needed when using Cache BaseServices
         :param postfix: tell where key to be stored in cache space
         :param num_retry: number of retry if a request fail
+        :param deadline: time.time() after which the result is not needed anymore, no attempt is started past it.
+        None to use the deadline of the current request
         :return: the output of request_func
         """
         self.init_session(False)
+        self.retry_policy.on_request()
+        deadline = deadline if deadline is not None else RequestDeadline.get_deadline()
+        start_time = time.time()
         result = None
         retry = num_retry if num_retry is not None else self.config.num_retry
-        while result is None and retry > 0:
+        attempt = 0
+        while retry > 0 and not self.retry_policy.is_expired(deadline):
             try:
                 result = request_func()
+            except CircuitOpenError:
+                break
             except Exception as e:
                 self.logger.error(
                     f"[{self.__class__.__name__}]. Cannot make request. Retry remains: {retry}. Error : {e}")
@@ -70,26 +82,38 @@ class BaseService:
                     call_back_func()
                 else:
                     self.call_back_func()
-                retry -= 1
-                if retry > 0:
-                    time.sleep(0.1)
+            if result is not None:
+                break
+            retry -= 1
+            delay = self.retry_policy.get_retry_delay(attempt, retry, deadline)
+            if delay is None:
+                break
+            time.sleep(delay)
+            attempt += 1
+        RequestDeadline.record_stage(self.__class__.__name__, time.time() - start_time)
         return result
 
 
 class BaseAsyncService(BaseService):
 
     async def call_back_func(self):
-        await self.init_session(True)
+        # keep the shared session, closing it would drop the pooled connections of every coroutine
+        await self.init_session(False)
 
     async def init_session(self, force=False):
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-        elif force:
-            await self.session.close()
-            self.session = aiohttp.ClientSession()
+        self.session = await AsyncSessionPool(config=self.config).get_session()
+
+    @staticmethod
+    async def wait_deadline(coroutine, deadline: float = None):
+        """
+        Await coroutine, cancelled with asyncio.TimeoutError when deadline passes
+        """
+        if deadline is None:
+            return await coroutine
+        return await asyncio.wait_for(coroutine, timeout=max(deadline - time.time(), 0))
 
     async def make_request(self, request_func, call_back_func=None, key=None, postfix="", call_prop: float = 0,
-                           num_retry: int = None):
+                           num_retry: int = None, deadline: float = None):
         """
         This is the common make request function with try cache mechanism
         :param call_prop: probability that the <request_func> is recall even if <key> exists in cache
@@ -98,14 +122,22 @@ class BaseAsyncService(BaseService):
         :param key: cache the result with this key. Key is only needed when using Cache BaseServices
         :param postfix: tell where key to be stored in cache space
         :param num_retry: number of retry if a request fail
+        :param deadline: time.time() after which the result is not needed anymore, no attempt is started past it.
+        None to use the deadline of the current request
         :return: the output of request_func
         """
         await self.init_session(False)
+        self.retry_policy.on_request()
+        deadline = deadline if deadline is not None else RequestDeadline.get_deadline()
+        start_time = time.time()
         result = None
         retry = num_retry if num_retry is not None else self.config.num_retry
-        while result is None and retry > 0:
+        attempt = 0
+        while retry > 0 and not self.retry_policy.is_expired(deadline):
             try:
-                result = await request_func()
+                result = await self.wait_deadline(request_func(), deadline)
+            except CircuitOpenError:
+                break
             except Exception as e:
                 self.logger.error(f"[{self.__class__.__name__}]. Cannot make request. Retry remains: {retry}. "
                                   f"Error : {e}")
@@ -119,9 +151,15 @@ class BaseAsyncService(BaseService):
                         await self.call_back_func()
                     else:
                         raise ValueError("self.call_back_func must be async function")
-                retry -= 1
-                if retry > 0:
-                    await asyncio.sleep(0.1)
+            if result is not None:
+                break
+            retry -= 1
+            delay = self.retry_policy.get_retry_delay(attempt, retry, deadline)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+        RequestDeadline.record_stage(self.__class__.__name__, time.time() - start_time)
         return result
 
 
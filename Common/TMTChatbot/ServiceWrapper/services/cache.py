@@ -1,25 +1,34 @@
+import asyncio
 import logging
 from abc import ABC
-from queue import Queue
-from threading import Thread, Event
-import binascii
-import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Full, Empty
+from threading import Thread, Event, Lock, RLock
+import sys
 import time
 import json
 from urllib.parse import quote
 from uuid import uuid5, uuid4
 
+import aiohttp
+
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.Common.utils.data_utils import jaccard_distance, text_ngram
 from TMTChatbot.ServiceWrapper.services.base_service import BaseServiceSingleton
+from TMTChatbot.ServiceWrapper.services.codec import CacheCodec
+from TMTChatbot.ServiceWrapper.services.session_pool import AsyncSessionPool
 from TMTChatbot.ServiceWrapper.services.stomp_socket.client import Client
 
 
 class Cache:
-    def __init__(self, config: Config = None, name: str = None):
+    caches = {}
+
+    def __init__(self, config: Config = None, name: str = None, max_size: int = None):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.config = config if config is not None else Config()
         self.name = name if name is not None else self.__class__.__name__
+        self.max_size = max_size if max_size is not None else self.config.max_ram_cache_size
         self.storage = {}
 
     def __getitem__(self, item):
@@ -32,9 +41,25 @@ class Cache:
     def __contains__(self, item):
         return item in self.storage
 
+    def __len__(self):
+        return self.size()
+
     def __setitem__(self, key, value):
         raise NotImplementedError("Need Implementation")
 
+    def get(self, key, default=None):
+        """
+        Value of <key> in one lookup, <default> if it is not cached. Unlike `key in cache` then cache[key], a cached
+        None is told apart from a missing key and the entry cannot be evicted in between by another thread
+        """
+        return self[key] if key in self else default
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Set <value> of <key>. <ttl> is ignored by caches whose entries do not expire
+        """
+        self[key] = value
+
     def size(self) -> int:
         raise NotImplementedError("Need Implementation")
 
@@ -42,28 +67,52 @@ class Cache:
         raise NotImplementedError("Need Implementation")
 
     def drop(self):
-        if self.size() >= self.config.max_ram_cache_size:
+        if self.size() >= self.max_size:
             remove_key = self.get_remove_key()
             del self[remove_key]
             self.logger.info(f"REMOVE key [{remove_key}] from cache [{self.name}]")
-            print(f"REMOVE key [{remove_key}] from cache [{self.name}]. {self.size()}/{self.config.max_ram_cache_size}")
 
     def clear(self):
         raise NotImplementedError("Need Implementation")
 
+    def keys(self):
+        return list(self.storage.keys())
+
+    def values(self):
+        return list(self.storage.values())
+
+    def items(self):
+        return list(self.storage.items())
+
+    @property
+    def info(self):
+        return f"SIZE: {self.size()}/{self.max_size}"
+
     @staticmethod
     def get_cache(config: Config = None, name: str = None):
+        """
+        Create the RAM cache of a service from <config.cache_type>. Created caches are reported by Monitor
+        """
         cache_type = config.cache_type
+        cache = None
         if cache_type == "FIFO":
-            return FIFOCache(config=config, name=name)
+            cache = FIFOCache(config=config, name=name)
         elif cache_type == "LRU":
-            return LRUCache(config=config, name=name)
+            cache = LRUCache(config=config, name=name)
+        elif cache_type == "SHARDED":
+            cache = ShardedCache(config=config, name=name)
+        elif cache_type == "WEIGHTED":
+            cache = WeightedTTLCache(config=config, name=name, ttl=config.cache_ttl or None,
+                                     max_bytes=config.cache_max_bytes)
+        if cache is not None:
+            Cache.caches[cache.name] = cache
+        return cache
 
 
 class FIFOCache(Cache, ABC):
-    def __init__(self, config: Config = None, name: str = None):
-        super(FIFOCache, self).__init__(config=config, name=name)
-        self.queue = Queue(maxsize=self.config.max_ram_cache_size)
+    def __init__(self, config: Config = None, name: str = None, max_size: int = None):
+        super(FIFOCache, self).__init__(config=config, name=name, max_size=max_size)
+        self.queue = Queue(maxsize=self.max_size)
         self.storage = {}
 
     def __setitem__(self, key, value):
@@ -81,59 +130,316 @@ class FIFOCache(Cache, ABC):
     def clear(self):
         self.storage = {}
         old_queue = self.queue
-        self.queue = Queue(maxsize=self.config.max_ram_cache_size)
+        self.queue = Queue(maxsize=self.max_size)
         while old_queue.qsize() > 0:
             old_queue.get()
 
 
 class LRUCache(Cache, ABC):
-
-    def __init__(self, config: Config = None, name: str = None):
-        super(LRUCache, self).__init__(config=config, name=name)
-        self.timer = {}
-        self.key_list = []
-        self.count = 0
-
-    def sort_key_list(self):
-        self.key_list.sort(key=lambda item: self.timer[item], reverse=True)
+    """
+    Least recently used cache. Keys are kept in an OrderedDict from the least to the most recently used one, so
+    lookups, updates and evictions are O(1) whatever the size of the cache
+    """
+    def __init__(self, config: Config = None, name: str = None, max_size: int = None):
+        super(LRUCache, self).__init__(config=config, name=name, max_size=max_size)
+        self.storage = OrderedDict()
+
+    def touch(self, key):
+        try:
+            self.storage.move_to_end(key)
+        except KeyError:
+            pass
 
     def __contains__(self, item):
         output = item in self.storage
         if output:
-            self.timer[item] = time.time()
-            self.sort_key_list()
+            self.touch(item)
         return output
 
     def __getitem__(self, item):
         output = self.storage.get(item)
-        self.timer[item] = time.time()
-        self.sort_key_list()
+        self.touch(item)
         return output
 
-    def __delitem__(self, key):
-        if key in self.storage:
-            del self.storage[key]
-            del self.timer[key]
-
     def __setitem__(self, key, value):
-        if key not in self.storage:
-            self.key_list.append(key)
-        self.timer[key] = time.time()
         self.storage[key] = value
-        self.sort_key_list()
+        self.touch(key)
         self.drop()
         self.logger.info(f"ADD key [{key}]")
 
+    def drop(self):
+        # evict only once over capacity, so the cache keeps max_size keys
+        while self.size() > self.max_size:
+            remove_key = self.get_remove_key()
+            del self[remove_key]
+            self.logger.info(f"REMOVE key [{remove_key}] from cache [{self.name}]")
+
     def size(self):
-        return len(self.key_list)
+        return len(self.storage)
 
     def get_remove_key(self):
-        return self.key_list.pop(-1)
+        return next(iter(self.storage))
 
     def clear(self):
-        self.storage = {}
-        self.timer = {}
-        self.key_list = []
+        self.storage = OrderedDict()
+
+
+class ShardedCache(Cache, ABC):
+    """
+    Thread safe cache split into <num_shards> LRU shards, each one guarded by its own lock. A key always lives in the
+    shard chosen by its hash, so concurrent workers only wait for each other when they touch the same shard. The
+    max_size keys are split between the shards and each shard evicts its own least recently used keys once over its
+    share. There are at most max_size shards, so every shard holds at least one key
+    """
+    def __init__(self, config: Config = None, name: str = None, max_size: int = None, num_shards: int = None):
+        super(ShardedCache, self).__init__(config=config, name=name, max_size=max_size)
+        num_shards = num_shards if num_shards is not None else self.config.cache_shards
+        self.num_shards = max(min(num_shards, self.max_size), 1)
+        self.shards = [LRUCache(config=self.config, name=f"{self.name}_{idx}", max_size=self.get_shard_size(idx))
+                       for idx in range(self.num_shards)]
+        self.locks = [Lock() for _ in range(self.num_shards)]
+
+    def get_shard_size(self, idx: int) -> int:
+        """
+        Share of max_size held by shard idx, the shares add up to max_size
+        """
+        return self.max_size // self.num_shards + (1 if idx < self.max_size % self.num_shards else 0)
+
+    def get_shard(self, key):
+        idx = hash(key) % self.num_shards
+        return self.shards[idx], self.locks[idx]
+
+    def __contains__(self, item):
+        shard, lock = self.get_shard(item)
+        with lock:
+            return item in shard
+
+    def __getitem__(self, item):
+        shard, lock = self.get_shard(item)
+        with lock:
+            return shard[item]
+
+    def get(self, key, default=None):
+        shard, lock = self.get_shard(key)
+        with lock:
+            return shard.get(key, default)
+
+    def __delitem__(self, key):
+        shard, lock = self.get_shard(key)
+        with lock:
+            del shard[key]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, ttl: float = None):
+        shard, lock = self.get_shard(key)
+        with lock:
+            shard.set(key, value, ttl=ttl)
+
+    def size(self):
+        return sum(shard.size() for shard in self.shards)
+
+    def clear(self):
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                shard.clear()
+
+    def items(self):
+        output = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                output += shard.items()
+        return output
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+
+class TTLCache(LRUCache, ABC):
+    """
+    LRU cache whose entries also expire after <ttl> seconds. Empty values (None, empty list) are negative entries and
+    expire after <negative_ttl> seconds, so a miss is retried soon but a scan over unknown keys cannot grow the cache
+    beyond <max_size>. Thread safe: every access holds one reentrant lock, use <get> to check and read a key at once
+    """
+    def __init__(self, config: Config = None, name: str = None, max_size: int = None, ttl: float = None,
+                 negative_ttl: float = None):
+        super(TTLCache, self).__init__(config=config, name=name, max_size=max_size)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else ttl
+        self.expire_time = {}
+        self.lock = RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def expired(self, key):
+        expire_time = self.expire_time.get(key)
+        return expire_time is not None and expire_time <= time.time()
+
+    def __contains__(self, item):
+        with self.lock:
+            if self.expired(item):
+                del self[item]
+                self.expirations += 1
+            output = super(TTLCache, self).__contains__(item)
+            if output:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return output
+
+    def __getitem__(self, item):
+        with self.lock:
+            return super(TTLCache, self).__getitem__(item)
+
+    def get(self, key, default=None):
+        with self.lock:
+            return super(TTLCache, self).get(key, default)
+
+    def __delitem__(self, key):
+        with self.lock:
+            super(TTLCache, self).__delitem__(key)
+            if key in self.expire_time:
+                del self.expire_time[key]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Set <value> of <key>, expiring after <ttl> seconds. If <ttl> is None, the ttl of the cache is used
+        """
+        if ttl is None:
+            ttl = self.ttl if value else self.negative_ttl
+        with self.lock:
+            if ttl is not None:
+                self.expire_time[key] = time.time() + ttl
+            elif key in self.expire_time:
+                del self.expire_time[key]
+            super(TTLCache, self).__setitem__(key, value)
+
+    def drop(self):
+        with self.lock:
+            while self.size() > self.max_size:
+                del self[self.get_remove_key()]
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            super(TTLCache, self).clear()
+            self.expire_time = {}
+
+    def items(self):
+        with self.lock:
+            return super(TTLCache, self).items()
+
+    def keys(self):
+        with self.lock:
+            return super(TTLCache, self).keys()
+
+    def values(self):
+        with self.lock:
+            return super(TTLCache, self).values()
+
+    @property
+    def info(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total > 0 else 0
+        return f"SIZE: {self.size()}/{self.max_size}, HITS: {self.hits}, MISSES: {self.misses}, " \
+               f"HIT_RATE: {hit_rate:.3f}, EVICTIONS: {self.evictions}, EXPIRATIONS: {self.expirations}"
+
+
+class WeightedTTLCache(TTLCache, ABC):
+    """
+    TTLCache bounded by the approximate memory of its values as well as by its number of entries. Once <max_bytes> is
+    exceeded, expired entries and then least recently used ones are evicted in one batch, until the cache holds at
+    most <evict_ratio> * <max_bytes>. The entry just set is never evicted, and a value heavier than that target is not
+    cached at all, so it cannot empty the cache. <max_bytes> = 0 disables the memory bound. Entries and their weights
+    are updated under the lock of TTLCache, values are weighed before taking it
+    """
+    def __init__(self, config: Config = None, name: str = None, max_size: int = None, ttl: float = None,
+                 negative_ttl: float = None, max_bytes: int = None, evict_ratio: float = 0.9):
+        super(WeightedTTLCache, self).__init__(config=config, name=name, max_size=max_size, ttl=ttl,
+                                               negative_ttl=negative_ttl)
+        self.max_bytes = max_bytes if max_bytes is not None else self.config.cache_max_bytes
+        self.evict_ratio = evict_ratio
+        self.weights = {}
+        self.total_bytes = 0
+        self.rejected = 0
+
+    @property
+    def max_entry_bytes(self):
+        return self.max_bytes * self.evict_ratio
+
+    @staticmethod
+    def get_object_size(obj, seen: set = None) -> int:
+        """
+        Approximate memory of <obj> and of the containers, strings and numbers it refers to, in bytes
+        """
+        seen = seen if seen is not None else set()
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        size = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            size += sum(WeightedTTLCache.get_object_size(key, seen) + WeightedTTLCache.get_object_size(value, seen)
+                        for key, value in obj.items())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            size += sum(WeightedTTLCache.get_object_size(item, seen) for item in obj)
+        elif hasattr(obj, "__dict__"):
+            size += WeightedTTLCache.get_object_size(obj.__dict__, seen)
+        elif hasattr(obj, "__slots__"):
+            size += sum(WeightedTTLCache.get_object_size(getattr(obj, name, None), seen) for name in obj.__slots__)
+        return size
+
+    def set(self, key, value, ttl: float = None):
+        weight = self.get_object_size(value)
+        with self.lock:
+            if self.max_bytes and weight > self.max_entry_bytes:
+                # drop the former value as well, it is outdated
+                del self[key]
+                self.rejected += 1
+                self.logger.debug(f"[{self.name}] value of key [{key}] is too large to cache: {weight} bytes")
+                return
+            self.total_bytes += weight - self.weights.get(key, 0)
+            self.weights[key] = weight
+            super(WeightedTTLCache, self).set(key, value, ttl=ttl)
+
+    def __delitem__(self, key):
+        with self.lock:
+            super(WeightedTTLCache, self).__delitem__(key)
+            if key in self.weights:
+                self.total_bytes -= self.weights.pop(key)
+
+    def drop(self):
+        with self.lock:
+            super(WeightedTTLCache, self).drop()
+            if not self.max_bytes or self.total_bytes <= self.max_bytes:
+                return
+            for key in [key for key in list(self.expire_time) if self.expired(key)]:
+                del self[key]
+                self.expirations += 1
+            target_bytes = self.max_bytes * self.evict_ratio
+            # the entry just set is the most recently used one, it is the last one left
+            while self.total_bytes > target_bytes and self.size() > 1:
+                del self[self.get_remove_key()]
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            super(WeightedTTLCache, self).clear()
+            self.weights = {}
+            self.total_bytes = 0
+
+    @property
+    def info(self):
+        return f"{super(WeightedTTLCache, self).info}, BYTES: {self.total_bytes}/{self.max_bytes}, " \
+               f"REJECTED: {self.rejected}"
 
 
 class BaseCacheService(BaseServiceSingleton):
@@ -141,32 +447,108 @@ class BaseCacheService(BaseServiceSingleton):
         super(BaseCacheService, self).__init__(config=config)
         self.search_times = []
         self.write_times = []
+        self.codec = CacheCodec.get_codec(self.config.cache_codec)
+        self.save_queue = Queue(maxsize=self.config.cache_save_queue_size)
+        self.dropped_saves = 0
+        self.flusher = None
+        self.flusher_lock = Lock()
 
     @staticmethod
     def generate_request_id(key):
         return str(uuid5(uuid4(), key))
 
-    @staticmethod
-    def compress(data):
-        data_string = json.dumps(data, ensure_ascii=False)
-        output = binascii.hexlify(zlib.compress(data_string.encode(encoding="utf8"))).decode('utf-8')
-        return output
+    def compress(self, data):
+        return self.codec.encode(data)
 
     @staticmethod
     def decompress(data_string):
-        data_string = str(zlib.decompress(bytes.fromhex(data_string)).decode(encoding="utf8"))
-        return json.loads(data_string)
+        return CacheCodec.decode(data_string)
+
+    @staticmethod
+    def add_time(times: list, duration: float):
+        times.append(duration)
+        while len(times) > 60:
+            times.pop(0)
+
+    def decode_output(self, out):
+        out = out["data"]
+        if out is None:
+            return []
+        for item in out:
+            item["data"] = self.decompress(item["data"])
+        return out
 
     @property
     def connected(self):
         raise NotImplementedError("Need Implementation")
 
     def save(self, key: str, data):
+        """
+        Queue an item for the background flusher and return without waiting for the cache
+        """
+        self.save_many([(key, data)])
+
+    def save_many(self, items: [tuple]):
+        """
+        Queue (key, data) items for the background flusher, which writes them in batches. Items are dropped when the
+        queue is full, the remote cache is only a cache
+        """
+        self.start_flusher()
+        for item in items:
+            try:
+                self.save_queue.put_nowait(item)
+            except Full:
+                self.dropped_saves += 1
+
+    def start_flusher(self):
+        with self.flusher_lock:
+            if self.flusher is None:
+                self.flusher = Thread(target=self.flush_job, daemon=True)
+                self.flusher.start()
+
+    def flush_job(self):
+        while True:
+            items = [self.save_queue.get()]
+            while len(items) < self.config.cache_batch_size:
+                try:
+                    items.append(self.save_queue.get_nowait())
+                except Empty:
+                    break
+            try:
+                self.save_batch(items)
+            except Exception as e:
+                self.logger.error(f"Cannot save {len(items)} items to cache. Error: {e}")
+
+    def save_batch(self, items: [tuple]):
+        """
+        Write (key, data) items to the remote cache. Called by the flusher only
+        """
         raise NotImplementedError("Need Implementation")
 
-    def search_func(self, key, size=5):
+    def search_func(self, key, size=5, timeout: float = None):
+        """
+        :param timeout: seconds to wait for the answer of the remote cache. None to use config.cache_search_timeout
+        """
+        return self.search_many_func([key], size=size, timeout=timeout)[0]
+
+    def search_many_func(self, keys: [str], size=5, timeout: float = None) -> list:
+        """
+        Search several keys with a single wait for the remote cache
+        :return: candidates of each key, None for keys the remote cache did not answer
+        """
         raise NotImplementedError("Need Implementation")
 
+    async def async_search_many_func(self, keys: [str], size=5, timeout: float = None) -> list:
+        """
+        search_many_func for coroutines. Clients without a non blocking implementation wait in the default executor,
+        so the event loop keeps running while the remote cache answers
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.search_many_func, keys, size, timeout)
+
+    def get_search_timeout(self, timeout: float = None):
+        return timeout if timeout is not None else self.config.cache_search_timeout
+
     @property
     def search_per_second(self):
         return len(self.search_times) / sum(self.search_times)
@@ -178,7 +560,8 @@ class BaseCacheService(BaseServiceSingleton):
     @property
     def info(self):
         return f"SEARCH_PER_SECOND: {self.search_per_second} items/s\n" \
-               f"SAVE_PER_SECOND: {self.save_per_second} items/s"
+               f"SAVE_PER_SECOND: {self.save_per_second} items/s\n" \
+               f"SAVE_QUEUE: {self.save_queue.qsize()}, DROPPED_SAVES: {self.dropped_saves}"
 
     @staticmethod
     def get_best_result(text, candidates, exact=False):
@@ -195,8 +578,7 @@ class BaseCacheService(BaseServiceSingleton):
                 if score >= 0.9:
                     return candidate
 
-    def search(self, text, size=5, exact=False, pre_check_func=None):
-        outputs = self.search_func(size=size, key=text)
+    def select_result(self, text, outputs, exact=False, pre_check_func=None):
         if outputs is not None:
             self.logger.info(f"Loaded results from ES Cache")
             if pre_check_func is not None:
@@ -216,6 +598,33 @@ class BaseCacheService(BaseServiceSingleton):
             return output
         return outputs
 
+    def search(self, text, size=5, exact=False, pre_check_func=None, timeout: float = None):
+        outputs = self.search_func(size=size, key=text, timeout=timeout)
+        return self.select_result(text, outputs, exact=exact, pre_check_func=pre_check_func)
+
+    def search_many(self, texts: [str], size=5, exact=False, pre_check_func=None, timeout: float = None) -> list:
+        """
+        search for several texts in one round trip
+        :return: the result of each text, None if it is not found
+        """
+        if len(texts) == 0:
+            return []
+        outputs = self.search_many_func(texts, size=size, timeout=timeout)
+        return [self.select_result(text, output, exact=exact, pre_check_func=pre_check_func)
+                for text, output in zip(texts, outputs)]
+
+    async def async_search(self, text, size=5, exact=False, pre_check_func=None, timeout: float = None):
+        outputs = (await self.async_search_many_func([text], size=size, timeout=timeout))[0]
+        return self.select_result(text, outputs, exact=exact, pre_check_func=pre_check_func)
+
+    async def async_search_many(self, texts: [str], size=5, exact=False, pre_check_func=None,
+                                timeout: float = None) -> list:
+        if len(texts) == 0:
+            return []
+        outputs = await self.async_search_many_func(texts, size=size, timeout=timeout)
+        return [self.select_result(text, output, exact=exact, pre_check_func=pre_check_func)
+                for text, output in zip(texts, outputs)]
+
     @staticmethod
     def get_cache(config: Config = None):
         cache_endpoint_type = config.cache_endpoint_type
@@ -276,87 +685,140 @@ class SocketCacheService(BaseCacheService):
                 self.logger.error(f"Cannot send data to socket. Error: {e}")
                 return False
 
-    def save(self, key: str, data):
+    def send_requests(self, requests: [dict], timeout: float):
+        """
+        Send all requests before waiting for any answer, then wait for the answers until a common deadline
+        :return: the answer of each request, None if it did not come in time
+        """
+        start_time = time.time()
+        pending = []
+        for request in requests:
+            done_event = Event()
+            self.storage[request["requestId"]] = {
+                "event": done_event,
+                "future": None,
+                "data": None
+            }
+            if self.send(request):
+                pending.append((request["requestId"], done_event))
+            else:
+                del self.storage[request["requestId"]]
+                pending.append((None, None))
+        deadline = start_time + timeout
+        outputs = []
+        for request_id, done_event in pending:
+            out = None
+            if done_event is not None:
+                done_event.wait(max(deadline - time.time(), 0))
+                request = self.storage.pop(request_id, None)
+                if done_event.is_set() and request is not None:
+                    out = request["data"]
+            outputs.append(out)
+        return outputs
+
+    async def async_send_requests(self, requests: [dict], timeout: float):
+        """
+        send_requests for coroutines: answers resolve futures of the event loop instead of waking a waiting thread
+        """
+        loop = asyncio.get_event_loop()
+        pending = []
+        for request in requests:
+            future = loop.create_future()
+            self.storage[request["requestId"]] = {
+                "event": None,
+                "future": future,
+                "data": None
+            }
+            if self.send(request):
+                pending.append((request["requestId"], future))
+            else:
+                del self.storage[request["requestId"]]
+                pending.append((None, None))
+        futures = [future for _, future in pending if future is not None]
+        try:
+            if len(futures) > 0:
+                await asyncio.wait(futures, timeout=timeout)
+        finally:
+            for request_id, _ in pending:
+                self.storage.pop(request_id, None)
+        return [future.result() if future is not None and future.done() and not future.cancelled() else None
+                for _, future in pending]
+
+    @staticmethod
+    def set_future_result(future: asyncio.Future, data):
+        if not future.done():
+            future.set_result(data)
+
+    def save_batch(self, items: [tuple]):
         if self.client is None or not self.client.connected:
             return
         start_time = time.time()
-        done_event = Event()
-        done_event.clear()
-        request_id = self.generate_request_id(key)
-        data = self.compress(data)
-        save_data = {"key": key, "data": data, "requestId": request_id}
-        self.storage[request_id] = {
-            "event": done_event,
-            "data": None
-        }
-        success = self.send(save_data)
-        done_event.wait(1)
-        if success:
-            if done_event.is_set():
-                del self.storage[request_id]
-                self.write_times.append(time.time() - start_time)
-                while len(self.write_times) > 60:
-                    self.write_times.pop(0)
-        else:
-            del self.storage[request_id]
+        requests = [{"key": key, "data": self.compress(data), "requestId": self.generate_request_id(key)}
+                    for key, data in items]
+        outputs = self.send_requests(requests, timeout=1)
+        duration = (time.time() - start_time) / len(items)
+        for out in outputs:
+            if out is not None:
+                self.add_time(self.write_times, duration)
+
+    def search_many_func(self, keys: [str], size=5, timeout: float = None) -> list:
+        if self.client is None or not self.client.subscribed:
+            return [None] * len(keys)
+        start_time = time.time()
+        requests = [{"searchKey": key, "requestId": self.generate_request_id(key), "size": size} for key in keys]
+        outputs = self.send_requests(requests, timeout=self.get_search_timeout(timeout))
+        duration = (time.time() - start_time) / len(keys)
+        for idx, out in enumerate(outputs):
+            if out is not None:
+                self.add_time(self.search_times, duration)
+                outputs[idx] = self.decode_output(out)
+        return outputs
 
-    def search_func(self, key, size=5):
+    async def async_search_many_func(self, keys: [str], size=5, timeout: float = None) -> list:
         if self.client is None or not self.client.subscribed:
-            return
+            return [None] * len(keys)
         start_time = time.time()
-        done_event = Event()
-        done_event.clear()
-        request_id = self.generate_request_id(key)
-        search_data = {"searchKey": key, "requestId": request_id, "size": size}
-        self.storage[request_id] = {
-            "event": done_event,
-            "data": None
-        }
-        self.send(search_data)
-        done_event.wait(1)
-        out = None
-        if done_event.is_set():
-            out = self.storage[request_id]["data"]
-            del self.storage[request_id]
-        if out is not None:
-            self.search_times.append(time.time() - start_time)
-            while len(self.search_times) > 60:
-                self.search_times.pop(0)
-            out = out["data"]
-            if out is None:
-                out = []
-            else:
-                for item in out:
-                    item["data"] = self.decompress(item["data"])
-        return out
+        requests = [{"searchKey": key, "requestId": self.generate_request_id(key), "size": size} for key in keys]
+        outputs = await self.async_send_requests(requests, timeout=self.get_search_timeout(timeout))
+        duration = (time.time() - start_time) / len(keys)
+        for idx, out in enumerate(outputs):
+            if out is not None:
+                self.add_time(self.search_times, duration)
+                outputs[idx] = self.decode_output(out)
+        return outputs
 
-    def _process_data(self, frame):
+    @staticmethod
+    def parse_body(text_data: str):
+        """
+        Parse a frame body, which the cache server may send as json encoded into a json string
+        """
         try:
-            text_data = frame.body
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            # body escaped without being quoted
             while '\\"' in text_data:
                 text_data = text_data.replace('\\"', '"')
             data = json.loads(text_data)
+        while isinstance(data, str):
+            data = json.loads(data)
+        return data
+
+    def _process_data(self, frame):
+        try:
+            data = self.parse_body(frame.body)
             request_id = data["requestId"]
-            if request_id in self.storage:
+            request = self.storage.get(request_id)
+            if request is not None:
                 del data["requestId"]
-                self.storage[request_id]["data"] = data
-                self.storage[request_id]["event"].set()
+                request["data"] = data
+                if request["future"] is not None:
+                    # called by the socket thread, the future belongs to the event loop
+                    request["future"].get_loop().call_soon_threadsafe(self.set_future_result, request["future"], data)
+                else:
+                    request["event"].set()
         except Exception as e:
             self.logger.error(f"Error parsing data from socket. Error: {e}")
 
-    @property
-    def search_per_second(self):
-        return len(self.search_times) / sum(self.search_times)
-
-    @property
-    def save_per_second(self):
-        return len(self.write_times) / sum(self.write_times)
-
-    @property
-    def info(self):
-        return f"SEARCH_PER_SECOND: {self.search_per_second} items/s\n" \
-               f"SAVE_PER_SECOND: {self.save_per_second} items/s"
-
 
 class RestFulCacheService(BaseCacheService):
     def __init__(self, config: Config = None):
@@ -364,12 +826,15 @@ class RestFulCacheService(BaseCacheService):
         self.search_times = []
         self.write_times = []
         self.api_url = f"http://{config.cache_host}:{config.cache_port}/{config.cache_endpoint}"
+        # one request per key, sent concurrently by a batch
+        self.batch_executor = ThreadPoolExecutor(max_workers=self.config.cache_batch_size,
+                                                 thread_name_prefix=self.__class__.__name__)
 
     @property
     def connected(self):
         return True
 
-    def save(self, key: str, data):
+    def save_one(self, key: str, data):
         def save_request(item):
             save_data = {"key": key, "data": item}
             output = self.session.post(self.api_url, json=save_data).json()
@@ -378,26 +843,42 @@ class RestFulCacheService(BaseCacheService):
         start_time = time.time()
         data = self.compress(data)
         self.make_request(lambda: save_request(data), num_retry=1)
-        self.write_times.append(time.time() - start_time)
+        self.add_time(self.write_times, time.time() - start_time)
 
-    def search_func(self, key, size=5):
+    def save_batch(self, items: [tuple]):
+        list(self.batch_executor.map(lambda item: self.save_one(*item), items))
+
+    def search_one(self, key, size=5, timeout: float = None):
         def search_request():
             url_key = quote(key, safe='')
-            output = self.session.get(f"{self.api_url}{url_key}").json()
+            output = self.session.get(f"{self.api_url}{url_key}", timeout=self.get_search_timeout(timeout)).json()
             return output
 
         start_time = time.time()
         out = self.make_request(search_request, num_retry=1)
         if out is not None:
-            self.search_times.append(time.time() - start_time)
-            while len(self.search_times) > 60:
-                self.search_times.pop(0)
-            out = out["data"]
-            if out is None:
-                out = []
-            else:
-                for item in out:
-                    item["data"] = self.decompress(item["data"])
+            self.add_time(self.search_times, time.time() - start_time)
+            out = self.decode_output(out)
         return out
 
+    def search_many_func(self, keys: [str], size=5, timeout: float = None) -> list:
+        if len(keys) == 1:
+            return [self.search_one(keys[0], size=size, timeout=timeout)]
+        return list(self.batch_executor.map(lambda key: self.search_one(key, size=size, timeout=timeout), keys))
+
+    async def async_search_one(self, key, size=5, timeout: float = None):
+        session = await AsyncSessionPool(config=self.config).get_session()
+        url_key = quote(key, safe='')
+        start_time = time.time()
+        try:
+            async with session.get(f"{self.api_url}{url_key}",
+                                   timeout=aiohttp.ClientTimeout(total=self.get_search_timeout(timeout))) as response:
+                out = await response.json(content_type=None)
+        except Exception as e:
+            self.logger.error(f"Cannot search [{key}] in cache. Error: {e}")
+            return None
+        self.add_time(self.search_times, time.time() - start_time)
+        return self.decode_output(out)
 
+    async def async_search_many_func(self, keys: [str], size=5, timeout: float = None) -> list:
+        return list(await asyncio.gather(*[self.async_search_one(key, size=size, timeout=timeout) for key in keys]))
@@ -0,0 +1,131 @@
+import logging
+import time
+from collections import deque
+from threading import Lock
+
+from TMTChatbot.Common.config.config import Config
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an upstream whose circuit is open. It is not retried
+    """
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream which fails. The outcomes of the last <window_size> calls are kept, and the circuit opens
+    when at least <min_calls> of them are known and their failure rate reaches <failure_rate>. After <open_timeout>
+    seconds it becomes half open and lets <half_open_calls> probes through at a time: one failed probe opens it again,
+    <half_open_calls> successful probes close it
+    """
+    breakers = {}
+    registry_lock = Lock()
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window_size: int = 20, min_calls: int = 5,
+                 open_timeout: float = 1, half_open_calls: int = 1):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_timeout = open_timeout
+        self.half_open_calls = half_open_calls
+        self.lock = Lock()
+        self.window = deque(maxlen=window_size)
+        self.state = CLOSED
+        self.opened_time = 0
+        self.probes = 0
+        self.probe_successes = 0
+        self.rejected = 0
+
+    @staticmethod
+    def get_breaker(name: str, config: Config = None):
+        """
+        :return: the circuit breaker of <name>, created from config on first use and shared afterwards
+        """
+        with CircuitBreaker.registry_lock:
+            if name not in CircuitBreaker.breakers:
+                config = config if config is not None else Config()
+                CircuitBreaker.breakers[name] = CircuitBreaker(name, failure_rate=config.circuit_failure_rate,
+                                                               window_size=config.circuit_window_size,
+                                                               min_calls=config.circuit_min_calls,
+                                                               open_timeout=config.external_failed_timeout,
+                                                               half_open_calls=config.circuit_half_open_calls)
+            return CircuitBreaker.breakers[name]
+
+    def set_state(self, state: str):
+        if state != self.state:
+            self.logger.info(f"[{self.name}] circuit {self.state} -> {state}")
+        self.state = state
+        if state == OPEN:
+            self.opened_time = time.time()
+        elif state == HALF_OPEN:
+            self.probes = 0
+            self.probe_successes = 0
+        else:
+            self.window.clear()
+
+    def available(self) -> bool:
+        """
+        Whether a call may go through now, without taking a half open probe
+        """
+        if self.state == OPEN:
+            return time.time() - self.opened_time >= self.open_timeout
+        if self.state == HALF_OPEN:
+            return self.probes < self.half_open_calls
+        return True
+
+    def allow_request(self) -> bool:
+        """
+        Take the right to call the upstream. A call allowed in the half open state must be followed by
+        record_success or record_failure
+        """
+        with self.lock:
+            if self.state == OPEN and time.time() - self.opened_time >= self.open_timeout:
+                self.set_state(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self.probes < self.half_open_calls:
+                self.probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probes = max(self.probes - 1, 0)
+                self.probe_successes += 1
+                if self.probe_successes >= self.half_open_calls:
+                    self.set_state(CLOSED)
+            else:
+                self.window.append(True)
+
+    def release(self):
+        """
+        End an allowed call which was cancelled by its caller without an outcome, e.g. on its deadline or because the
+        remote cache answered first
+        """
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probes = max(self.probes - 1, 0)
+
+    def record_failure(self):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.set_state(OPEN)
+                return
+            self.window.append(False)
+            if self.state == CLOSED and len(self.window) >= self.min_calls \
+                    and self.window.count(False) / len(self.window) >= self.failure_rate:
+                self.set_state(OPEN)
+
+    @property
+    def info(self):
+        num_failures = self.window.count(False)
+        return f"STATE: {self.state}, FAILURES: {num_failures}/{len(self.window)}, REJECTED: {self.rejected}"
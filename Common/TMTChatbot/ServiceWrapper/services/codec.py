@@ -0,0 +1,228 @@
+import base64
+import binascii
+import json
+import logging
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# separates the codec tag from the payload of a stored item. Legacy hex payloads never contain it
+TAG_SEPARATOR = ":"
+LEGACY = "legacy"
+
+
+class Serializer:
+    name = None
+    available = True
+
+    def dumps(self, data) -> bytes:
+        raise NotImplementedError("Need Implementation")
+
+    def loads(self, data: bytes):
+        raise NotImplementedError("Need Implementation")
+
+
+class JsonSerializer(Serializer):
+    name = "json"
+
+    def dumps(self, data) -> bytes:
+        return json.dumps(data, ensure_ascii=False).encode(encoding="utf8")
+
+    def loads(self, data: bytes):
+        return json.loads(data.decode(encoding="utf8"))
+
+
+class OrjsonSerializer(JsonSerializer):
+    name = "orjson"
+    available = orjson is not None
+
+    def dumps(self, data) -> bytes:
+        return orjson.dumps(data)
+
+    def loads(self, data: bytes):
+        # orjson writes plain json, so its items stay readable where orjson is not installed
+        return orjson.loads(data) if self.available else super(OrjsonSerializer, self).loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    name = "msgpack"
+    available = msgpack is not None
+
+    def dumps(self, data) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, data: bytes):
+        return msgpack.unpackb(data, raw=False)
+
+
+class Compressor:
+    name = None
+    available = True
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError("Need Implementation")
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError("Need Implementation")
+
+
+class RawCompressor(Compressor):
+    name = "raw"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class ZlibCompressor(Compressor):
+    name = "zlib"
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    name = "zstd"
+    available = zstandard is not None
+
+    def __init__(self):
+        self.compressor = zstandard.ZstdCompressor(level=3) if self.available else None
+        self.decompressor = zstandard.ZstdDecompressor() if self.available else None
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self.decompressor.decompress(data)
+
+
+class Lz4Compressor(Compressor):
+    name = "lz4"
+    available = lz4_frame is not None
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+class CacheCodec:
+    """
+    Encode the items of the remote cache as "<serializer>.<compressor>:<base64 payload>". The tag tells every reader
+    how an item was written, so the codec can change without making stored items unreadable. Untagged items are
+    read as the legacy hexadecimal zlib json.
+
+    Binary transports can send the output of encode_bytes as is, with the tag in a header.
+    """
+    serializers = {serializer.name: serializer for serializer in [JsonSerializer(), OrjsonSerializer(),
+                                                                    MsgpackSerializer()]}
+    compressors = {compressor.name: compressor for compressor in [RawCompressor(), ZlibCompressor(),
+                                                                    ZstdCompressor(), Lz4Compressor()]}
+    codecs = {}
+    logger = logging.getLogger("CacheCodec")
+
+    def __init__(self, serializer: Serializer, compressor: Compressor):
+        self.serializer = serializer
+        self.compressor = compressor
+
+    @property
+    def name(self):
+        return f"{self.serializer.name}.{self.compressor.name}"
+
+    def encode_bytes(self, data) -> bytes:
+        return self.compressor.compress(self.serializer.dumps(data))
+
+    def decode_bytes(self, data: bytes):
+        return self.serializer.loads(self.compressor.decompress(data))
+
+    def encode(self, data) -> str:
+        return f"{self.name}{TAG_SEPARATOR}{base64.b64encode(self.encode_bytes(data)).decode('ascii')}"
+
+    @staticmethod
+    def encode_legacy(data) -> str:
+        data_string = json.dumps(data, ensure_ascii=False)
+        return binascii.hexlify(zlib.compress(data_string.encode(encoding="utf8"))).decode('utf-8')
+
+    @staticmethod
+    def decode_legacy(data_string: str):
+        data_string = str(zlib.decompress(bytes.fromhex(data_string)).decode(encoding="utf8"))
+        return json.loads(data_string)
+
+    @classmethod
+    def decode(cls, data_string: str):
+        """
+        Decode an item written by any codec, whichever codec this service writes with
+        """
+        if TAG_SEPARATOR not in data_string:
+            return cls.decode_legacy(data_string)
+        tag, payload = data_string.split(TAG_SEPARATOR, 1)
+        serializer_name, compressor_name = tag.split(".")
+        serializer, compressor = cls.serializers[serializer_name], cls.compressors[compressor_name]
+        if not serializer.available and not isinstance(serializer, JsonSerializer):
+            raise ValueError(f"Cannot decode [{tag}] item, {serializer.name} is not installed")
+        if not compressor.available:
+            raise ValueError(f"Cannot decode [{tag}] item, {compressor.name} is not installed")
+        return cls(serializer, compressor).decode_bytes(base64.b64decode(payload))
+
+    @classmethod
+    def get_best(cls, names: [str], default: str, components: dict):
+        for name in names:
+            component = components.get(name)
+            if component is not None and component.available:
+                return component
+            cls.logger.info(f"{name} is not installed. Try next one")
+        return components[default]
+
+    @classmethod
+    def get_codec(cls, name: str = None):
+        """
+        :param name: "<serializer>.<compressor>", e.g. "msgpack.zstd", or "legacy" to keep writing untagged hex items
+        while services which cannot read tagged items still share the cache. An empty name picks the fastest
+        installed serializer and compressor. Uninstalled ones fall back to json and zlib
+        :return: the codec, shared by all services using the same name
+        """
+        name = name or ""
+        if name not in cls.codecs:
+            if name == LEGACY:
+                cls.codecs[name] = LegacyCacheCodec()
+            else:
+                serializer_name, _, compressor_name = name.partition(".")
+                serializer = cls.get_best([serializer_name] if serializer_name else ["orjson"], "json",
+                                          cls.serializers)
+                compressor = cls.get_best([compressor_name] if compressor_name else ["zstd", "lz4"], "zlib",
+                                          cls.compressors)
+                cls.codecs[name] = cls(serializer, compressor)
+        return cls.codecs[name]
+
+
+class LegacyCacheCodec(CacheCodec):
+    def __init__(self):
+        super(LegacyCacheCodec, self).__init__(CacheCodec.serializers["json"], CacheCodec.compressors["zlib"])
+
+    @property
+    def name(self):
+        return LEGACY
+
+    def encode(self, data) -> str:
+        return self.encode_legacy(data)
@@ -0,0 +1,121 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from threading import Lock
+
+current_deadline = ContextVar("current_deadline", default=None)
+
+
+class RequestDeadline:
+    """
+    Time budget of one request. It is set at the entry point (api route, pipeline) and read by every service the
+    request goes through in the same context: make_request does not start an attempt once it is exhausted, http and
+    remote cache timeouts are cut to the time left. Stages add the time they used, logged when the request ends.
+    Thread pools do not inherit the context, jobs submitted for a request must be wrapped with bind
+    """
+    def __init__(self, timeout: float, name: str = ""):
+        self.name = name
+        self.timeout = timeout
+        self.start_time = time.time()
+        self.deadline = self.start_time + timeout
+        self.lock = Lock()
+        self.stages = {}
+
+    def remaining(self) -> float:
+        return max(self.deadline - time.time(), 0)
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.deadline
+
+    def record(self, stage: str, seconds: float):
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0) + seconds
+
+    @property
+    def info(self):
+        with self.lock:
+            stages = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in self.stages.items())
+        return f"[{self.name}] USED {time.time() - self.start_time:.3f}/{self.timeout:.3f}s [{stages}]"
+
+    @staticmethod
+    def get():
+        """
+        :return: the deadline of the current request, None if it has none
+        """
+        return current_deadline.get()
+
+    @staticmethod
+    def get_deadline():
+        """
+        :return: time.time() after which the current request is not needed anymore, None if it has no deadline
+        """
+        deadline = current_deadline.get()
+        return deadline.deadline if deadline is not None else None
+
+    @staticmethod
+    def get_timeout(timeout):
+        """
+        Cut a timeout to the time left to the current request
+        :param timeout: seconds, None or a (connect, read) tuple as accepted by requests
+        """
+        deadline = current_deadline.get()
+        if deadline is None:
+            return timeout
+        remaining = deadline.remaining()
+        if isinstance(timeout, tuple):
+            return tuple(min(item, remaining) if item is not None else remaining for item in timeout)
+        return min(timeout, remaining) if timeout is not None else remaining
+
+    @staticmethod
+    @contextmanager
+    def start(timeout: float, name: str = ""):
+        """
+        Give the code run in this context <timeout> seconds. Nothing is set if timeout <= 0, or if the context already
+        has a deadline: a request keeps the budget of its entry point
+        """
+        if timeout is None or timeout <= 0 or current_deadline.get() is not None:
+            yield current_deadline.get()
+            return
+        deadline = RequestDeadline(timeout, name=name)
+        token = current_deadline.set(deadline)
+        try:
+            yield deadline
+        finally:
+            current_deadline.reset(token)
+            logger = logging.getLogger(RequestDeadline.__name__)
+            if deadline.expired:
+                logger.warning(f"DEADLINE EXCEEDED {deadline.info}")
+            else:
+                logger.debug(f"DEADLINE {deadline.info}")
+
+    @staticmethod
+    def record_stage(stage: str, seconds: float):
+        deadline = current_deadline.get()
+        if deadline is not None:
+            deadline.record(stage, seconds)
+
+    @staticmethod
+    @contextmanager
+    def stage(name: str):
+        """
+        Add the time spent in this context to the stage <name> of the current request
+        """
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            RequestDeadline.record_stage(name, time.time() - start_time)
+
+    @staticmethod
+    def bind(func):
+        """
+        :return: func run in a copy of the current context, to be submitted to a thread pool
+        """
+        context = copy_context()
+
+        def run(*args, **kwargs):
+            return context.run(func, *args, **kwargs)
+
+        return run
@@ -0,0 +1,139 @@
+import asyncio
+from threading import Event, Lock
+from typing import Callable, List
+
+
+class Batch:
+    def __init__(self):
+        self.items = []
+        self.results = None
+        self.error = None
+        self.full = Event()
+        self.done = Event()
+
+
+class MicroBatcher:
+    """
+    Group concurrent calls into batches of up to <batch_size> items. The first caller of a batch waits at most
+    <interval> seconds for it to fill, then sends it with send_func(items) -> results, one result per item in the same
+    order. Every caller gets its own result, or the error of the batch
+    """
+    def __init__(self, send_func: Callable, batch_size: int, interval: float):
+        self.send_func = send_func
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lock = Lock()
+        self.batch = None
+        self.num_batches = 0
+        self.num_items = 0
+
+    def take(self, batch):
+        """
+        Close batch if it is still open, no more items are added to it afterwards
+        """
+        with self.lock:
+            if self.batch is batch:
+                self.batch = None
+
+    def send(self, items: List):
+        results = self.send_func(items)
+        if results is None or len(results) != len(items):
+            raise ValueError(f"Got {None if results is None else len(results)} results for a batch of {len(items)}")
+        with self.lock:
+            self.num_batches += 1
+            self.num_items += len(items)
+        return results
+
+    def submit(self, item):
+        with self.lock:
+            batch = self.batch
+            if batch is None:
+                batch = self.batch = Batch()
+            index = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.batch_size:
+                self.batch = None
+                batch.full.set()
+        if index > 0:
+            batch.done.wait()
+        else:
+            batch.full.wait(self.interval)
+            self.take(batch)
+            try:
+                batch.results = self.send(batch.items)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    @property
+    def info(self):
+        return f"BATCHES: {self.num_batches}, AVG_BATCH_SIZE: {self.num_items / max(self.num_batches, 1):.1f}"
+
+
+class AsyncBatch:
+    def __init__(self):
+        self.items = []
+        self.futures = []
+        self.timer = None
+
+
+class AsyncMicroBatcher(MicroBatcher):
+    """
+    MicroBatcher for coroutines: send_func is a coroutine function, callers await the future of their item. A batch is
+    sent by a task once full or <interval> seconds after its first item
+    """
+    def __init__(self, send_func: Callable, batch_size: int, interval: float):
+        super(AsyncMicroBatcher, self).__init__(send_func=send_func, batch_size=batch_size, interval=interval)
+        self.tasks = set()
+
+    def close(self, batch: AsyncBatch):
+        if self.batch is not batch:
+            return
+        self.batch = None
+        if batch.timer is not None:
+            batch.timer.cancel()
+        # keep a reference to the task, the event loop only keeps a weak one
+        task = asyncio.ensure_future(self.flush(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def send(self, items: List):
+        results = await self.send_func(items)
+        if results is None or len(results) != len(items):
+            raise ValueError(f"Got {None if results is None else len(results)} results for a batch of {len(items)}")
+        self.num_batches += 1
+        self.num_items += len(items)
+        return results
+
+    async def flush(self, batch: AsyncBatch):
+        try:
+            results = await self.send(batch.items)
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+                    # retrieve the exception, so it is not reported as never retrieved by a cancelled caller
+                    future.exception()
+        else:
+            for future, result in zip(batch.futures, results):
+                # the caller may have been cancelled meanwhile, e.g. on its deadline
+                if not future.done():
+                    future.set_result(result)
+
+    async def submit(self, item):
+        loop = asyncio.get_event_loop()
+        batch = self.batch
+        if batch is None:
+            batch = self.batch = AsyncBatch()
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.batch_size:
+            self.close(batch)
+        elif len(batch.items) == 1:
+            batch.timer = loop.call_later(self.interval, self.close, batch)
+        return await future
@@ -3,6 +3,9 @@ from threading import Thread
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.ServiceWrapper.services.base_service import BaseServiceSingleton
 from TMTChatbot.ServiceWrapper.services.buffer_manager import BufferManager
+from TMTChatbot.ServiceWrapper.services.cache import Cache
+from TMTChatbot.ServiceWrapper.services.circuit_breaker import CircuitBreaker
+from TMTChatbot.ServiceWrapper.services.session_pool import SessionPool, AsyncSessionPool
 from TMTChatbot.ServiceWrapper.pipeline.base_pipeline import BasePipeline
 
 
@@ -13,15 +16,28 @@ class Monitor(BaseServiceSingleton):
         self.monitor_items = {}
         self.add_monitor_service(BufferManager())
         self.add_monitor_service(BasePipeline(config))
+        self.add_monitor_service(SessionPool(config))
+        self.add_monitor_service(AsyncSessionPool(config))
 
     def add_monitor_service(self, service):
         self.monitor_items[service.__class__.__name__] = service
 
+    def add_monitor_item(self, name: str, item):
+        """
+        Monitor any object exposing an <info> property, e.g. a Cache
+        """
+        self.monitor_items[name] = item
+
     def monitor(self):
         while True:
             output = "["
             for item_name, item in self.monitor_items.items():
                 output += f"\t- {item_name}: {item.info}\n"
+            for cache_name, cache in list(Cache.caches.items()):
+                if cache_name not in self.monitor_items:
+                    output += f"\t- {cache_name}: {cache.info}\n"
+            for service_name, breaker in list(CircuitBreaker.breakers.items()):
+                output += f"\t- {service_name} circuit: {breaker.info}\n"
             output += "]"
             self.logger.info("MONITOR:\n" + output)
             sleep(60)
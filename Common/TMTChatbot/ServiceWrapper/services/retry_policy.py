@@ -0,0 +1,91 @@
+import random
+import time
+from threading import Lock
+
+from TMTChatbot.Common.config.config import Config
+
+
+class RetryBudget:
+    """
+    Token bucket limiting the retries of a service to a ratio of its requests. Every request deposits <ratio> token,
+    every retry withdraws one. While an upstream is down the bucket empties, so failing calls are not retried
+    """
+    def __init__(self, ratio: float = 0.1, max_tokens: float = 10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.lock = Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self) -> bool:
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """
+    Decide whether and when a failed request is retried: exponential backoff with full jitter, within the retry
+    budget of the service and before the deadline of the caller
+    """
+    def __init__(self, base_delay: float = 0.1, max_delay: float = 2, multiplier: float = 2,
+                 budget: RetryBudget = None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.budget = budget
+        self.retries = 0
+        self.budget_exhausted = 0
+        self.deadline_exceeded = 0
+
+    @staticmethod
+    def from_config(config: Config):
+        budget = RetryBudget(ratio=config.retry_budget_ratio, max_tokens=config.retry_budget_tokens) \
+            if config.retry_budget_ratio > 0 else None
+        return RetryPolicy(base_delay=config.retry_base_delay, max_delay=config.retry_max_delay, budget=budget)
+
+    def on_request(self):
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def is_expired(self, deadline: float = None) -> bool:
+        """
+        :return: whether the deadline of the caller has passed, then no attempt is started
+        """
+        if deadline is not None and time.time() >= deadline:
+            self.deadline_exceeded += 1
+            return True
+        return False
+
+    def get_backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+
+    def get_retry_delay(self, attempt: int, remaining: int, deadline: float = None):
+        """
+        :param attempt: number of the failed attempt, from 0
+        :param remaining: number of attempts left
+        :param deadline: time.time() after which the caller does not need the result anymore
+        :return: seconds to wait before the next attempt, None if the request must not be retried
+        """
+        if remaining <= 0:
+            return None
+        delay = self.get_backoff(attempt)
+        if deadline is not None and time.time() + delay >= deadline:
+            self.deadline_exceeded += 1
+            return None
+        if self.budget is not None and not self.budget.withdraw():
+            self.budget_exhausted += 1
+            return None
+        self.retries += 1
+        return delay
+
+    @property
+    def info(self):
+        tokens = f"{self.budget.tokens:.1f}" if self.budget is not None else "unlimited"
+        return f"RETRIES: {self.retries}, BUDGET_EXHAUSTED: {self.budget_exhausted}, " \
+               f"DEADLINE_EXCEEDED: {self.deadline_exceeded}, TOKENS: {tokens}"
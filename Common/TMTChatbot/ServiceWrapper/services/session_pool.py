@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from threading import Lock
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from TMTChatbot.Common.config.config import Config
+from TMTChatbot.Common.singleton import BaseSingleton
+
+
+class SessionPool(BaseSingleton):
+    """
+    Keep-alive requests sessions shared by the external services, one per host. The connection pool of each session
+    holds config.http_pool_size connections, enough for every route worker to keep its connection open instead of
+    reconnecting for each request
+    """
+    def __init__(self, config: Config = None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = config if config is not None else Config()
+        self.lock = Lock()
+        self.sessions = {}
+        self.errors = {}
+
+    @staticmethod
+    def get_host(url: str):
+        url = urlparse(url)
+        return f"{url.scheme}://{url.netloc}"
+
+    @property
+    def timeout(self):
+        """
+        (connect, read) timeout of a request, in seconds
+        """
+        return self.config.http_connect_timeout, self.config.http_read_timeout
+
+    def create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.config.http_pool_size,
+                              pool_block=self.config.http_pool_block)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get_session(self, url: str) -> requests.Session:
+        host = self.get_host(url)
+        with self.lock:
+            if host not in self.sessions:
+                self.logger.info(f"CREATE SESSION FOR {host}")
+                self.sessions[host] = self.create_session()
+                self.errors[host] = 0
+        return self.sessions[host]
+
+    def add_error(self, url: str):
+        """
+        Count a failed request. The session is kept, its pool already drops broken connections
+        """
+        host = self.get_host(url)
+        with self.lock:
+            self.errors[host] = self.errors.get(host, 0) + 1
+
+    def get_stats(self, host: str):
+        """
+        :return: requests sent, connections opened, idle connections in the pool and failed requests of host
+        """
+        num_requests = num_connections = num_idle = 0
+        adapter = self.sessions[host].get_adapter(host)
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools[key]
+            if pool is None:
+                continue
+            num_requests += pool.num_requests
+            num_connections += pool.num_connections
+            # the queue of a pool is filled with None up to its size, idle connections are the others
+            num_idle += sum(conn is not None for conn in list(pool.pool.queue)) if pool.pool is not None else 0
+        return {"requests": num_requests, "connections": num_connections, "idle": num_idle,
+                "errors": self.errors.get(host, 0)}
+
+    @property
+    def info(self):
+        output = ""
+        for host in list(self.sessions.keys()):
+            stats = self.get_stats(host)
+            output += f"\n\t\t{host}: REQUESTS: {stats['requests']}, CONNECTIONS: {stats['connections']}, " \
+                      f"IDLE: {stats['idle']}, ERRORS: {stats['errors']}"
+        return output
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+
+
+class AsyncSessionPool(BaseSingleton):
+    """
+    aiohttp session shared by the async services of the event loop. Its connector keeps up to config.http_pool_size
+    keep-alive connections per host, a coroutine waits for a free connection instead of opening more
+    """
+    def __init__(self, config: Config = None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = config if config is not None else Config()
+        self.session = None
+        self.loop = None
+        self.errors = {}
+
+    @property
+    def timeout(self):
+        return aiohttp.ClientTimeout(sock_connect=self.config.http_connect_timeout,
+                                     sock_read=self.config.http_read_timeout)
+
+    def create_session(self):
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.config.http_pool_size, ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        :return: the session of the running event loop, an aiohttp session cannot be used by another loop
+        """
+        loop = asyncio.get_event_loop()
+        if self.session is None or self.session.closed or self.loop is not loop:
+            self.logger.info(f"CREATE SESSION, LIMIT PER HOST: {self.config.http_pool_size}")
+            self.session = self.create_session()
+            self.loop = loop
+        return self.session
+
+    def add_error(self, url: str):
+        host = SessionPool.get_host(url)
+        self.errors[host] = self.errors.get(host, 0) + 1
+
+    @property
+    def info(self):
+        if self.session is None or self.session.closed:
+            return "NO SESSION"
+        connector = self.session.connector
+        return f"LIMIT_PER_HOST: {connector.limit_per_host}, ERRORS: {self.errors}"
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,99 @@
+import asyncio
+from threading import Event, Lock
+
+from TMTChatbot.ServiceWrapper.services.deadline import RequestDeadline
+
+
+class Flight:
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.error = None
+
+
+class FlightCancelled(Exception):
+    """
+    Set on an async flight whose leader was cancelled, its waiting callers run the call again
+    """
+    pass
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time. Callers arriving while the call of their key is in flight wait for it and
+    share its result or exception instead of running it again. A waiting caller gives up with a None result once its
+    own request deadline passes
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.flights = {}
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, func):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            if not flight.event.wait(RequestDeadline.get_timeout(None)):
+                self.timeouts += 1
+                return None
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = func()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.event.set()
+        return flight.result
+
+    @property
+    def info(self):
+        return f"IN_FLIGHT: {len(self.flights)}, COALESCED: {self.coalesced}, TIMEOUTS: {self.timeouts}"
+
+
+class AsyncSingleFlight(SingleFlight):
+    """
+    SingleFlight for coroutines. Waiting callers await the future of the call in flight, so the event loop is never
+    blocked. If the leader is cancelled, e.g. on its own deadline, the waiting callers run the call again instead of
+    being cancelled with it
+    """
+    async def do(self, key, func):
+        loop = asyncio.get_event_loop()
+        flight = self.flights.get(key)
+        if flight is not None and flight.get_loop() is loop:
+            self.coalesced += 1
+            try:
+                return await asyncio.wait_for(asyncio.shield(flight), timeout=RequestDeadline.get_timeout(None))
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                return None
+            except FlightCancelled:
+                return await self.do(key, func)
+        flight = self.flights[key] = loop.create_future()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            flight.set_exception(FlightCancelled(f"Call of key [{key}] was cancelled"))
+            flight.exception()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # retrieve the exception, so it is not reported as never retrieved when no caller is waiting
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+        finally:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        return result
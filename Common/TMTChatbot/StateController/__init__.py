@@ -3,5 +3,8 @@ from TMTChatbot.StateController.base_state_processor import BaseStateProcessor
 from TMTChatbot.StateController.base_state_controller import (
     BaseStateController,
     BaseSingleStorageStateController,
-    BaseMultiStorageStateController
+    BaseMultiStorageStateController,
+    BaseAsyncStateController,
+    BaseAsyncSingleStorageStateController,
+    BaseAsyncMultiStorageStateController
 )
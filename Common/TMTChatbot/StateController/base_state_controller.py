@@ -5,13 +5,18 @@ from TMTChatbot.Common.storage.mongo_client import MongoConnector, JoinCollMongo
 from TMTChatbot.Schema.objects.conversation.conversation import Conversation, Message, Response
 from TMTChatbot.ServiceWrapper.services.base_service import BaseServiceSingleton
 from TMTChatbot.StateController.config.config import Config
-from TMTChatbot.StateController.services.information_extractor import BaseInformationExtractor
+from TMTChatbot.StateController.services.information_extractor import (
+    BaseInformationExtractor,
+    BaseAsyncInformationExtractor
+)
 from TMTChatbot.StateController.base_state_processor import BaseStateProcessor
 from TMTChatbot.StateController.services.bot_intent import BotIntent
 from TMTChatbot.StateController.services.user_manager import UserManager
 
 
 class BaseStateController(BaseServiceSingleton):
+    information_extractor_class = BaseInformationExtractor
+
     def __init__(self, config: Config = None):
         super(BaseStateController, self).__init__(config=config)
         self.storage = None
@@ -43,6 +48,12 @@ class BaseStateController(BaseServiceSingleton):
 
     def process(self, conversation: Conversation, join_response) -> Union[Response, List[Response]]:
         self.information_extractor.message_information_extraction(conversation)
+        return self.process_state(conversation, join_response=join_response)
+
+    def process_state(self, conversation: Conversation, join_response) -> Union[Response, List[Response]]:
+        """
+        Process the pending message of conversation once its information is extracted
+        """
         self.bot_intent_extractor.extract_global_intents(conversation)
 
         conversation.get_state_by_entry_point()
@@ -94,15 +105,23 @@ class BaseStateController(BaseServiceSingleton):
         conversation.script_config = None
         conversation.save(force=True)
 
-    def __call__(self, message: Message, script_config, join_response) -> Union[Response, List[Response]]:
-        if (message.message is None or message.message == "") and (message.urls is None or len(message.urls) == 0) and \
-                (message.base64_img is None or len(message.base64_img) == 0):
-            output = Response(message="", storage_id=message.storage_id, user_id=message.user_id,
-                              shop_id=message.shop_id)
-            if join_response:
-                return output
-            else:
-                return [output]
+    @staticmethod
+    def is_empty_message(message: Message):
+        return (message.message is None or message.message == "") and (message.urls is None or len(message.urls) == 0) \
+            and (message.base64_img is None or len(message.base64_img) == 0)
+
+    @staticmethod
+    def empty_response(message: Message, join_response) -> Union[Response, List[Response]]:
+        output = Response(message="", storage_id=message.storage_id, user_id=message.user_id, shop_id=message.shop_id)
+        if join_response:
+            return output
+        else:
+            return [output]
+
+    def load_conversation(self, message: Message, script_config) -> Conversation:
+        """
+        Load the conversation of message and add message to its pending messages
+        """
         import time
         s = time.time()
 
@@ -115,34 +134,44 @@ class BaseStateController(BaseServiceSingleton):
         s = time.time()
         conversation.add_pending_message(message)
         conversation.save()
+        self.logger.debug(f"---save conv pending {time.time() - s}")
+        return conversation
 
+    def join_responses(self, conversation: Conversation, message: Message, responses: List,
+                       join_response) -> Union[Response, List[Response]]:
+        """
+        Join the responses to the pending messages of conversation, and start a new conversation once it is done
+        """
         if join_response:
             all_response = Response(message="", storage_id=message.storage_id, user_id=message.user_id,
                                     shop_id=message.shop_id)
-            self.logger.debug(f"---save conv pending {time.time() - s}")
-            s = time.time()
-            while len(conversation.pending_messages) > 0:
-                response = self.process(conversation, join_response=True)
+            for response in responses:
                 all_response.join(response, delimiter=self.config.response_delimiter)
-                conversation.save()
-                self.logger.debug(f"---processing {time.time() - s}")
-                s = time.time()
             all_response.message = self.state_processor.post_process(all_response.message,
                                                                      delimiter=self.config.response_delimiter)
         else:
-            self.logger.debug(f"---save conv pending {time.time() - s}")
-            s = time.time()
             all_response = []
-            while len(conversation.pending_messages) > 0:
-                response = self.process(conversation, join_response=False)
+            for response in responses:
                 all_response += response
-                conversation.save()
-                self.logger.debug(f"---processing {time.time() - s}")
-                s = time.time()
         if conversation.current_state.is_done_state:
             self.new_conversation(conversation)
         return all_response
 
+    def __call__(self, message: Message, script_config, join_response) -> Union[Response, List[Response]]:
+        if self.is_empty_message(message):
+            return self.empty_response(message, join_response)
+        import time
+
+        conversation = self.load_conversation(message, script_config)
+        responses = []
+        s = time.time()
+        while len(conversation.pending_messages) > 0:
+            responses.append(self.process(conversation, join_response=join_response))
+            conversation.save()
+            self.logger.debug(f"---processing {time.time() - s}")
+            s = time.time()
+        return self.join_responses(conversation, message, responses, join_response)
+
     @staticmethod
     def new_conversation(conversation: Conversation):
         """
@@ -180,7 +209,7 @@ class BaseMultiStorageStateController(BaseStateController):
     def init(self):
         self.storage = MongoConnector(config=self.config)
         self.state_processor = BaseStateProcessor(config=self.config, storage=self.storage)
-        self.information_extractor = BaseInformationExtractor(config=self.config, storage=self.storage)
+        self.information_extractor = self.information_extractor_class(config=self.config, storage=self.storage)
         self.bot_intent_extractor = BotIntent(config=self.config, storage=self.storage)
         self.user_manager = UserManager(config=self.config, storage=self.storage)
 
@@ -192,11 +221,48 @@ class BaseSingleStorageStateController(BaseStateController):
     def init(self):
         self.storage = JoinCollMongoConnector(config=self.config)
         self.state_processor = BaseStateProcessor(config=self.config, storage=self.storage)
-        self.information_extractor = BaseInformationExtractor(config=self.config, storage=self.storage)
+        self.information_extractor = self.information_extractor_class(config=self.config, storage=self.storage)
         self.bot_intent_extractor = BotIntent(config=self.config, storage=self.storage)
         self.user_manager = UserManager(config=self.config, storage=self.storage)
 
 
+class BaseAsyncStateController(BaseStateController):
+    """
+    State controller for the event loop. NLP calls of a message are awaited through the async external services, the
+    state processor and the mongo storage stay blocking and run in the default executor
+    """
+    information_extractor_class = BaseAsyncInformationExtractor
+
+    async def process(self, conversation: Conversation, join_response) -> Union[Response, List[Response]]:
+        await self.information_extractor.message_information_extraction(conversation)
+        return await self.wait(self.process_state, conversation, join_response)
+
+    async def __call__(self, message: Message, script_config, join_response) -> Union[Response, List[Response]]:
+        if self.is_empty_message(message):
+            return self.empty_response(message, join_response)
+        import time
+
+        conversation = await self.wait(self.load_conversation, message, script_config)
+        responses = []
+        s = time.time()
+        while len(conversation.pending_messages) > 0:
+            responses.append(await self.process(conversation, join_response=join_response))
+            await self.wait(conversation.save)
+            self.logger.debug(f"---processing {time.time() - s}")
+            s = time.time()
+        return await self.wait(self.join_responses, conversation, message, responses, join_response)
+
+
+class BaseAsyncMultiStorageStateController(BaseAsyncStateController, BaseMultiStorageStateController):
+    def __init__(self, config: Config = None):
+        super(BaseAsyncMultiStorageStateController, self).__init__(config=config)
+
+
+class BaseAsyncSingleStorageStateController(BaseAsyncStateController, BaseSingleStorageStateController):
+    def __init__(self, config: Config = None):
+        super(BaseAsyncSingleStorageStateController, self).__init__(config=config)
+
+
 if __name__ == "__main__":
     from TMTChatbot.StateController.config import ConversationConfig
 
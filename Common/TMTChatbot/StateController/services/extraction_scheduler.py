@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Callable, Dict, List, Iterable
+
+from TMTChatbot.Common.config.config import Config
+from TMTChatbot.ServiceWrapper.services.deadline import RequestDeadline
+
+
+class ExtractionTask:
+    """
+    One NLP call on a pending message, split like the external services:
+    - prepare(outputs) runs on the caller thread, before the tasks of its level start. It gets the outputs of the
+    finished tasks and returns the input of <request>, None to skip the task
+    - request(data) runs on a worker thread, concurrently with the other tasks of its level. It calls the upstream and
+    must not modify the conversation
+    - merge(data, result) runs on the caller thread once every task of its level is done, in declaration order. It
+    writes the result to the conversation and returns the output of the task
+    """
+    def __init__(self, name: str, prepare: Callable, request: Callable, merge: Callable = None,
+                 dependencies: Iterable[str] = ()):
+        self.name = name
+        self.prepare = prepare
+        self.request = request
+        self.merge = merge
+        self.dependencies = list(dependencies)
+
+
+class ExtractionScheduler:
+    """
+    Run extraction tasks level by level: a task is in the level after the last of its dependencies, so independent
+    calls of a message run concurrently and a turn waits for the slowest call of each level instead of the sum of all
+    calls. Results are merged in declaration order, the message is the same whichever call answers first.
+    The first task of a level runs on the caller thread and only the others go to the executor, which is shared by
+    every turn of the process: <extraction_workers> must cover the route workers calling it concurrently
+    """
+    def __init__(self, config: Config = None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = config if config is not None else Config()
+        self.lock = Lock()
+        self.executor = None
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.config.extraction_workers,
+                                                   thread_name_prefix=self.__class__.__name__)
+        return self.executor
+
+    @staticmethod
+    def get_levels(tasks: List[ExtractionTask]) -> List[List[ExtractionTask]]:
+        """
+        Group tasks by level, in declaration order. A task must be declared after its dependencies
+        """
+        task_levels = {}
+        levels = []
+        for task in tasks:
+            unknown = [name for name in task.dependencies if name not in task_levels]
+            if len(unknown) > 0:
+                raise ValueError(f"{task.name} depends on {unknown}, which must be declared before it")
+            level = max([task_levels[name] + 1 for name in task.dependencies], default=0)
+            task_levels[task.name] = level
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(task)
+        return levels
+
+    @staticmethod
+    def timed_request(task: ExtractionTask, data):
+        start_time = time.time()
+        result = task.request(data)
+        return result, time.time() - start_time
+
+    @staticmethod
+    def prepare(level: List[ExtractionTask], outputs: Dict):
+        ready = []
+        for task in level:
+            data = task.prepare(outputs)
+            if data is None:
+                outputs[task.name] = None
+            else:
+                ready.append((task, data))
+        return ready
+
+    @staticmethod
+    def merge(ready: List, results: List, outputs: Dict, timings: List):
+        level_timings = []
+        for (task, data), (result, request_time) in zip(ready, results):
+            outputs[task.name] = task.merge(data, result) if task.merge is not None else result
+            level_timings.append(f"{task.name} {request_time:.3f}s")
+        if len(level_timings) > 0:
+            timings.append(", ".join(level_timings))
+
+    def log_timings(self, start_time: float, timings: List):
+        self.logger.info(f"EXTRACTION {time.time() - start_time:.3f}s [{' | '.join(timings)}]")
+
+    def run(self, tasks: List[ExtractionTask]) -> Dict:
+        """
+        :return: output of each task by name, None for skipped tasks
+        """
+        start_time = time.time()
+        outputs = {}
+        timings = []
+        for level in self.get_levels(tasks):
+            ready = self.prepare(level, outputs)
+            if len(ready) <= 1 or self.config.extraction_workers <= 0:
+                results = [self.timed_request(task, data) for task, data in ready]
+            else:
+                executor = self.get_executor()
+                futures = [executor.submit(RequestDeadline.bind(self.timed_request), task, data)
+                           for task, data in ready[1:]]
+                try:
+                    results = [self.timed_request(*ready[0])]
+                finally:
+                    wait(futures)
+                results += [future.result() for future in futures]
+            self.merge(ready, results, outputs, timings)
+        self.log_timings(start_time, timings)
+        return outputs
+
+    async def timed_async_request(self, task: ExtractionTask, data):
+        start_time = time.time()
+        if asyncio.iscoroutinefunction(task.request):
+            result = await task.request(data)
+        elif self.config.extraction_workers <= 0:
+            result = task.request(data)
+        else:
+            loop = asyncio.get_event_loop()
+            result = await loop.run_in_executor(self.get_executor(), RequestDeadline.bind(task.request), data)
+        return result, time.time() - start_time
+
+    async def arun(self, tasks: List[ExtractionTask]) -> Dict:
+        """
+        Same as run, for the event loop: the tasks of a level are gathered, requests of async services are awaited,
+        the others run in the executor
+        """
+        start_time = time.time()
+        outputs = {}
+        timings = []
+        for level in self.get_levels(tasks):
+            ready = self.prepare(level, outputs)
+            results = await asyncio.gather(*[self.timed_async_request(task, data) for task, data in ready])
+            self.merge(ready, results, outputs, timings)
+        self.log_timings(start_time, timings)
+        return outputs
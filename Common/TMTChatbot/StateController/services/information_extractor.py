@@ -1,16 +1,26 @@
+from typing import List
+
 from TMTChatbot.Common.storage.mongo_client import MongoConnector
 from TMTChatbot.Common.storage.base_storage import BaseStorage
 from TMTChatbot.ServiceWrapper.services.base_service import BaseServiceSingleton
 from TMTChatbot.Schema.objects.conversation import Conversation, Message
-from TMTChatbot.AlgoClients.intent_service import IntentService
-from TMTChatbot.AlgoClients.ner_service import NERService
-from TMTChatbot.AlgoClients.graph_qa_service import GraphQAService
-from TMTChatbot.AlgoClients.node_search_service import NodeSearchService
+from TMTChatbot.AlgoClients.intent_service import IntentService, AsyncIntentService
+from TMTChatbot.AlgoClients.ner_service import NERService, AsyncNERService
+from TMTChatbot.AlgoClients.graph_qa_service import GraphQAService, AsyncGraphQAService
+from TMTChatbot.AlgoClients.node_search_service import NodeSearchService, AsyncNodeSearchService
+from TMTChatbot.AlgoClients.multiple_choice_service import AsyncMultipleChoiceService
 from TMTChatbot.StateController.services.product_search_manager import ProductSearchManager
 from TMTChatbot.StateController.services.multiple_choice_manager import MultipleChoiceManager
+from TMTChatbot.StateController.services.extraction_scheduler import ExtractionTask, ExtractionScheduler
 from TMTChatbot.StateController.config.config import Config
 from TMTChatbot.Common.default_intents import *
 
+NER_TASK = "ner"
+ADDRESS_TASK = "address"
+MULTIPLE_CHOICE_TASK = "multiple_choice"
+NODE_SEARCH_TASK = "node_search"
+INTENT_TASK = "intent"
+
 
 class BaseInformationExtractor(BaseServiceSingleton):
     def __init__(self, storage: BaseStorage, config: Config = None):
@@ -21,6 +31,10 @@ class BaseInformationExtractor(BaseServiceSingleton):
         self.graph_qa_service = GraphQAService(config=config, storage=storage)
         self.product_search_manager = ProductSearchManager(config=config, storage=storage)
         self.multiple_choice_manager = MultipleChoiceManager(config=config, storage=storage)
+        self.address_service = self.ner_service.address_service
+        self.node_search_service = self.product_search_manager.node_search_service
+        self.multiple_choice_service = self.multiple_choice_manager.multiple_choice_service
+        self.extraction_scheduler = ExtractionScheduler(config=self.config)
 
     @staticmethod
     def mapping_user_info(conversation: Conversation, is_new_action: bool = False):
@@ -98,26 +112,69 @@ class BaseInformationExtractor(BaseServiceSingleton):
                     if expected_intent.is_bot_intent and expected_intent.tag in intents:
                         expected_intent.done = True
 
-    def message_information_extraction(self, conversation: Conversation, is_new_action: bool = False):
+    def get_extraction_tasks(self, conversation: Conversation, is_new_action: bool = False) -> List[ExtractionTask]:
+        """
+        NLP calls on the pending message and the calls each of them needs the result of: address parsing needs the
+        NER result, node search needs the entities and the user choice. Their results are merged in this order
+        :param conversation: current conversation
+        :param is_new_action: if this is a new action => not add has_message intent
+        :return:
+        """
         message = conversation.pending_message
-        import time
+        address_service = self.address_service
+        node_search_service = self.node_search_service
+        multiple_choice_service = self.multiple_choice_service
+
+        def prepare_ner(outputs):
+            if self.ner_service.api_possible() and (message.entities is None or len(message.entities) == 0):
+                return [None, message]
+
+        def merge_ner(data, result):
+            has_address = self.ner_service.update(message, result) and address_service.api_possible()
+            if not has_address:
+                self.ner_service.add_empty_entity(message)
+            return has_address
+
+        def merge_address(data, result):
+            address_service.update(message, result)
+            self.ner_service.add_empty_entity(message)
+
+        def prepare_multiple_choice(outputs):
+            choice_message = self.multiple_choice_manager.prepare_choices(conversation)
+            if choice_message is not None and multiple_choice_service.api_possible():
+                return choice_message
+
+        def merge_multiple_choice(data, result):
+            multiple_choice_service.update(message, result)
+            self.multiple_choice_manager.update_choice_data(conversation)
+
+        def prepare_node_search(outputs):
+            if not self.multiple_choice_manager.check_user_has_choice(conversation) and \
+                    node_search_service.api_possible():
+                return conversation
 
-        s = time.time()
+        def prepare_intent(outputs):
+            if self.intent_model.api_possible():
+                return message
+
+        return [
+            ExtractionTask(NER_TASK, prepare=prepare_ner, request=self.ner_service.request, merge=merge_ner),
+            ExtractionTask(ADDRESS_TASK, prepare=lambda outputs: message if outputs[NER_TASK] else None,
+                           request=address_service.request, merge=merge_address, dependencies=[NER_TASK]),
+            ExtractionTask(MULTIPLE_CHOICE_TASK, prepare=prepare_multiple_choice,
+                           request=multiple_choice_service.request, merge=merge_multiple_choice),
+            ExtractionTask(NODE_SEARCH_TASK, prepare=prepare_node_search, request=node_search_service.request,
+                           merge=node_search_service.update,
+                           dependencies=[NER_TASK, ADDRESS_TASK, MULTIPLE_CHOICE_TASK]),
+            ExtractionTask(INTENT_TASK, prepare=prepare_intent, request=self.intent_model.request,
+                           merge=lambda data, result: self.intent_model.update(
+                               data, result, add_has_message_intent=not is_new_action))
+        ]
+
+    def message_information_extraction(self, conversation: Conversation, is_new_action: bool = False):
         has_product_in_attachment = self.product_search_manager.search_product_in_attachment(conversation)
         if not has_product_in_attachment:
-            self.ner_service([None, message])
-            self.logger.debug(f"----ner {time.time() - s}")
-            if self.multiple_choice_manager.check_user_has_pending_choices(conversation):
-                s = time.time()
-                self.multiple_choice_manager(conversation)
-                self.logger.debug(f"----multiple choice search {time.time() - s}")
-            if not self.multiple_choice_manager.check_user_has_choice(conversation):
-                s = time.time()
-                self.product_search_manager.search_product_in_message(conversation)
-                self.logger.debug(f"----node search {time.time() - s}")
-            s = time.time()
-            self.intent_model(message, add_has_message_intent=not is_new_action)
-            self.logger.debug(f"----intent {time.time() - s}")
+            self.extraction_scheduler.run(self.get_extraction_tasks(conversation, is_new_action=is_new_action))
 
     def information_extraction(self, conversation: Conversation, is_new_action: bool = False):
         current_state = conversation.current_state
@@ -129,3 +186,28 @@ class BaseInformationExtractor(BaseServiceSingleton):
         if current_state.message is not None and current_state.message.message is not None:
             self.mapping_user_info(conversation, is_new_action=is_new_action)
         self.map_expectation(conversation)
+
+
+class BaseAsyncInformationExtractor(BaseInformationExtractor):
+    """
+    Information extractor for coroutines: the NLP calls of a message are made by the async AlgoClients and awaited
+    together on the event loop
+    """
+    def __init__(self, storage: BaseStorage, config: Config = None):
+        super(BaseAsyncInformationExtractor, self).__init__(config=config, storage=storage)
+        self.intent_model = AsyncIntentService(config=config, storage=storage)
+        self.ner_service = AsyncNERService(config=config, storage=storage)
+        self.graph_qa_service = AsyncGraphQAService(config=config, storage=storage)
+        self.address_service = self.ner_service.address_service
+        self.node_search_service = AsyncNodeSearchService(config=config, storage=storage)
+        self.multiple_choice_service = AsyncMultipleChoiceService(config=config, storage=storage)
+
+    async def message_information_extraction(self, conversation: Conversation, is_new_action: bool = False):
+        has_product_in_attachment = self.product_search_manager.search_product_in_attachment(conversation)
+        if not has_product_in_attachment:
+            await self.extraction_scheduler.arun(self.get_extraction_tasks(conversation, is_new_action=is_new_action))
+
+    async def information_extraction(self, conversation: Conversation, is_new_action: bool = False):
+        current_state = conversation.current_state
+        if current_state.message is not None and current_state.message.message is not None:
+            await self.message_information_extraction(conversation, is_new_action=is_new_action)
@@ -1,11 +1,11 @@
-from typing import Set
+from typing import Set, Union
 from datetime import datetime
 
 from TMTChatbot.AlgoClients.multiple_choice_service import MultipleChoiceService
 from TMTChatbot.Common.common_keys import *
 from TMTChatbot.Common.config.config import Config
 from TMTChatbot.Common.storage.base_storage import BaseStorage
-from TMTChatbot.Schema.objects.conversation.conversation import Conversation
+from TMTChatbot.Schema.objects.conversation.conversation import Conversation, Message
 from TMTChatbot.Schema.objects.graph.graph_data import BillProduct, ValueNode, Product
 from TMTChatbot.ServiceWrapper.services.base_service import BaseServiceSingleton
 from TMTChatbot.StateController.services.billing_service import BillingManager
@@ -139,14 +139,23 @@ class MultipleChoiceManager(BaseServiceSingleton):
         self.multiple_choice_service(message)
         self.update_choice_data(conversation)
 
-    def __call__(self, conversation: Conversation):
-        current_state = conversation.current_state
-        if current_state is None or current_state.multiple_choices is None or len(current_state.multiple_choices) <= 1:
+    def prepare_choices(self, conversation: Conversation) -> Union[Message, None]:
+        """
+        Give the pending choices of the current state to the pending message
+        :return: the pending message, None if the user has no pending choice
+        """
+        if not self.check_user_has_pending_choices(conversation):
             return
         message = conversation.pending_message
         if message is None:
             return
-        message.multiple_choices = current_state.multiple_choices
+        message.multiple_choices = conversation.current_state.multiple_choices
+        return message
+
+    def __call__(self, conversation: Conversation):
+        message = self.prepare_choices(conversation)
+        if message is None:
+            return
         self.multiple_choice_service(message)
         self.update_choice_data(conversation)
 
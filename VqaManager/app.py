@@ -2,9 +2,10 @@ import json
 
 from common.common_keys import *
 from config.config import Config
-from controller.main_controller import Processor
+from controller.main_controller import Processor, AsyncProcessor
 from utils.utils import import_from_string
 
+from TMTChatbot import JoinCollMongoConnector
 from TMTChatbot.ServiceWrapper import BaseApp
 from TMTChatbot.Common.utils.logging_utils import setup_logging
 
@@ -12,7 +13,12 @@ from TMTChatbot.Common.utils.logging_utils import setup_logging
 class App(BaseApp):
     def __init__(self, config: Config = None):
         super(App, self).__init__(config=config, with_kafka_app=False, with_default_pipeline=False)
-        self.processor = Processor(config=config)
+        if self.config.async_mode:
+            self.processor = AsyncProcessor(config=config)
+        else:
+            self.processor = Processor(config=config)
+        schema_cache = self.processor.schema_controller.storage.schema_cache
+        self.monitor.add_monitor_item(schema_cache.name, schema_cache)
 
         with open(self.config.routing_path) as f:
             modules_config = json.load(f)
@@ -23,20 +29,34 @@ class App(BaseApp):
                 route[FUNC] = getattr(self.processor, route[FUNC])
                 route[REQUEST_DATA_MODEL] = import_from_string(route[REQUEST_DATA_MODEL])
                 route[RESPONSE_DATA_MODEL] = import_from_string(route[RESPONSE_DATA_MODEL])
+                if self.config.async_mode:
+                    route[USE_ASYNC], route[USE_THREAD] = True, False
             modules[controller] = routes
 
         [self.api_app.add_endpoint(**route) for routes in modules.values() for route in routes]
+        self.api_app.app.add_event_handler("startup", self.ensure_indexes)
+
+    def ensure_indexes(self):
+        try:
+            JoinCollMongoConnector(config=self.config).ensure_indexes()
+        except Exception as e:
+            self.logger.error(f"Cannot ensure Mongo indexes. {repr(e)}")
 
 
 def create_app(multiprocess: bool = False):
     _config = Config()
+    _config.schema_invalidation = multiprocess
     setup_logging(logging_folder=_config.logging_folder, log_name=_config.log_name)
-    if multiprocess:
-        raise NotImplementedError("Multiprocessing app not created")
-    else:
-        _app = App(config=_config)
+    _app = App(config=_config)
     return _app
 
 
-main_app = create_app(False)
-app = main_app.api_app.app
+def create_api_app():
+    """
+    Factory of the FastAPI app, called by every gunicorn/uvicorn worker process ("app:create_api_app()" /
+    "app:create_api_app") so that each worker builds its own app and reports its own caches. Nothing is built when
+    the module is imported
+    """
+    _app = create_app(multiprocess=Config().api_workers > 1)
+    _app.api_app.app.add_event_handler("startup", _app.monitor.start)
+    return _app.api_app.app
@@ -1,5 +1,13 @@
-from app import main_app
+from app import create_app
+from config.config import Config
+
+from TMTChatbot.ServiceWrapper.interfaces.restful.api_app import APIApp
 
 
 if __name__ == "__main__":
-    main_app.start()
+    _config = Config()
+    if _config.api_workers > 1:
+        # every worker process builds its own App with the factory
+        APIApp.start_workers(config=_config, n_workers=_config.api_workers, app_factory="app:create_api_app")
+    else:
+        create_app().start()
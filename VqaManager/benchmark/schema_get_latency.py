@@ -0,0 +1,59 @@
+"""
+Latency benchmark of schema GET routes under many concurrent clients.
+
+Start the service twice, once per execution mode, and run this script against each one:
+
+    ASYNC_MODE=false PYTHONPATH=./ python app_dev.py
+    python benchmark/schema_get_latency.py --url http://localhost:8080/vqa_schema/default/product/shirt
+
+    ASYNC_MODE=true PYTHONPATH=./ python app_dev.py
+    python benchmark/schema_get_latency.py --url http://localhost:8080/vqa_schema/default/product/shirt
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+import numpy as np
+
+
+async def client_job(session: aiohttp.ClientSession, url: str, num_requests: int, latencies: list, errors: list):
+    for _ in range(num_requests):
+        start_time = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+        except Exception as e:
+            errors.append(repr(e))
+        latencies.append(time.perf_counter() - start_time)
+
+
+async def run(url: str, num_clients: int, num_requests: int):
+    latencies = []
+    errors = []
+    connector = aiohttp.TCPConnector(limit=num_clients)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # warm up schema cache and connections
+        await client_job(session, url, 1, [], [])
+        start_time = time.perf_counter()
+        await asyncio.gather(*[client_job(session, url, num_requests, latencies, errors)
+                               for _ in range(num_clients)])
+        total_time = time.perf_counter() - start_time
+    latencies = np.array(latencies) * 1000
+    print(f"URL: {url}")
+    print(f"CLIENTS: {num_clients}, REQUESTS: {len(latencies)}, ERRORS: {len(errors)}")
+    print(f"THROUGHPUT: {len(latencies) / total_time:.1f} requests/s")
+    print(f"P50: {np.percentile(latencies, 50):.2f} ms, P99: {np.percentile(latencies, 99):.2f} ms, "
+          f"MAX: {latencies.max():.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8080/vqa_schema/default/product/shirt")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20, help="number of requests of each client")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.clients, args.requests))
@@ -0,0 +1,92 @@
+"""
+Throughput of get_schema with a warm schema cache, with and without the serialized response cache.
+
+The schema is put into schema_cache beforehand and requests are sent straight to the ASGI app, so neither Mongo
+nor the network is measured, only routing, response model construction and serialization:
+
+    ASYNC_MODE=false PYTHONPATH=./ python benchmark/schema_response_throughput.py --requests 20000
+    ASYNC_MODE=true PYTHONPATH=./ python benchmark/schema_response_throughput.py --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from TMTChatbot.Common.common_keys import *
+from TMTChatbot.Schema.config.schema_config import BaseSchemaConfig
+
+SCHEMA_STORAGE_ID = "benchmark"
+SCHEMA_CLASS = "Product"
+SCHEMA_PARENT_CLASS = "Shirt"
+
+
+def make_schema(num_attributes: int):
+    return BaseSchemaConfig({
+        CLASS: SCHEMA_CLASS,
+        PARENT_CLASS: SCHEMA_PARENT_CLASS,
+        REQUIRED_ATTRIBUTES: {f"required_{idx}": True for idx in range(num_attributes)},
+        VARIANT_ATTRIBUTES: {f"required_{idx}": True for idx in range(num_attributes // 2)},
+        ATTRIBUTES: {f"attribute_{idx}": True for idx in range(num_attributes)},
+        USER_REQUIRED_ATTRIBUTES: {},
+        STORAGE_ID: SCHEMA_STORAGE_ID
+    })
+
+
+async def get(app, path: str):
+    scope = {"type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": path,
+             "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+             "server": ("benchmark", 80), "client": ("benchmark", 1)}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"], b"".join(message.get("body", b"") for message in messages[1:])
+
+
+async def measure(app, path: str, num_requests: int):
+    status, body = await get(app, path)
+    assert status == 200, (path, status, body)
+    start_time = time.perf_counter()
+    for _ in range(num_requests):
+        await get(app, path)
+    total_time = time.perf_counter() - start_time
+    return num_requests / total_time, body
+
+
+def run(num_requests: int, num_attributes: int):
+    import app as vqa_app
+    from data_model import GetSchemaWithParentRequest, SchemaResponse
+
+    main_app = vqa_app.create_app()
+    processor = main_app.processor
+    storage = processor.schema_controller.storage
+    schema = make_schema(num_attributes)
+    storage.schema_cache[schema.schema_id] = schema
+
+    use_async = main_app.config.async_mode
+    main_app.api_app.add_endpoint(endpoint="/plain/vqa_schema/{storage_id}/{class}/{parent_class}",
+                                  func=processor.get_schema, description="get_schema without response cache",
+                                  methods=["GET"], use_thread=False, use_async=use_async,
+                                  request_data_model=GetSchemaWithParentRequest, response_data_model=SchemaResponse,
+                                  pass_request=True)
+
+    loop = asyncio.get_event_loop()
+    path = f"/vqa_schema/{SCHEMA_STORAGE_ID}/{SCHEMA_CLASS.lower()}/{SCHEMA_PARENT_CLASS.lower()}"
+    plain, plain_body = loop.run_until_complete(measure(main_app.api_app.app, "/plain" + path, num_requests))
+    raw, raw_body = loop.run_until_complete(measure(main_app.api_app.app, path, num_requests))
+    print(f"ASYNC_MODE: {use_async}, REQUESTS: {num_requests}, BODY: {len(raw_body)} bytes, "
+          f"SAME BODY: {plain_body == raw_body}")
+    print(f"{'response model':<18} {plain:>10.1f} requests/s")
+    print(f"{'serialized cache':<18} {raw:>10.1f} requests/s ({raw / plain:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--attributes", type=int, default=20, help="number of attributes of each type in the schema")
+    args = parser.parse_args()
+    run(args.requests, args.attributes)
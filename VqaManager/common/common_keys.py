@@ -7,3 +7,10 @@ ROUTING = "routing.json"
 FUNC = "func"
 REQUEST_DATA_MODEL = "request_data_model"
 RESPONSE_DATA_MODEL = "response_data_model"
+USE_ASYNC = "use_async"
+USE_THREAD = "use_thread"
+ASYNC_MODE = "ASYNC_MODE"
+STATUS = "status"
+ERROR = "error"
+NOT_EXECUTED_MESSAGE = "Not executed due to a previous error in ordered batch"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
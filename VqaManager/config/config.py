@@ -26,3 +26,4 @@ class Config(BaseConfig):
         )
         self.default_api_route_prefix = ""
         self.routing_path = os.getenv(ROUTING, "routing.json")
+        self.async_mode = os.getenv(ASYNC_MODE, "false").lower() == "true"
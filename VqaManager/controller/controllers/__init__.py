@@ -1 +1,2 @@
 from controller.controllers.schema_controller import SchemaController
+from controller.controllers.async_schema_controller import AsyncSchemaController
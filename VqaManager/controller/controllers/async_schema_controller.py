@@ -0,0 +1,161 @@
+from typing import List, Union
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from TMTChatbot.Common.common_keys import *
+from TMTChatbot import BaseDataModel, Node
+from TMTChatbot.Schema.config.schema_config import BaseSchemaConfig
+
+from config.config import Config
+from common.common_keys import *
+from data_model import SchemaResponse, SchemaPageResponse, SchemaBatchResponse, ResponseStatus
+from controller.controllers.base_controller import AsyncBaseController
+from controller.controllers.schema_controller import SchemaController
+
+
+class AsyncSchemaController(AsyncBaseController, SchemaController):
+    """
+    SchemaController running every storage call on the Motor event loop driver instead of a blocking pymongo client
+    """
+    def __init__(self, config: Config):
+        super(AsyncSchemaController, self).__init__(config=config)
+
+    async def get_schema(
+            self,
+            storage_id: str,
+            class_name: str,
+            parent_class_name: str,
+            return_response: bool = True,
+            request: Request = None,
+            response: Response = None,
+            raw_response: bool = False
+    ) -> Union[SchemaResponse, BaseSchemaConfig, Response]:
+        class_, parent_class = self.get_schema_classes(class_name, parent_class_name)
+        schema_id = BaseSchemaConfig.generate_schema_id(class_, parent_class, storage_id)
+        not_modified = self.get_not_modified_response(request, schema_id)
+        if not_modified is not None:
+            return not_modified
+        raw_response = raw_response and return_response
+        if raw_response:
+            serialized_response = self.get_serialized_response(schema_id)
+            if serialized_response is not None:
+                return serialized_response
+        loaded_schema = None
+
+        async def process_func():
+            nonlocal loaded_schema
+            loaded_schema = await self.storage.load_schema_with_class_name(class_, parent_class, storage_id,
+                                                                           restrict=True)
+            if not loaded_schema:
+                return None, ResponseStatus.NO_PRODUCT
+            return loaded_schema, ResponseStatus.SUCCESS
+
+        output = await self.process(process_func, SchemaResponse, return_response=return_response, return_json=True)
+        if raw_response:
+            return self.serialize_response(schema_id, loaded_schema, output)
+        self.set_etag(response, schema_id)
+        return output
+
+    async def get_all_schemas(self, storage_id: str, class_: str, after: str = None, limit: int = None,
+                              fields: str = None, stream: bool = False, request: Request = None,
+                              response: Response = None) -> Union[SchemaPageResponse, StreamingResponse, Response]:
+        fields = self.parse_fields(fields)
+        if stream:
+            return self.stream_schemas(storage_id, class_, after=after, limit=limit, fields=fields)
+        schema_id = None
+        if after is None and limit is None and fields is None:
+            schema_id = self.get_all_schema_id(storage_id, class_)
+        not_modified = self.get_not_modified_response(request, schema_id)
+        if not_modified is not None:
+            return not_modified
+
+        async def process_func():
+            class_name = Node.get_class_by_type(class_.capitalize()).class_name()
+            if after is None and limit is None and fields is None:
+                schemas = await self.storage.load_all_schema_with_class_name(class_name=class_name,
+                                                                             storage_id=storage_id)
+                next_cursor = None
+            else:
+                schemas, next_cursor = await self.storage.load_schema_page(class_name, storage_id, after=after,
+                                                                           limit=limit, fields=fields)
+            if not schemas:
+                return None, ResponseStatus.NO_PRODUCT
+            return (schemas, next_cursor), ResponseStatus.SUCCESS
+
+        output = await self.process(process_func, self.make_page_response)
+        self.set_etag(response, schema_id)
+        return output
+
+    def stream_schemas(self, storage_id: str, class_: str, after: str = None, limit: int = None,
+                       fields: List[str] = None) -> Union[SchemaPageResponse, StreamingResponse]:
+        try:
+            class_name = Node.get_class_by_type(class_.capitalize()).class_name()
+            schemas = self.storage.iter_schemas(class_name, storage_id, after=after, limit=limit, fields=fields)
+        except Exception as e:
+            self.logger.error(f"Exception {repr(e)} occur", exc_info=True)
+            return self.make_page_response(None, ResponseStatus.ERROR)
+        return StreamingResponse(self.to_ndjson_lines(schemas), media_type=NDJSON_MEDIA_TYPE)
+
+    async def to_ndjson_lines(self, schemas):
+        async for _, schema in schemas:
+            yield self.to_ndjson(schema)
+
+    async def update_schema_from_json(self, storage_id, schema, upsert, return_response=True):
+        async def process_func(schema_):
+            schema_ = self.normalize_schema_json(schema_, storage_id)
+            if not upsert and not await self.storage.load_schema_with_class_name(class_name=schema_[CLASS],
+                                                                                 parent_class=schema_[PARENT_CLASS],
+                                                                                 storage_id=storage_id,
+                                                                                 restrict=True):
+                return None, ResponseStatus.NO_PRODUCT
+            else:
+                schema_ = BaseSchemaConfig.from_json(schema_)
+                schema_ = await self.storage.store_schema(schema_, storage_id, upsert)
+            return schema_, ResponseStatus.SUCCESS
+
+        return await self.process(process_func,
+                                  SchemaResponse,
+                                  return_response=return_response,
+                                  return_json=True,
+                                  args=(schema,))
+
+    async def update_schemas_from_json(self, storage_id: str, schemas: List[dict], upsert: bool,
+                                       ordered: bool = False) -> SchemaBatchResponse:
+        async def process_func(schemas_):
+            results, valid_schemas = self.validate_schemas(schemas_, storage_id)
+            if not upsert and len(valid_schemas) > 0:
+                existing = await self.storage.exist_schemas([schema_ for _, schema_ in valid_schemas], storage_id)
+                valid_schemas = self.filter_existing_schemas(results, valid_schemas, existing)
+            if ordered:
+                valid_schemas = self.filter_ordered_schemas(results, valid_schemas)
+            errors = await self.storage.store_schemas([schema_ for _, schema_ in valid_schemas], storage_id,
+                                                      upsert=upsert, ordered=ordered)
+            return self.collect_batch_results(results, valid_schemas, errors)
+
+        return await self.process(process_func,
+                                  SchemaBatchResponse,
+                                  return_response=True,
+                                  return_json=False,
+                                  args=(schemas,))
+
+    async def update_schema(self, storage_id: str, input_data: BaseDataModel, upsert: bool) -> SchemaResponse:
+        schema = input_data.data.schema_.dict(by_alias=True)
+        return await self.update_schema_from_json(storage_id, schema=schema, upsert=upsert)
+
+    async def delete_schema(
+            self,
+            storage_id: str,
+            class_: str,
+            parent_class: str) \
+            -> SchemaResponse:
+        async def process_func(schema_):
+            schema_ = await self.storage.delete_schema(schema_, storage_id, class_, parent_class)
+            return schema_, ResponseStatus.SUCCESS
+
+        schema = await self.storage.load_schema_with_class_name(class_, parent_class, storage_id, restrict=True)
+        return await self.process(process_func,
+                                  SchemaResponse,
+                                  return_response=True,
+                                  return_json=False,
+                                  args=(schema,))
@@ -1,5 +1,6 @@
 from TMTChatbot import (
     JoinCollMongoConnector,
+    AsyncJoinCollMongoConnector,
     BaseServiceWithRAMCacheSingleton,
 )
 
@@ -8,17 +9,14 @@ from data_model import ResponseStatus
 
 
 class BaseController(BaseServiceWithRAMCacheSingleton):
+    storage_class = JoinCollMongoConnector
+
     def __init__(self, config: Config):
         super(BaseController, self).__init__(config=config)
-        self.storage = JoinCollMongoConnector(config=config)
+        self.storage = self.storage_class(config=config)
 
-    def process(self, func, response_model, return_response=True, return_json=False, args=tuple()):
-        try:
-            obj, status = func(*args)
-        except Exception as e:
-            self.logger.error(f"Exception {repr(e)} occur", exc_info=True)
-            obj = None
-            status = ResponseStatus.ERROR
+    @staticmethod
+    def make_response(obj, status, response_model, return_response=True, return_json=False):
         if return_response:
             if isinstance(obj, list):
                 obj = [o.json if o and return_json else o for o in obj]
@@ -26,3 +24,27 @@ class BaseController(BaseServiceWithRAMCacheSingleton):
                 obj = obj.json
             return response_model(obj, status=status)
         return obj
+
+    def process(self, func, response_model, return_response=True, return_json=False, args=tuple()):
+        try:
+            obj, status = func(*args)
+        except Exception as e:
+            self.logger.error(f"Exception {repr(e)} occur", exc_info=True)
+            obj = None
+            status = ResponseStatus.ERROR
+        return self.make_response(obj, status, response_model, return_response=return_response,
+                                  return_json=return_json)
+
+
+class AsyncBaseController(BaseController):
+    storage_class = AsyncJoinCollMongoConnector
+
+    async def process(self, func, response_model, return_response=True, return_json=False, args=tuple()):
+        try:
+            obj, status = await func(*args)
+        except Exception as e:
+            self.logger.error(f"Exception {repr(e)} occur", exc_info=True)
+            obj = None
+            status = ResponseStatus.ERROR
+        return self.make_response(obj, status, response_model, return_response=return_response,
+                                  return_json=return_json)
@@ -1,11 +1,17 @@
-from typing import Union
+import json
+from typing import List, Optional, Union
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from TMTChatbot.Common.common_keys import *
 from TMTChatbot import BaseDataModel, Node
 from TMTChatbot.Schema.config.schema_config import BaseSchemaConfig
 
 from config.config import Config
-from data_model import SchemaResponse, ResponseStatus
+from common.common_keys import *
+from data_model import SchemaResponse, SchemaPageResponse, SchemaBatchResponse, ResponseStatus
 from controller.controllers.base_controller import BaseController
 
 
@@ -13,45 +19,187 @@ class SchemaController(BaseController):
     def __init__(self, config: Config):
         super(SchemaController, self).__init__(config=config)
 
+    @staticmethod
+    def get_schema_classes(class_name: str, parent_class_name: str = None):
+        parent_class = parent_class_name
+        if parent_class:
+            parent_class = parent_class.capitalize()
+        return class_name.capitalize(), parent_class
+
+    @staticmethod
+    def get_all_schema_id(storage_id: str, class_: str) -> Optional[str]:
+        try:
+            class_name = Node.get_class_by_type(class_.capitalize()).class_name()
+        except AttributeError:
+            return None
+        return BaseSchemaConfig.generate_schema_id(class_name, "", storage_id)
+
+    @staticmethod
+    def etag_matched(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    def get_not_modified_response(self, request: Request, schema_id: str) -> Optional[Response]:
+        """
+        Answer a conditional request from the cached ETag of <schema_id>, without storage access
+        :return: 304 response if If-None-Match of <request> matches the cached version, else None
+        """
+        if request is None or schema_id is None:
+            return None
+        if_none_match = request.headers.get(IF_NONE_MATCH)
+        if not if_none_match:
+            return None
+        etag = self.storage.get_schema_etag(schema_id)
+        if etag is not None and self.etag_matched(if_none_match, etag):
+            return Response(status_code=304, headers={ETAG: etag})
+        return None
+
+    def set_etag(self, response: Response, schema_id: str):
+        if response is None or schema_id is None:
+            return
+        etag = self.storage.get_schema_etag(schema_id)
+        if etag is not None:
+            response.headers[ETAG] = etag
+
+    def get_serialized_response(self, schema_id: str) -> Optional[Response]:
+        serialized = self.storage.get_serialized_schema(schema_id)
+        if serialized is None:
+            return None
+        etag, body = serialized
+        headers = {ETAG: etag} if etag is not None else {}
+        return Response(content=body, media_type=JSONResponse.media_type, headers=headers)
+
+    def serialize_response(self, schema_id: str, schema: BaseSchemaConfig, output: SchemaResponse) -> Response:
+        """
+        Serialize <output> once as FastAPI would do with its response model and keep the body for the next requests
+        of the same schema version
+        """
+        headers = {}
+        etag = None
+        if output.status == ResponseStatus.SUCCESS:
+            # tag the served version, the cached one may have changed meanwhile
+            etag = self.storage.get_schema_etag(schema_id, schema=schema)
+            if etag is not None:
+                headers[ETAG] = etag
+        serialized_response = JSONResponse(content=jsonable_encoder(output), headers=headers)
+        if output.status == ResponseStatus.SUCCESS:
+            self.storage.set_serialized_schema(schema_id, schema, etag, serialized_response.body)
+        return serialized_response
+
     def get_schema(
             self,
             storage_id: str,
             class_name: str,
             parent_class_name: str,
-            return_response: bool = True
-    ) -> Union[SchemaResponse, BaseSchemaConfig]:
+            return_response: bool = True,
+            request: Request = None,
+            response: Response = None,
+            raw_response: bool = False
+    ) -> Union[SchemaResponse, BaseSchemaConfig, Response]:
+        """
+        Get a schema. With <request>, a cached schema whose ETag matches If-None-Match is answered by 304 Not Modified
+        and <response> receives the ETag of the returned schema. With <raw_response>, the response body is
+        serialized once per schema version and returned as is
+        """
+        class_, parent_class = self.get_schema_classes(class_name, parent_class_name)
+        schema_id = BaseSchemaConfig.generate_schema_id(class_, parent_class, storage_id)
+        not_modified = self.get_not_modified_response(request, schema_id)
+        if not_modified is not None:
+            return not_modified
+        raw_response = raw_response and return_response
+        if raw_response:
+            serialized_response = self.get_serialized_response(schema_id)
+            if serialized_response is not None:
+                return serialized_response
+        loaded_schema = None
+
         def process_func():
-            class_ = class_name.capitalize()
-            parent_class = parent_class_name
-            if parent_class:
-                parent_class = parent_class.capitalize()
-            schema = self.storage.load_schema_with_class_name(class_, parent_class, storage_id, restrict=True)
-            if not schema:
+            nonlocal loaded_schema
+            loaded_schema = self.storage.load_schema_with_class_name(class_, parent_class, storage_id, restrict=True)
+            if not loaded_schema:
                 return None, ResponseStatus.NO_PRODUCT
-            return schema, ResponseStatus.SUCCESS
+            return loaded_schema, ResponseStatus.SUCCESS
+
+        output = self.process(process_func, SchemaResponse, return_response=return_response, return_json=True)
+        if raw_response:
+            return self.serialize_response(schema_id, loaded_schema, output)
+        self.set_etag(response, schema_id)
+        return output
+
+    @staticmethod
+    def make_page_response(page, status: ResponseStatus) -> SchemaPageResponse:
+        schemas, next_cursor = page if page is not None else (None, None)
+        return SchemaPageResponse(schemas, status=status, next_cursor=next_cursor)
 
-        return self.process(process_func, SchemaResponse, return_response=return_response, return_json=True)
+    @staticmethod
+    def parse_fields(fields: str = None) -> Optional[List[str]]:
+        if not fields:
+            return None
+        return [field.strip() for field in fields.split(",") if field.strip()]
+
+    @staticmethod
+    def to_ndjson(schema: dict) -> str:
+        return json.dumps(schema, ensure_ascii=False, default=str) + "\n"
+
+    def get_all_schemas(self, storage_id: str, class_: str, after: str = None, limit: int = None,
+                        fields: str = None, stream: bool = False, request: Request = None,
+                        response: Response = None) -> Union[SchemaPageResponse, StreamingResponse, Response]:
+        """
+        Get schemas of a class. Without <after>, <limit> and <fields> the whole cached list is returned, otherwise
+        one page is read from a storage cursor. <stream> writes every schema as one NDJSON line while reading it.
+        Only the whole cached list supports conditional requests
+        """
+        fields = self.parse_fields(fields)
+        if stream:
+            return self.stream_schemas(storage_id, class_, after=after, limit=limit, fields=fields)
+        schema_id = None
+        if after is None and limit is None and fields is None:
+            schema_id = self.get_all_schema_id(storage_id, class_)
+        not_modified = self.get_not_modified_response(request, schema_id)
+        if not_modified is not None:
+            return not_modified
 
-    def get_all_schemas(self, storage_id: str, class_: str) -> SchemaResponse:
         def process_func():
-            class_name = class_.capitalize()
-            node = Node.get_class_by_type(class_name)
-            schemas = self.storage.load_all_schema_with_class_name(class_name=node.class_name(),
-                                                                   storage_id=storage_id)
+            class_name = Node.get_class_by_type(class_.capitalize()).class_name()
+            if after is None and limit is None and fields is None:
+                schemas = self.storage.load_all_schema_with_class_name(class_name=class_name, storage_id=storage_id)
+                next_cursor = None
+            else:
+                schemas, next_cursor = self.storage.load_schema_page(class_name, storage_id, after=after,
+                                                                     limit=limit, fields=fields)
             if not schemas:
                 return None, ResponseStatus.NO_PRODUCT
-            return schemas, ResponseStatus.SUCCESS
+            return (schemas, next_cursor), ResponseStatus.SUCCESS
 
-        return self.process(process_func, SchemaResponse)
+        output = self.process(process_func, self.make_page_response)
+        self.set_etag(response, schema_id)
+        return output
+
+    def stream_schemas(self, storage_id: str, class_: str, after: str = None, limit: int = None,
+                       fields: List[str] = None) -> Union[SchemaPageResponse, StreamingResponse]:
+        try:
+            class_name = Node.get_class_by_type(class_.capitalize()).class_name()
+            schemas = self.storage.iter_schemas(class_name, storage_id, after=after, limit=limit, fields=fields)
+        except Exception as e:
+            self.logger.error(f"Exception {repr(e)} occur", exc_info=True)
+            return self.make_page_response(None, ResponseStatus.ERROR)
+        return StreamingResponse((self.to_ndjson(schema) for _, schema in schemas), media_type=NDJSON_MEDIA_TYPE)
+
+    @staticmethod
+    def normalize_schema_json(schema_: dict, storage_id: str) -> dict:
+        schema_[CLASS] = schema_[CLASS].capitalize()
+        if PARENT_CLASS in schema_ and schema_[PARENT_CLASS]:
+            schema_[PARENT_CLASS] = schema_[PARENT_CLASS].capitalize()
+        else:
+            schema_[PARENT_CLASS] = None
+        schema_[STORAGE_ID] = storage_id
+        return schema_
 
     def update_schema_from_json(self, storage_id, schema, upsert, return_response=True):
         def process_func(schema_):
-            schema_[CLASS] = schema_[CLASS].capitalize()
-            if PARENT_CLASS in schema_ and schema_[PARENT_CLASS]:
-                schema_[PARENT_CLASS] = schema_[PARENT_CLASS].capitalize()
-            else:
-                schema_[PARENT_CLASS] = None
-            schema_[STORAGE_ID] = storage_id
+            schema_ = self.normalize_schema_json(schema_, storage_id)
             if not upsert and not self.storage.load_schema_with_class_name(class_name=schema_[CLASS],
                                                                            parent_class=schema_[PARENT_CLASS],
                                                                            storage_id=storage_id,
@@ -68,6 +216,73 @@ class SchemaController(BaseController):
                             return_json=True,
                             args=(schema,))
 
+    def validate_schemas(self, schemas: List[dict], storage_id: str):
+        results = [{CLASS: schema_.get(CLASS), PARENT_CLASS: schema_.get(PARENT_CLASS), STATUS: None, ERROR: None}
+                   for schema_ in schemas]
+        valid_schemas = []
+        for idx, schema_ in enumerate(schemas):
+            try:
+                schema_ = BaseSchemaConfig.from_json(self.normalize_schema_json(schema_, storage_id))
+                results[idx][CLASS], results[idx][PARENT_CLASS] = schema_.class_name(), schema_.parent_class
+                valid_schemas.append((idx, schema_))
+            except Exception as e:
+                results[idx][STATUS], results[idx][ERROR] = ResponseStatus.WRONG_REQUIRED_ATTRIBUTES, repr(e)
+        return results, valid_schemas
+
+    @staticmethod
+    def filter_existing_schemas(results: List[dict], valid_schemas: list, existing: List[bool]):
+        for (idx, _), exist in zip(valid_schemas, existing):
+            if not exist:
+                results[idx][STATUS] = ResponseStatus.NO_PRODUCT
+        return [item for item, exist in zip(valid_schemas, existing) if exist]
+
+    @staticmethod
+    def filter_ordered_schemas(results: List[dict], valid_schemas: list):
+        first_rejected = next((idx for idx, result in enumerate(results) if result[STATUS] is not None),
+                              len(results))
+        return [(idx, schema_) for idx, schema_ in valid_schemas if idx < first_rejected]
+
+    @staticmethod
+    def collect_batch_results(results: List[dict], valid_schemas: list, errors: List[str]):
+        for (idx, _), error in zip(valid_schemas, errors):
+            if error is None:
+                results[idx][STATUS] = ResponseStatus.SUCCESS
+            else:
+                results[idx][STATUS], results[idx][ERROR] = ResponseStatus.ERROR, error
+        for result in results:
+            if result[STATUS] is None:
+                result[STATUS], result[ERROR] = ResponseStatus.ERROR, NOT_EXECUTED_MESSAGE
+
+        if all(result[STATUS] == ResponseStatus.SUCCESS for result in results):
+            return results, ResponseStatus.SUCCESS
+        return results, ResponseStatus.ERROR
+
+    def update_schemas_from_json(self, storage_id: str, schemas: List[dict], upsert: bool, ordered: bool = False):
+        """
+        Validate a batch of schemas with BaseSchemaConfig and write the valid ones with a single bulk write
+        :param storage_id: storage of all schemas in the batch
+        :param schemas: list of schema json
+        :param upsert: True to insert missing schemas, False to only update existing schemas
+        :param ordered: stop at the first invalid or failed schema. Remaining schemas are not executed
+        :return: SchemaBatchResponse with the status of every schema
+        """
+        def process_func(schemas_):
+            results, valid_schemas = self.validate_schemas(schemas_, storage_id)
+            if not upsert and len(valid_schemas) > 0:
+                existing = self.storage.exist_schemas([schema_ for _, schema_ in valid_schemas], storage_id)
+                valid_schemas = self.filter_existing_schemas(results, valid_schemas, existing)
+            if ordered:
+                valid_schemas = self.filter_ordered_schemas(results, valid_schemas)
+            errors = self.storage.store_schemas([schema_ for _, schema_ in valid_schemas], storage_id,
+                                                upsert=upsert, ordered=ordered)
+            return self.collect_batch_results(results, valid_schemas, errors)
+
+        return self.process(process_func,
+                            SchemaBatchResponse,
+                            return_response=True,
+                            return_json=False,
+                            args=(schemas,))
+
     def update_schema(self, storage_id: str, input_data: BaseDataModel, upsert: bool) -> SchemaResponse:
         schema = input_data.data.schema_.dict(by_alias=True)
         return self.update_schema_from_json(storage_id, schema=schema, upsert=upsert)
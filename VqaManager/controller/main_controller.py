@@ -1,3 +1,5 @@
+from fastapi import Request, Response
+
 from TMTChatbot import (
     BaseServiceWithRAMCacheSingleton,
     BaseDataModel
@@ -9,15 +11,21 @@ from data_model.response import *
 
 
 class Processor(BaseServiceWithRAMCacheSingleton):
+    schema_controller_class = SchemaController
+
     def __init__(self, config: Config):
         super(Processor, self).__init__(config=config)
-        self.schema_controller = SchemaController(config)
+        self.schema_controller = self.schema_controller_class(config)
 
-    def get_schema(self, storage_id: str, class_: str, parent_class: str = None) -> SchemaResponse:
-        return self.schema_controller.get_schema(storage_id, class_, parent_class)
+    def get_schema(self, storage_id: str, class_: str, parent_class: str = None, request: Request = None,
+                   response: Response = None, raw_response: bool = False) -> SchemaResponse:
+        return self.schema_controller.get_schema(storage_id, class_, parent_class, request=request, response=response,
+                                                 raw_response=raw_response)
 
-    def get_all_schemas(self, storage_id: str, class_: str):
-        return self.schema_controller.get_all_schemas(storage_id, class_)
+    def get_all_schemas(self, storage_id: str, class_: str, after: str = None, limit: int = None, fields: str = None,
+                        stream: bool = False, request: Request = None, response: Response = None):
+        return self.schema_controller.get_all_schemas(storage_id, class_, after=after, limit=limit, fields=fields,
+                                                      stream=stream, request=request, response=response)
     #
     # def insert_schema(self, storage_id: str, input_data: BaseDataModel) -> SchemaResponse:
     #     return self.schema_controller.update_schema(storage_id, input_data, upsert=True)
@@ -40,6 +48,16 @@ class Processor(BaseServiceWithRAMCacheSingleton):
     def update_vqa_schema(self, storage_id: str, input_data: BaseDataModel) -> SchemaResponse:
         return self.schema_controller.update_schema(storage_id, input_data, upsert=False)
 
+    def insert_vqa_schemas(self, storage_id: str, input_data: BaseDataModel, ordered: bool = False) \
+            -> SchemaBatchResponse:
+        schemas = [schema.dict(by_alias=True) for schema in input_data.data.schemas]
+        return self.schema_controller.update_schemas_from_json(storage_id, schemas, upsert=True, ordered=ordered)
+
+    def update_vqa_schemas(self, storage_id: str, input_data: BaseDataModel, ordered: bool = False) \
+            -> SchemaBatchResponse:
+        schemas = [schema.dict(by_alias=True) for schema in input_data.data.schemas]
+        return self.schema_controller.update_schemas_from_json(storage_id, schemas, upsert=False, ordered=ordered)
+
     def delete_vqa_schema(
             self,
             storage_id: str,
@@ -47,3 +65,48 @@ class Processor(BaseServiceWithRAMCacheSingleton):
             parent_class: str
     ) -> SchemaResponse:
         return self.schema_controller.delete_schema(storage_id, class_, parent_class)
+
+
+class AsyncProcessor(Processor):
+    """
+    Processor for async routes. Every function is a coroutine awaited directly on the event loop
+    """
+    schema_controller_class = AsyncSchemaController
+
+    async def get_schema(self, storage_id: str, class_: str, parent_class: str = None, request: Request = None,
+                         response: Response = None, raw_response: bool = False) -> SchemaResponse:
+        return await self.schema_controller.get_schema(storage_id, class_, parent_class, request=request,
+                                                       response=response, raw_response=raw_response)
+
+    async def get_all_schemas(self, storage_id: str, class_: str, after: str = None, limit: int = None,
+                              fields: str = None, stream: bool = False, request: Request = None,
+                              response: Response = None):
+        return await self.schema_controller.get_all_schemas(storage_id, class_, after=after, limit=limit,
+                                                            fields=fields, stream=stream, request=request,
+                                                            response=response)
+
+    async def insert_vqa_schema(self, storage_id: str, input_data: BaseDataModel) -> SchemaResponse:
+        return await self.schema_controller.update_schema(storage_id, input_data, upsert=True)
+
+    async def update_vqa_schema(self, storage_id: str, input_data: BaseDataModel) -> SchemaResponse:
+        return await self.schema_controller.update_schema(storage_id, input_data, upsert=False)
+
+    async def insert_vqa_schemas(self, storage_id: str, input_data: BaseDataModel, ordered: bool = False) \
+            -> SchemaBatchResponse:
+        schemas = [schema.dict(by_alias=True) for schema in input_data.data.schemas]
+        return await self.schema_controller.update_schemas_from_json(storage_id, schemas, upsert=True,
+                                                                     ordered=ordered)
+
+    async def update_vqa_schemas(self, storage_id: str, input_data: BaseDataModel, ordered: bool = False) \
+            -> SchemaBatchResponse:
+        schemas = [schema.dict(by_alias=True) for schema in input_data.data.schemas]
+        return await self.schema_controller.update_schemas_from_json(storage_id, schemas, upsert=False,
+                                                                     ordered=ordered)
+
+    async def delete_vqa_schema(
+            self,
+            storage_id: str,
+            class_: str,
+            parent_class: str
+    ) -> SchemaResponse:
+        return await self.schema_controller.delete_schema(storage_id, class_, parent_class)
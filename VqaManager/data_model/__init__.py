@@ -1,10 +1,14 @@
 from data_model.vqa_schema import (
     GetSchemaRequest,
+    GetAllSchemasRequest,
     GetSchemaWithParentRequest,
     VqaSchemaRequest,
+    VqaSchemaBatchRequest,
     DeleteSchemeData
 )
 from data_model.response import (
     SchemaResponse,
+    SchemaPageResponse,
+    SchemaBatchResponse,
     ResponseStatus
 )
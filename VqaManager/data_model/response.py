@@ -28,6 +28,28 @@ class SchemaResponse(BaseModel):
         self.status = status
 
 
+class SchemaPageResponse(BaseModel):
+    schema_: Optional[Any] = Field(alias=SCHEMA)
+    next_cursor: Optional[str] = None
+    status: ResponseStatus
+
+    def __init__(self, schema: Any = None, status: ResponseStatus = None, next_cursor: str = None):
+        super(SchemaPageResponse, self).__init__(schema_=schema, status=status, next_cursor=next_cursor)
+        self.schema_ = schema
+        self.next_cursor = next_cursor
+        self.status = status
+
+
+class SchemaBatchResponse(BaseModel):
+    schemas: Optional[List[Any]]
+    status: ResponseStatus
+
+    def __init__(self, schemas: List[Any] = None, status: ResponseStatus = None):
+        super(SchemaBatchResponse, self).__init__(schemas=schemas, status=status)
+        self.schemas = schemas
+        self.status = status
+
+
 class ProductResponse(BaseModel):
     products: Optional[List[Any]]
     status: ResponseStatus
@@ -11,6 +11,15 @@ class GetSchemaRequest(BaseModel):
     class_: str = Field(alias=CLASS)
 
 
+class GetAllSchemasRequest(BaseModel):
+    storage_id: str
+    class_: str = Field(alias=CLASS)
+    after: Optional[str] = Field(None, description="next_cursor of the previous page")
+    limit: Optional[int] = Field(None, gt=0, description="maximum number of schemas in the page")
+    fields: Optional[str] = Field(None, description="comma separated fields to be returned")
+    stream: bool = Field(False, description="stream schemas as NDJSON instead of a single JSON response")
+
+
 class GetSchemaWithParentRequest(BaseModel):
     storage_id: str
     class_: str = Field(alias=CLASS)
@@ -36,6 +45,20 @@ class VqaSchemaRequest(BaseModel):
     input_data: SchemaBody
 
 
+class SchemaBatch(BaseModel):
+    schemas: List[SchemaData]
+
+
+class SchemaBatchBody(BaseDataModel):
+    data: SchemaBatch
+
+
+class VqaSchemaBatchRequest(BaseModel):
+    storage_id: str
+    input_data: SchemaBatchBody
+    ordered: bool = False
+
+
 class DeleteSchemeData(BaseModel):
     storage_id: str
     class_: str = Field(alias=CLASS)